@@ -0,0 +1,1019 @@
+"""Local stand-in for the subset of the Google Drive v3 API used by DUP.
+
+Implements files.list (with q filtering, orderBy and paging), files.get,
+files.create, files.update, resumable uploads, get_media with Range,
+export, permissions, batch requests and the changes feed, plus admin endpoints used by the benchmark
+runner to seed workloads and read request counters.
+
+Latency, bandwidth and error injection are configurable so benchmarks can
+model real network conditions reproducibly.
+
+Run standalone:
+    python -m benchmarks.fake_drive --port 8089 --latency 0.02
+"""
+
+import argparse
+import email.parser
+import hashlib
+import http.client
+import io
+import itertools
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+BLOCK_SIZE = 1024 * 1024
+MAX_PAGE_SIZE = 1000
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+# ---------------------------------------------------------------------------
+# Partial responses (fields=...)
+# ---------------------------------------------------------------------------
+
+def parse_fields(spec: Optional[str]) -> Dict[str, Any]:
+    """Parse a fields selector like "nextPageToken, files(id, name)"."""
+    if not spec:
+        return {}
+
+    def parse(text: str, pos: int):
+        result = {}
+        name = ''
+        while pos < len(text):
+            char = text[pos]
+            if char == '(':
+                result[name.strip()], pos = parse(text, pos + 1)
+                name = ''
+            elif char == ')':
+                if name.strip():
+                    result[name.strip()] = {}
+                return result, pos + 1
+            elif char == ',':
+                if name.strip():
+                    result[name.strip()] = {}
+                name = ''
+                pos += 1
+                continue
+            else:
+                name += char
+                pos += 1
+                continue
+        if name.strip():
+            result[name.strip()] = {}
+        return result, pos
+
+    fields, _ = parse(spec, 0)
+    return fields
+
+
+def select(obj: Any, fields: Dict[str, Any]) -> Any:
+    """Apply a parsed fields selector to a response object."""
+    if not fields:
+        return obj
+    if isinstance(obj, list):
+        return [select(item, fields) for item in obj]
+    if isinstance(obj, dict):
+        return {
+            key: select(obj[key], sub)
+            for key, sub in fields.items()
+            if key in obj and obj[key] is not None
+        }
+    return obj
+
+
+# ---------------------------------------------------------------------------
+# Query language (q=...)
+# ---------------------------------------------------------------------------
+
+_TOKEN = re.compile(r"\s*(?:('(?:[^'\\]|\\.)*')|(!=|<=|>=|=|<|>)|([()])|([A-Za-z_][\w.]*)|(-?\d+))")
+
+
+def _tokenize(query: str) -> List[tuple]:
+    tokens = []
+    pos = 0
+    query = query.strip()
+    while pos < len(query):
+        match = _TOKEN.match(query, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Invalid query near: {query[pos:]}")
+        string, op, paren, word, number = match.groups()
+        if string is not None:
+            tokens.append(('str', re.sub(r"\\(.)", r"\1", string[1:-1])))
+        elif op is not None:
+            tokens.append(('op', op))
+        elif paren is not None:
+            tokens.append(('paren', paren))
+        elif word is not None:
+            lowered = word.lower()
+            if lowered in ('and', 'or', 'not', 'in', 'contains', 'true', 'false'):
+                tokens.append(('kw', lowered))
+            else:
+                tokens.append(('ident', word))
+        else:
+            tokens.append(('num', int(number)))
+        pos = match.end()
+        while pos < len(query) and query[pos].isspace():
+            pos += 1
+    return tokens
+
+
+class Query:
+    """Parsed Drive query evaluated against file records."""
+
+    def __init__(self, query: Optional[str]):
+        self.tokens = _tokenize(query) if query else []
+        self.pos = 0
+        self.tree = self._or() if self.tokens else ('true',)
+        self.parent = self._parent_constraint(self.tree)
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def _or(self):
+        node = self._and()
+        while self._peek() == ('kw', 'or'):
+            self._next()
+            node = ('or', node, self._and())
+        return node
+
+    def _and(self):
+        node = self._unary()
+        while self._peek() == ('kw', 'and'):
+            self._next()
+            node = ('and', node, self._unary())
+        return node
+
+    def _unary(self):
+        kind, value = self._peek()
+        if (kind, value) == ('kw', 'not'):
+            self._next()
+            return ('not', self._unary())
+        if (kind, value) == ('paren', '('):
+            self._next()
+            node = self._or()
+            self._next()
+            return node
+        return self._comparison()
+
+    def _value(self):
+        kind, value = self._next()
+        if kind == 'kw' and value in ('true', 'false'):
+            return value == 'true'
+        return value
+
+    def _comparison(self):
+        kind, value = self._next()
+        if kind == 'str':
+            self._next()  # 'in'
+            _, collection = self._next()
+            return ('in', value, collection)
+
+        field = value
+        kind, op = self._next()
+        if (kind, op) == ('kw', 'contains'):
+            return ('contains', field, self._value())
+        return ('cmp', field, op, self._value())
+
+    def _parent_constraint(self, node) -> Optional[str]:
+        if node[0] == 'in' and node[2] == 'parents':
+            return node[1]
+        if node[0] == 'and':
+            return self._parent_constraint(node[1]) or self._parent_constraint(node[2])
+        return None
+
+    def matches(self, record: Dict[str, Any]) -> bool:
+        return self._eval(self.tree, record)
+
+    def _eval(self, node, record) -> bool:
+        op = node[0]
+        if op == 'true':
+            return True
+        if op == 'and':
+            return self._eval(node[1], record) and self._eval(node[2], record)
+        if op == 'or':
+            return self._eval(node[1], record) or self._eval(node[2], record)
+        if op == 'not':
+            return not self._eval(node[1], record)
+        if op == 'in':
+            return node[1] in (record.get(node[2]) or [])
+        if op == 'contains':
+            field, value = node[1], str(node[2]).lower()
+            if field == 'fullText':
+                return value in record['name'].lower() or value in record.get('description', '').lower()
+            return value in str(record.get(field, '')).lower()
+
+        _, field, comparison, value = node
+        actual = record.get(field, False if field in ('trashed', 'starred') else None)
+        if comparison == '=':
+            return actual == value
+        if comparison == '!=':
+            return actual != value
+        if actual is None:
+            return False
+        return {
+            '<': actual < value,
+            '<=': actual <= value,
+            '>': actual > value,
+            '>=': actual >= value,
+        }[comparison]
+
+
+# ---------------------------------------------------------------------------
+# In-memory store
+# ---------------------------------------------------------------------------
+
+class FakeDrive:
+    """Thread-safe in-memory Drive with on-disk content for uploads."""
+
+    def __init__(self, data_dir: Optional[str] = None):
+        self.data_dir = data_dir or tempfile.mkdtemp(prefix='fake-drive-')
+        self.lock = threading.RLock()
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.uploads: Dict[str, Dict[str, Any]] = {}
+        self.version = 0
+        self._ids = itertools.count(1)
+        self._list_cache: Dict[tuple, List[str]] = {}
+        # IDs of changed files in order; a page token is an index into it
+        self.change_log: List[str] = []
+        self.stats: Dict[str, int] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.files.clear()
+            self.children.clear()
+            self.uploads.clear()
+            self._list_cache.clear()
+            self.change_log.clear()
+            self.version += 1
+            self.files['root'] = {
+                'id': 'root',
+                'name': 'My Drive',
+                'mimeType': FOLDER_MIME_TYPE,
+                'modifiedTime': _now(),
+                'trashed': False,
+                'permissions': [],
+            }
+            self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.stats = {}
+            self.bytes_in = 0
+            self.bytes_out = 0
+
+    def count(self, name: str, bytes_in: int = 0, bytes_out: int = 0) -> None:
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def new_id(self) -> str:
+        return f"f{next(self._ids):08d}"
+
+    def add(self, name: str, parent: str = 'root', mime_type: str = 'application/octet-stream',
+            size: Optional[int] = None, content: Optional[Dict[str, Any]] = None,
+            **extra) -> Dict[str, Any]:
+        """Add a file or folder record and return it."""
+        with self.lock:
+            file_id = self.new_id()
+            record = {
+                'id': file_id,
+                'name': name,
+                'mimeType': mime_type,
+                'parents': [parent],
+                'modifiedTime': _now(),
+                'createdTime': _now(),
+                'trashed': False,
+                'version': '1',
+                'permissions': [],
+                'webViewLink': f'https://drive.google.com/file/d/{file_id}/view',
+            }
+            if mime_type != FOLDER_MIME_TYPE:
+                record['size'] = str(size or 0)
+                record['quotaBytesUsed'] = str(size or 0)
+                record['_content'] = content or {'seed': hash(file_id) & 0xffff}
+            record.update(extra)
+            self.files[file_id] = record
+            self.children.setdefault(parent, []).append(file_id)
+            self.version += 1
+            self.change_log.append(file_id)
+            return record
+
+    def update(self, file_id: str, changes: Dict[str, Any], add_parents: str = '',
+               remove_parents: str = '') -> Dict[str, Any]:
+        with self.lock:
+            record = self.files[file_id]
+            for parent in filter(None, remove_parents.split(',')):
+                if parent in record.get('parents', []):
+                    record['parents'].remove(parent)
+                    self.children.get(parent, []).remove(file_id)
+            for parent in filter(None, add_parents.split(',')):
+                record.setdefault('parents', []).append(parent)
+                self.children.setdefault(parent, []).append(file_id)
+            record.update(changes)
+            record['modifiedTime'] = _now()
+            record['version'] = str(int(record.get('version', '1')) + 1)
+            self.version += 1
+            self.change_log.append(file_id)
+            return record
+
+    # -- content -----------------------------------------------------------
+
+    def _synthetic_block(self, seed: int) -> bytes:
+        return random.Random(seed).randbytes(BLOCK_SIZE)
+
+    def read(self, record: Dict[str, Any], start: int, end: int) -> Iterator[bytes]:
+        """Yield the bytes of a file between start and end (inclusive)."""
+        content = record['_content']
+        if 'path' in content:
+            with open(content['path'], 'rb') as fh:
+                fh.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    block = fh.read(min(BLOCK_SIZE, remaining))
+                    if not block:
+                        return
+                    remaining -= len(block)
+                    yield block
+            return
+
+        block = self._synthetic_block(content['seed'])
+        pos = start
+        while pos <= end:
+            offset = pos % BLOCK_SIZE
+            length = min(BLOCK_SIZE - offset, end - pos + 1)
+            yield block[offset:offset + length]
+            pos += length
+
+    def md5(self, record: Dict[str, Any]) -> Optional[str]:
+        if record['mimeType'].startswith('application/vnd.google-apps.'):
+            return None
+        if 'md5Checksum' not in record:
+            digest = hashlib.md5()
+            size = int(record.get('size', 0))
+            if size:
+                for block in self.read(record, 0, size - 1):
+                    digest.update(block)
+            record['md5Checksum'] = digest.hexdigest()
+        return record['md5Checksum']
+
+    # -- seeding -----------------------------------------------------------
+
+    def seed_folder(self, name: str, parent: str = 'root') -> Dict[str, Any]:
+        return self.add(name, parent, FOLDER_MIME_TYPE)
+
+    def seed_wide(self, name: str = 'wide', count: int = 5000, size: int = 1024,
+                  parent: str = 'root') -> str:
+        """One folder containing ``count`` files."""
+        folder = self.seed_folder(name, parent)
+        for i in range(count):
+            self.add(f'file_{i:06d}.dat', folder['id'], size=size)
+        return folder['id']
+
+    def seed_deep(self, name: str = 'deep', depth: int = 8, fanout: int = 3,
+                  files_per_folder: int = 5, size: int = 1024, parent: str = 'root') -> str:
+        """A tree of folders ``depth`` levels deep with ``fanout`` subfolders each."""
+        root = self.seed_folder(name, parent)
+        level = [root['id']]
+        for d in range(depth):
+            next_level = []
+            for folder_id in level:
+                for i in range(files_per_folder):
+                    self.add(f'doc_{d}_{i}.txt', folder_id, size=size)
+                if d < depth - 1:
+                    for i in range(fanout):
+                        next_level.append(self.seed_folder(f'level{d + 1}_{i}', folder_id)['id'])
+            level = next_level
+        return root['id']
+
+    def seed_file(self, name: str, size: int, parent: str = 'root', seed: int = 1,
+                  mime_type: str = 'application/octet-stream') -> str:
+        """A single file with synthetic content."""
+        return self.add(name, parent, mime_type, size=size, content={'seed': seed})['id']
+
+    # -- listing -----------------------------------------------------------
+
+    def list(self, q: Optional[str], order_by: Optional[str]) -> List[str]:
+        key = (q, order_by, self.version)
+        with self.lock:
+            cached = self._list_cache.get(key)
+            if cached is not None:
+                return cached
+
+            query = Query(q)
+            if query.parent is not None:
+                candidates = self.children.get(query.parent, [])
+            else:
+                candidates = [fid for fid in self.files if fid != 'root']
+
+            ids = [fid for fid in candidates if query.matches(self.files[fid])]
+
+            if order_by:
+                for term in reversed([t.strip() for t in order_by.split(',') if t.strip()]):
+                    field, _, direction = term.partition(' ')
+                    reverse = direction.strip().lower() == 'desc'
+                    if field == 'folder':
+                        ids.sort(key=lambda fid: self.files[fid]['mimeType'] != FOLDER_MIME_TYPE,
+                                 reverse=reverse)
+                    else:
+                        ids.sort(key=lambda fid: str(self.files[fid].get(field, '')).lower(),
+                                 reverse=reverse)
+
+            self._list_cache = {key: ids}
+            return ids
+
+    def public(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Record without private bookkeeping keys."""
+        return {k: v for k, v in record.items() if not k.startswith('_')}
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+
+class FakeDriveServer(ThreadingHTTPServer):
+    """HTTP server with network condition simulation."""
+
+    daemon_threads = True
+
+    def __init__(self, address, drive: FakeDrive, latency: float = 0.0,
+                 bandwidth: float = 0.0, error_rate: float = 0.0,
+                 error_kinds: str = '503', seed: int = 0):
+        super().__init__(address, FakeDriveHandler)
+        self.drive = drive
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_kinds = [kind.strip() for kind in error_kinds.split(',') if kind.strip()]
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def pick_error(self) -> Optional[str]:
+        if self.error_rate <= 0:
+            return None
+        with self.random_lock:
+            if self.random.random() >= self.error_rate:
+                return None
+            return self.random.choice(self.error_kinds)
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server: FakeDriveServer
+
+    def log_message(self, format, *args):
+        pass
+
+    # -- helpers -----------------------------------------------------------
+
+    @property
+    def drive(self) -> FakeDrive:
+        return self.server.drive
+
+    def _throttle(self, nbytes: int, started: float) -> None:
+        if self.server.bandwidth > 0:
+            expected = nbytes / self.server.bandwidth
+            elapsed = time.perf_counter() - started
+            if expected > elapsed:
+                time.sleep(expected - elapsed)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        started = time.perf_counter()
+        chunks = []
+        remaining = length
+        while remaining > 0:
+            chunk = self.rfile.read(min(BLOCK_SIZE, remaining))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+            self._throttle(length - remaining, started)
+        return b''.join(chunks)
+
+    def _send(self, status: int, body: bytes = b'', headers: Optional[Dict[str, str]] = None,
+              content_type: str = 'application/json') -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _json(self, obj: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(status, json.dumps(obj).encode(), headers)
+
+    def _error(self, status: int, message: str, reason: str = 'error') -> None:
+        self._json({'error': {
+            'code': status,
+            'message': message,
+            'errors': [{'reason': reason, 'message': message}],
+        }}, status)
+
+    def _stream(self, status: int, record: Dict[str, Any], start: int, end: int,
+                headers: Dict[str, str], content_type: str) -> None:
+        length = max(0, end - start + 1)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(length))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+
+        started = time.perf_counter()
+        sent = 0
+        if length:
+            for block in self.drive.read(record, start, end):
+                self.wfile.write(block)
+                sent += len(block)
+                self._throttle(sent, started)
+        self.drive.count('bytes.download', bytes_out=sent)
+
+    # -- dispatch ----------------------------------------------------------
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method: str) -> None:
+        url = urlparse(self.path)
+        path = url.path
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if path.startswith('/_admin/'):
+            return self._admin(method, path[len('/_admin/'):])
+
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+
+        error = self.server.pick_error()
+        if error is not None:
+            # Drain the request body so the connection stays usable
+            self._read_body()
+            self.drive.count(f'error.{error}')
+            if error == 'reset':
+                self.close_connection = True
+                self.connection.shutdown(2)
+                return
+            if error == '429':
+                return self._error(429, 'Rate limit exceeded', 'rateLimitExceeded')
+            return self._error(int(error), 'Injected backend error', 'backendError')
+
+        try:
+            self._route(method, path, params)
+        except KeyError as e:
+            self._error(404, f'File not found: {e}', 'notFound')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _route(self, method: str, path: str, params: Dict[str, str]) -> None:
+        parts = [p for p in path.split('/') if p]
+
+        if parts[:3] == ['upload', 'drive', 'v3']:
+            return self._upload(method, parts[3:], params)
+
+        if parts[:2] == ['batch', 'drive'] or parts == ['batch']:
+            return self._batch()
+
+        if parts[:2] != ['drive', 'v3']:
+            return self._error(404, f'Unknown endpoint: {path}')
+
+        parts = parts[2:]
+        fields = parse_fields(params.get('fields'))
+
+        if parts == ['files'] and method == 'GET':
+            return self._files_list(params, fields)
+
+        if parts == ['files'] and method == 'POST':
+            body = json.loads(self._read_body() or b'{}')
+            record = self.drive.add(
+                body.get('name', 'Untitled'),
+                (body.get('parents') or ['root'])[0],
+                body.get('mimeType', 'application/octet-stream'),
+                size=0,
+                **{k: v for k, v in body.items() if k not in ('name', 'parents', 'mimeType')}
+            )
+            self.drive.count('files.create')
+            return self._json(select(self.drive.public(record), fields or parse_fields('id')))
+
+        if parts == ['changes', 'startPageToken']:
+            self.drive.count('changes.getStartPageToken')
+            return self._json({'startPageToken': str(len(self.drive.change_log))})
+
+        if parts == ['changes'] and method == 'GET':
+            return self._changes_list(params, fields)
+
+        if len(parts) == 2 and parts[0] == 'files':
+            file_id = parts[1]
+            record = self.drive.files[file_id]
+
+            if method == 'GET' and params.get('alt') == 'media':
+                return self._get_media(record)
+
+            if method == 'GET':
+                self.drive.count('files.get')
+                if 'md5Checksum' in fields:
+                    self.drive.md5(record)
+                return self._json(select(self.drive.public(record), fields))
+
+            if method == 'PATCH':
+                body = json.loads(self._read_body() or b'{}')
+                record = self.drive.update(
+                    file_id, body,
+                    params.get('addParents', ''), params.get('removeParents', '')
+                )
+                self.drive.count('files.update')
+                return self._json(select(self.drive.public(record), fields or parse_fields('id')))
+
+            if method == 'DELETE':
+                with self.drive.lock:
+                    record = self.drive.files.pop(file_id)
+                    for parent in record.get('parents', []):
+                        self.drive.children.get(parent, []).remove(file_id)
+                    self.drive.version += 1
+                    self.drive.change_log.append(file_id)
+                self.drive.count('files.delete')
+                return self._send(204)
+
+        if len(parts) == 3 and parts[0] == 'files' and parts[2] == 'export':
+            record = self.drive.files[parts[1]]
+            self.drive.count('files.export')
+            size = int(record.get('exportSize', 64 * 1024))
+            return self._stream(200, {'_content': {'seed': 7}}, 0, size - 1, {},
+                                params.get('mimeType', 'application/pdf'))
+
+        if len(parts) >= 3 and parts[0] == 'files' and parts[2] == 'permissions':
+            record = self.drive.files[parts[1]]
+            if method == 'GET':
+                self.drive.count('permissions.list')
+                return self._json(select({'permissions': record['permissions']}, fields))
+            if method == 'POST':
+                body = json.loads(self._read_body() or b'{}')
+                permission = {'id': f"p{len(record['permissions']) + 1}", **body}
+                with self.drive.lock:
+                    record['permissions'].append(permission)
+                    self.drive.version += 1
+                self.drive.count('permissions.create')
+                return self._json(select(permission, fields))
+
+        self._error(404, f'Unknown endpoint: {method} {path}')
+
+    # -- batch -------------------------------------------------------------
+
+    def _batch(self) -> None:
+        """Run the parts of a multipart/mixed batch request in order."""
+        body = self._read_body()
+        message = email.parser.BytesParser().parsebytes(
+            b'Content-Type: ' + self.headers.get('Content-Type', '').encode() + b'\r\n\r\n' + body
+        )
+        if not message.is_multipart():
+            return self._error(400, 'Batch body must be multipart/mixed')
+
+        boundary = f'batch_{uuid.uuid4().hex}'
+        out = []
+        for part in message.get_payload():
+            request = _SubRequest(self, part.get_payload(decode=True))
+            content_id = (part.get('Content-ID') or '').strip('<>')
+            out.append(
+                f'--{boundary}\r\nContent-Type: application/http\r\n'
+                f'Content-ID: <response-{content_id}>\r\n\r\n'.encode()
+                + request.run() + b'\r\n'
+            )
+        out.append(f'--{boundary}--\r\n'.encode())
+
+        self.drive.count('batch')
+        self._send(200, b''.join(out), content_type=f'multipart/mixed; boundary={boundary}')
+
+    # -- files.list --------------------------------------------------------
+
+    def _files_list(self, params: Dict[str, str], fields: Dict[str, Any]) -> None:
+        self.drive.count('files.list')
+        try:
+            ids = self.drive.list(params.get('q'), params.get('orderBy'))
+        except (ValueError, IndexError) as e:
+            return self._error(400, f'Invalid query: {e}', 'invalid')
+
+        page_size = min(int(params.get('pageSize', 100)), MAX_PAGE_SIZE)
+        offset = int(params.get('pageToken') or 0)
+        page = ids[offset:offset + page_size]
+
+        files = []
+        for file_id in page:
+            record = self.drive.files.get(file_id)
+            if record is None:
+                continue
+            if 'md5Checksum' in fields.get('files', {}):
+                self.drive.md5(record)
+            files.append(self.drive.public(record))
+
+        result = {'files': files}
+        if offset + page_size < len(ids):
+            result['nextPageToken'] = str(offset + page_size)
+        self._json(select(result, fields))
+
+    def _changes_list(self, params: Dict[str, str], fields: Dict[str, Any]) -> None:
+        self.drive.count('changes.list')
+        start = int(params.get('pageToken') or 0)
+        page_size = min(int(params.get('pageSize', 100)), MAX_PAGE_SIZE)
+
+        with self.drive.lock:
+            log = self.drive.change_log[start:start + page_size]
+            end = start + len(log)
+            more = end < len(self.drive.change_log)
+
+            # Like Drive, a page reports each file once, in its latest state
+            last = {file_id: index for index, file_id in enumerate(log)}
+            changes = []
+            for file_id in sorted(last, key=last.get):
+                record = self.drive.files.get(file_id)
+                change = {'kind': 'drive#change', 'changeType': 'file', 'fileId': file_id,
+                          'removed': record is None}
+                if record is not None:
+                    if record['mimeType'] != FOLDER_MIME_TYPE:
+                        self.drive.md5(record)
+                    change['file'] = self.drive.public(record)
+                changes.append(change)
+
+        result = {'changes': changes}
+        if more:
+            result['nextPageToken'] = str(end)
+        else:
+            result['newStartPageToken'] = str(end)
+        self._json(select(result, fields))
+
+    # -- media -------------------------------------------------------------
+
+    def _get_media(self, record: Dict[str, Any]) -> None:
+        self.drive.count('files.get_media')
+        size = int(record.get('size', 0))
+        range_header = self.headers.get('Range')
+
+        if range_header:
+            match = re.match(r'bytes=(\d+)-(\d*)', range_header)
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else size - 1
+            end = min(end, size - 1)
+            if start >= size and size > 0:
+                return self._send(416, headers={'Content-Range': f'bytes */{size}'})
+            return self._stream(206, record, start, end,
+                                {'Content-Range': f'bytes {start}-{end}/{size}'},
+                                record['mimeType'])
+
+        self._stream(200, record, 0, size - 1, {}, record['mimeType'])
+
+    def _upload(self, method: str, parts: List[str], params: Dict[str, str]) -> None:
+        upload_id = params.get('upload_id')
+
+        if upload_id is None:
+            if params.get('uploadType') != 'resumable':
+                self._read_body()
+                return self._error(400, 'Only resumable uploads are supported')
+
+            body = json.loads(self._read_body() or b'{}')
+            upload_id = f'u{next(self.drive._ids):08d}'
+            target = parts[1] if len(parts) == 2 else None
+            path = os.path.join(self.drive.data_dir, upload_id)
+            self.drive.uploads[upload_id] = {
+                'meta': body,
+                'target': target,
+                'fields': params.get('fields'),
+                'add_parents': params.get('addParents', ''),
+                'remove_parents': params.get('removeParents', ''),
+                'path': path,
+                'fh': open(path, 'wb'),
+                'md5': hashlib.md5(),
+                'received': 0,
+                'total': self.headers.get('X-Upload-Content-Length'),
+                'mime_type': self.headers.get('X-Upload-Content-Type'),
+            }
+            self.drive.count('upload.session')
+            location = f'http://{self.headers["Host"]}{self.path.split("?")[0]}' \
+                       f'?uploadType=resumable&upload_id={upload_id}'
+            return self._send(200, headers={'Location': location})
+
+        session = self.drive.uploads.get(upload_id)
+        if session is None:
+            self._read_body()
+            return self._error(404, 'Upload session not found', 'notFound')
+
+        data = self._read_body()
+        self.drive.count('upload.chunk', bytes_in=len(data))
+
+        content_range = self.headers.get('Content-Range', '')
+        match = re.match(r'bytes (\d+)-(\d+)/(\d+|\*)', content_range)
+        total_match = re.match(r'bytes \*/(\d+|\*)', content_range)
+
+        if match:
+            start, total = int(match.group(1)), match.group(3)
+            if start != session['received']:
+                # Out of order chunk: report what we have so the client resends
+                return self._resume_incomplete(session)
+            session['fh'].write(data)
+            session['md5'].update(data)
+            session['received'] += len(data)
+        elif total_match:
+            total = total_match.group(1)
+        else:
+            total = str(len(data))
+            session['fh'].write(data)
+            session['md5'].update(data)
+            session['received'] += len(data)
+
+        if total != '*':
+            session['total'] = total
+
+        if session['total'] is None or session['received'] < int(session['total']):
+            return self._resume_incomplete(session)
+
+        session['fh'].close()
+        del self.drive.uploads[upload_id]
+        content = {'path': session['path']}
+        meta = session['meta']
+        size = session['received']
+        md5 = session['md5'].hexdigest()
+
+        if session['target']:
+            record = self.drive.update(
+                session['target'],
+                {**meta, 'size': str(size), 'quotaBytesUsed': str(size),
+                 '_content': content, 'md5Checksum': md5},
+                session['add_parents'], session['remove_parents']
+            )
+        else:
+            record = self.drive.add(
+                meta.get('name', 'Untitled'),
+                (meta.get('parents') or ['root'])[0],
+                meta.get('mimeType') or session['mime_type'] or 'application/octet-stream',
+                size=size,
+                content=content,
+                md5Checksum=md5,
+            )
+
+        fields = parse_fields(session['fields']) or parse_fields('id, name, mimeType')
+        self._json(select(self.drive.public(record), fields))
+
+    def _resume_incomplete(self, session: Dict[str, Any]) -> None:
+        headers = {}
+        if session['received']:
+            headers['Range'] = f"bytes=0-{session['received'] - 1}"
+        self._send(308, headers=headers, content_type='text/plain')
+
+    # -- admin -------------------------------------------------------------
+
+    def _admin(self, method: str, action: str) -> None:
+        if action == 'stats':
+            with self.drive.lock:
+                return self._json({
+                    'calls': dict(self.drive.stats),
+                    'bytes_in': self.drive.bytes_in,
+                    'bytes_out': self.drive.bytes_out,
+                })
+
+        body = json.loads(self._read_body() or b'{}')
+
+        if action == 'reset':
+            self.drive.reset()
+            return self._json({})
+
+        if action == 'reset_stats':
+            self.drive.reset_stats()
+            return self._json({})
+
+        if action == 'seed':
+            seeder = getattr(self.drive, f"seed_{body.pop('shape')}")
+            return self._json({'id': seeder(**body)})
+
+        if action == 'children':
+            # Admin actions skip latency and error injection, so setup never fails
+            with self.drive.lock:
+                return self._json({'ids': list(self.drive.children.get(body['parent'], []))})
+
+        if action == 'config':
+            for key in ('latency', 'bandwidth', 'error_rate'):
+                if key in body:
+                    setattr(self.server, key, float(body[key]))
+            if 'error_kinds' in body:
+                self.server.error_kinds = body['error_kinds'].split(',')
+            return self._json({})
+
+        self._error(404, f'Unknown admin action: {action}')
+
+
+class _SubRequest(FakeDriveHandler):
+    """One part of a batch request, routed like a normal request.
+
+    The response is written to a buffer and embedded in the batch response.
+    """
+
+    def __init__(self, parent: FakeDriveHandler, raw: bytes):
+        self.server = parent.server
+        self.client_address = parent.client_address
+        self.request_version = 'HTTP/1.1'
+        self.close_connection = False
+        self.wfile = io.BytesIO()
+
+        head, _, self._body = raw.partition(b'\r\n\r\n') if b'\r\n\r\n' in raw else raw.partition(b'\n\n')
+        request_line, _, header_block = head.partition(b'\n')
+        self.requestline = request_line.decode().strip()
+        self.command, self.path = self.requestline.split()[:2]
+        self.headers = http.client.parse_headers(io.BytesIO(header_block.lstrip(b'\r\n') + b'\r\n\r\n'))
+
+    def _read_body(self) -> bytes:
+        return self._body
+
+    def run(self) -> bytes:
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            self._route(self.command, url.path, params)
+        except KeyError as e:
+            self._error(404, f'File not found: {e}', 'notFound')
+        return self.wfile.getvalue()
+
+
+def serve(host: str = '127.0.0.1', port: int = 0, **options) -> FakeDriveServer:
+    """Start a fake Drive server in a background thread."""
+    drive = FakeDrive()
+    server = FakeDriveServer((host, port), drive, **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake Google Drive v3 API server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="Seconds added to every API request")
+    parser.add_argument('--bandwidth', type=float, default=0.0,
+                        help="Transfer rate limit in bytes/second (0 = unlimited)")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Fraction of API requests that fail")
+    parser.add_argument('--error-kinds', default='503',
+                        help="Comma-separated injected errors: 429, 500, 503, reset")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for error injection")
+    args = parser.parse_args()
+
+    drive = FakeDrive()
+    server = FakeDriveServer(
+        (args.host, args.port), drive,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        error_kinds=args.error_kinds,
+        seed=args.seed,
+    )
+    print(f"Fake Drive API listening on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutil.rmtree(drive.data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
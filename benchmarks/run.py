@@ -0,0 +1,385 @@
+"""Offline benchmark runner for gdup.
+
+Starts the fake Drive server (benchmarks/fake_drive.py) in a separate
+process, points gdup at it through GDUP_API_ENDPOINT with a throwaway
+config directory, and runs scripted workloads through the real CLI:
+
+    wide   ls / cd / tree on one folder with many files
+    deep   tree / cd on a deep folder hierarchy
+    small  up of a folder with many small files
+    large  up and down of one large file
+    manifest  down --from-file of many file IDs, with the async lookup
+              engine and with the thread pool (GDUP_ASYNC=1 / 0)
+
+For every command it reports ops/sec, MB/s and the API calls seen by the
+server.
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --workloads large --large-size 4G --bandwidth 50M
+    python -m benchmarks.run --latency 0.05 --error-rate 0.01 --json results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_size(value: str) -> int:
+    """Parse sizes like 512K, 64M or 4G into bytes."""
+    value = value.strip().upper()
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(float(value))
+
+
+@dataclass
+class Result:
+    workload: str
+    command: str
+    ops: int
+    seconds: float
+    errors: int = 0
+    bytes: int = 0
+    calls: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def ops_per_sec(self) -> float:
+        return self.ops / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.bytes / 1024 ** 2 / self.seconds if self.seconds else 0.0
+
+    @property
+    def api_calls(self) -> int:
+        return sum(count for name, count in self.calls.items() if not name.startswith('bytes.'))
+
+
+class FakeServer:
+    """Fake Drive server running in a child process."""
+
+    def __init__(self, latency: float, bandwidth: float, error_rate: float, error_kinds: str):
+        self.process = subprocess.Popen(
+            [
+                sys.executable, '-m', 'benchmarks.fake_drive',
+                '--port', '0',
+                '--latency', str(latency),
+                '--bandwidth', str(bandwidth),
+                '--error-rate', str(error_rate),
+                '--error-kinds', error_kinds,
+            ],
+            cwd=REPO_ROOT,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        line = self.process.stdout.readline()
+        if 'listening on' not in line:
+            self.process.kill()
+            raise RuntimeError(f"Fake Drive server failed to start: {line!r}")
+        self.url = line.rsplit(' ', 1)[1].strip()
+
+    def admin(self, action: str, **body) -> dict:
+        method = 'GET' if action == 'stats' else 'POST'
+        data = None if method == 'GET' else json.dumps(body).encode()
+        request = urllib.request.Request(f'{self.url}/_admin/{action}', data=data, method=method)
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read() or b'{}')
+
+    def list_ids(self, folder_id: str) -> List[str]:
+        """IDs of every entry in a folder (admin API: no latency or injected errors)."""
+        return self.admin('children', parent=folder_id)['ids']
+
+    def stop(self) -> None:
+        self.process.terminate()
+        self.process.wait()
+
+
+class Harness:
+    """Runs gdup commands against the fake server and collects results."""
+
+    def __init__(self, server: FakeServer, home: Path, use_subprocess: bool):
+        self.server = server
+        self.home = home
+        self.use_subprocess = use_subprocess
+        self.results: List[Result] = []
+
+        self.env = dict(os.environ)
+        self.env.update({
+            'HOME': str(home),
+            'APPDATA': str(home / 'AppData'),
+            'GDUP_API_ENDPOINT': server.url,
+        })
+        # Measure the API path itself unless limits are set explicitly
+        for name in ('GDUP_RATE_METADATA', 'GDUP_RATE_MEDIA'):
+            self.env.setdefault(name, '0')
+
+        self._write_token()
+
+        if not use_subprocess:
+            os.environ.update(self.env)
+
+    def _write_token(self) -> None:
+        if os.name == 'nt':
+            config_dir = self.home / 'AppData' / 'dup'
+        else:
+            config_dir = self.home / '.config' / 'dup'
+        config_dir.mkdir(parents=True, exist_ok=True)
+        (config_dir / 'token.json').write_text(json.dumps({
+            'token': 'benchmark-token',
+            'refresh_token': 'benchmark-refresh',
+            'client_id': 'benchmark',
+            'client_secret': 'benchmark',
+            'token_uri': f'{self.server.url}/token',
+            'scopes': ['https://www.googleapis.com/auth/drive'],
+            'expiry': '2999-01-01T00:00:00Z',
+        }))
+
+    def _invoke(self, argv: List[str]) -> int:
+        if self.use_subprocess:
+            completed = subprocess.run(
+                [sys.executable, '-m', 'dup', *argv],
+                cwd=REPO_ROOT, env=self.env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            return completed.returncode
+
+        from typer.main import get_command
+        from dup.cli import app
+
+        command = get_command(app)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            try:
+                code = command.main(args=argv, prog_name='gdup', standalone_mode=False)
+            except SystemExit as e:
+                code = e.code
+            except Exception:
+                code = 1
+        return code or 0
+
+    def run(self, workload: str, argv: List[str], repeat: int = 1, ops_per_run: int = 1,
+            label: Optional[str] = None) -> Result:
+        """Run a command ``repeat`` times and record throughput."""
+        self.server.admin('reset_stats')
+        errors = 0
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            if self._invoke(argv) != 0:
+                errors += 1
+        elapsed = time.perf_counter() - start
+
+        stats = self.server.admin('stats')
+        result = Result(
+            workload=workload,
+            command=label or ' '.join(argv),
+            ops=repeat * ops_per_run,
+            seconds=elapsed,
+            errors=errors,
+            bytes=stats['bytes_in'] + stats['bytes_out'],
+            calls=stats['calls'],
+        )
+        self.results.append(result)
+        return result
+
+    def cd_root(self) -> None:
+        self._invoke(['cd', '/'])
+
+    def set_env(self, name: str, value: Optional[str]) -> None:
+        """Set (or with None, unset) a GDUP_* variable for the following commands."""
+        environments = [self.env] if self.use_subprocess else [self.env, os.environ]
+        for environment in environments:
+            if value is None:
+                environment.pop(name, None)
+            else:
+                environment[name] = value
+
+    def clear_cache(self) -> None:
+        """Drop in-process cached metadata so runs do not answer from each other."""
+        if not self.use_subprocess:
+            from dup.cache import metadata_cache
+            metadata_cache.clear()
+
+
+# ---------------------------------------------------------------------------
+# Workloads
+# ---------------------------------------------------------------------------
+
+def workload_wide(h: Harness, args) -> None:
+    h.server.admin('seed', shape='wide', name='wide', count=args.wide_count)
+    h.cd_root()
+    h.run('wide', ['ls', 'wide'], repeat=args.repeat)
+    h.run('wide', ['tree', 'wide'], repeat=1)
+    for _ in range(args.repeat):
+        h.run('wide', ['cd', 'wide'])
+        h.cd_root()
+    _merge_last(h, args.repeat)
+
+
+def workload_deep(h: Harness, args) -> None:
+    h.server.admin('seed', shape='deep', name='deep', depth=args.deep_depth,
+                   fanout=args.deep_fanout, files_per_folder=args.deep_files)
+    h.cd_root()
+    h.run('deep', ['tree', 'deep'], repeat=1)
+    path = 'deep/' + '/'.join(f'level{d}_0' for d in range(1, args.deep_depth))
+    for _ in range(args.repeat):
+        h.run('deep', ['cd', path], label=f'cd <{args.deep_depth} levels>')
+        h.cd_root()
+    _merge_last(h, args.repeat)
+
+
+def workload_small(h: Harness, args) -> None:
+    with tempfile.TemporaryDirectory(prefix='gdup-bench-small-') as tmp:
+        folder = Path(tmp) / 'small'
+        folder.mkdir()
+        payload = os.urandom(args.small_size)
+        for i in range(args.small_count):
+            (folder / f'small_{i:05d}.bin').write_bytes(payload)
+
+        h.cd_root()
+        h.run('small', ['up', str(folder)], ops_per_run=args.small_count,
+              label=f'up <{args.small_count} files>')
+
+
+def workload_large(h: Harness, args) -> None:
+    with tempfile.TemporaryDirectory(prefix='gdup-bench-large-') as tmp:
+        source = Path(tmp) / 'large.bin'
+        block = os.urandom(1024 * 1024)
+        with open(source, 'wb') as fh:
+            remaining = args.large_size
+            while remaining > 0:
+                fh.write(block[:min(len(block), remaining)])
+                remaining -= len(block)
+
+        h.cd_root()
+        h.run('large', ['up', str(source)], label='up large.bin')
+        dest = Path(tmp) / 'downloaded.bin'
+        h.run('large', ['down', 'large.bin', '--dest', str(dest)], label='down large.bin')
+
+
+def workload_manifest(h: Harness, args) -> None:
+    folder_id = h.server.admin('seed', shape='wide', name='manifest', count=args.manifest_count)['id']
+    ids = h.server.list_ids(folder_id)
+
+    with tempfile.TemporaryDirectory(prefix='gdup-bench-manifest-') as tmp:
+        manifest = Path(tmp) / 'ids.txt'
+        manifest.write_text('\n'.join(ids) + '\n')
+        h.cd_root()
+        for engine, flag in (('threads', '0'), ('async', '1')):
+            h.set_env('GDUP_ASYNC', flag)
+            h.clear_cache()
+            h.run('manifest', ['down', '--from-file', str(manifest), '--dest', str(Path(tmp) / engine),
+                               '-P', str(args.manifest_parallel)],
+                  ops_per_run=len(ids), label=f'down --from-file <{len(ids)}> {engine}')
+        h.set_env('GDUP_ASYNC', None)
+
+
+def _merge_last(h: Harness, count: int) -> None:
+    """Merge the last ``count`` single-run results into one."""
+    if count <= 1:
+        return
+    runs = h.results[-count:]
+    del h.results[-count:]
+    merged = Result(runs[0].workload, runs[0].command, 0, 0.0)
+    for run in runs:
+        merged.ops += run.ops
+        merged.seconds += run.seconds
+        merged.errors += run.errors
+        merged.bytes += run.bytes
+        for name, value in run.calls.items():
+            merged.calls[name] = merged.calls.get(name, 0) + value
+    h.results.append(merged)
+
+
+WORKLOADS = {
+    'wide': workload_wide,
+    'deep': workload_deep,
+    'small': workload_small,
+    'large': workload_large,
+    'manifest': workload_manifest,
+}
+
+
+def print_report(results: List[Result]) -> None:
+    header = f"{'workload':<8} {'command':<26} {'ops':>6} {'sec':>8} {'ops/s':>9} " \
+             f"{'MB/s':>8} {'calls':>6} {'err':>4}  breakdown"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        breakdown = ', '.join(
+            f'{name}={count}' for name, count in sorted(r.calls.items())
+            if not name.startswith('bytes.')
+        )
+        print(f"{r.workload:<8} {r.command[:26]:<26} {r.ops:>6} {r.seconds:>8.3f} "
+              f"{r.ops_per_sec:>9.1f} {r.mb_per_sec:>8.1f} {r.api_calls:>6} {r.errors:>4}  {breakdown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gdup against a local fake Drive API")
+    parser.add_argument('--workloads', default='wide,deep,small,large,manifest',
+                        help="Comma-separated workloads: " + ', '.join(WORKLOADS))
+    parser.add_argument('--repeat', type=int, default=5, help="Repetitions for metadata commands")
+    parser.add_argument('--subprocess', action='store_true',
+                        help="Run every command as a separate gdup process (includes startup)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Per-request latency in seconds")
+    parser.add_argument('--bandwidth', type=parse_size, default=0,
+                        help="Server bandwidth in bytes/second, e.g. 50M (0 = unlimited)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of failed requests")
+    parser.add_argument('--error-kinds', default='503', help="Injected errors: 429, 500, 503, reset")
+    parser.add_argument('--wide-count', type=int, default=5000)
+    parser.add_argument('--deep-depth', type=int, default=6)
+    parser.add_argument('--deep-fanout', type=int, default=3)
+    parser.add_argument('--deep-files', type=int, default=3)
+    parser.add_argument('--small-count', type=int, default=200)
+    parser.add_argument('--small-size', type=parse_size, default=4096)
+    parser.add_argument('--large-size', type=parse_size, default=parse_size('256M'))
+    parser.add_argument('--manifest-count', type=int, default=500)
+    parser.add_argument('--manifest-parallel', type=int, default=16,
+                        help="Concurrent downloads in the manifest workload")
+    parser.add_argument('--json', dest='json_path', help="Also write results to a JSON file")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.workloads.split(',') if name.strip()]
+    unknown = [name for name in selected if name not in WORKLOADS]
+    if unknown:
+        parser.error(f"Unknown workloads: {', '.join(unknown)}")
+
+    server = FakeServer(args.latency, args.bandwidth, args.error_rate, args.error_kinds)
+    home = Path(tempfile.mkdtemp(prefix='gdup-bench-home-'))
+
+    try:
+        harness = Harness(server, home, args.subprocess)
+        for name in selected:
+            WORKLOADS[name](harness, args)
+    finally:
+        server.stop()
+        shutil.rmtree(home, ignore_errors=True)
+
+    print_report(harness.results)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as fh:
+            json.dump([
+                {**asdict(r), 'ops_per_sec': r.ops_per_sec, 'mb_per_sec': r.mb_per_sec,
+                 'api_calls': r.api_calls}
+                for r in harness.results
+            ], fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 """Entry point script for DUP."""
 
-from dup.cli import cli
+from dup.client import main
 
 if __name__ == "__main__":
-    cli()
+    main()
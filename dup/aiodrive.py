@@ -0,0 +1,297 @@
+"""Asyncio Google Drive metadata lookups.
+
+The helpers in drive.py block one OS thread per in-flight request. This
+module looks up file metadata on top of aiohttp instead, so many lookups
+run concurrently from a single thread over a pooled set of keep-alive
+connections.
+
+Requests share the CLI's rate-limit buckets, access token and metadata
+cache, and back off the same way as ``drive._call``; with ``--trace`` or
+``--metrics`` every exchange and API call is recorded like the blocking
+helpers' (see trace.py, metrics.py).
+
+With GDUP_ASYNC=1, ``gdup down --from-file`` looks up the manifest's
+file IDs through a BackgroundDrive, which runs the engine on an event
+loop thread for threaded command code.
+
+Requires the optional ``aiohttp`` dependency (``pip install gdup[async]``).
+
+Settings (environment variables):
+    GDUP_ASYNC         Use the async engine where gdup supports it and
+                       aiohttp is installed (default: off)
+    GDUP_HTTP_TIMEOUT  Socket connect and read timeout in seconds (default: 120)
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from typing import Dict, Any, Optional, Awaitable, Callable
+from .auth import get_credentials_manager
+from .cache import metadata_cache
+from .config import get_setting
+from .drive import FILE_FIELDS, MAX_RETRIES
+from .transport import get_api_root
+from . import metrics, ratelimit, trace
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+API_URL = f'{get_api_root()}/drive/v3'
+
+
+def available() -> bool:
+    """Whether the async engine can be used (aiohttp installed, GDUP_ASYNC on)."""
+    return aiohttp is not None and get_setting('async', False)
+
+
+class AsyncDriveError(Exception):
+    """Error response from the Drive API."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Drive API error {status}: {message}")
+        self.status = status
+
+
+class AsyncDrive:
+    """
+    Async Google Drive client with a shared connection pool.
+
+    Use as an async context manager so the pool is closed on exit.
+    """
+
+    def __init__(self, manager=None, max_connections: int = 100):
+        """
+        Args:
+            manager: CredentialsManager (default: the process-wide one)
+            max_connections: Maximum number of pooled connections
+        """
+        if aiohttp is None:
+            raise ImportError(
+                "The async engine requires aiohttp. Install it with: pip install gdup[async]"
+            )
+
+        self.manager = manager
+        self.max_connections = max_connections
+        self._session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self) -> None:
+        """Open the HTTP connection pool."""
+        if self.manager is None:
+            loop = asyncio.get_running_loop()
+            self.manager = await loop.run_in_executor(None, get_credentials_manager)
+
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        # No overall deadline, like the blocking transport: only stalls time out
+        socket_timeout = get_setting('http_timeout', 120.0)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=socket_timeout, sock_read=socket_timeout)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self) -> None:
+        """Close the HTTP connection pool."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _auth_headers(self) -> Dict[str, str]:
+        """Get authorization headers from the shared credentials manager."""
+        if self.manager.valid:
+            token = self.manager.get_token()
+        else:
+            # Only blocks when the background refresh fell behind
+            loop = asyncio.get_running_loop()
+            token = await loop.run_in_executor(None, self.manager.get_token)
+        return {'Authorization': f'Bearer {token}'}
+
+    async def _refresh_token(self) -> None:
+        """Refresh after the server rejected the token (deduplicated by the manager)."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.manager.refresh)
+
+    async def _request(self, method: str, url: str, bucket: str = 'metadata',
+                       expected=(200,), name: str = 'drive.request', **kwargs):
+        """
+        Send a request through the shared rate limiter with retries.
+
+        Mirrors ``drive._call``: connection errors are retried after a short
+        pause and rate limit responses back off every caller sharing the
+        bucket (or only this one when limiting is off). A 401 refreshes
+        the token once, as the blocking transport does.
+
+        Args:
+            name: API method name used for tracing and metrics
+
+        Returns:
+            The aiohttp response (caller must release it)
+        """
+        headers = kwargs.pop('headers', {})
+        tracer = trace.tracer
+        registry = metrics.registry
+        start = time.perf_counter()
+        sent = len(kwargs['data']) if isinstance(kwargs.get('data'), (bytes, bytearray)) else 0
+
+        retries = 0
+        sleep = 0.0
+        throttled = 0
+        status = None
+        received = 0
+        error = None
+        succeeded = False
+        refreshed = False
+
+        try:
+            for attempt in range(MAX_RETRIES):
+                retries = attempt
+                delay = ratelimit.get_bucket(bucket).reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    sleep += delay
+
+                exchange = time.perf_counter()
+                try:
+                    response = await self._session.request(
+                        method, url,
+                        headers={**headers, **(await self._auth_headers())},
+                        allow_redirects=False,
+                        **kwargs
+                    )
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    _record_http(method, url, None, sent, 0, exchange, type(e).__name__)
+                    if attempt < MAX_RETRIES - 1:
+                        await asyncio.sleep(1)
+                        sleep += 1
+                        continue
+                    error = type(e).__name__
+                    raise ConnectionError(
+                        f"Connection error after {MAX_RETRIES} attempts. Please check your internet connection."
+                    )
+
+                status = response.status
+                if status in expected:
+                    # Streamed bodies are not read yet; count what the server announced
+                    received = response.content_length or 0
+                    _record_http(method, url, status, sent, received, exchange)
+                    succeeded = True
+                    return response
+
+                body = await response.text()
+                response.release()
+                _record_http(method, url, status, sent, len(body), exchange)
+
+                if status == 401 and not refreshed and attempt < MAX_RETRIES - 1:
+                    refreshed = True
+                    await self._refresh_token()
+                    continue
+
+                rate_limited = status == 429 or (status == 403 and 'ratelimitexceeded' in body.lower())
+                if rate_limited:
+                    throttled += 1
+                    if attempt < MAX_RETRIES - 1:
+                        if ratelimit.get_bucket(bucket).rate > 0:
+                            ratelimit.penalize(bucket, 2 ** attempt)
+                        else:
+                            # No bucket to drain when limiting is off: back off this caller
+                            await asyncio.sleep(2 ** attempt)
+                            sleep += 2 ** attempt
+                        continue
+
+                error = f"HttpError {status}"
+                raise AsyncDriveError(status, body)
+        finally:
+            if tracer is not None:
+                tracer.call(name, bucket, time.perf_counter() - start, retries, sleep, status,
+                            received, sent, error)
+            if registry is not None:
+                registry.call(name, bucket, time.perf_counter() - start, retries, sleep, throttled,
+                              None if succeeded else error or 'error')
+
+    async def _json(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        """Send a metadata request and decode the JSON response."""
+        response = await self._request(method, url, **kwargs)
+        try:
+            return await response.json()
+        finally:
+            response.release()
+
+    async def get_file_by_id(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get file metadata by ID, through the shared metadata cache.
+
+        Returns:
+            File metadata dictionary or None if it cannot be fetched
+        """
+        cached = metadata_cache.get_file(file_id)
+        if cached is not None:
+            return cached
+
+        try:
+            file = await self._json(
+                'GET', f'{API_URL}/files/{file_id}',
+                params={'fields': FILE_FIELDS}, name='drive.files.get'
+            )
+        except Exception:
+            return None
+
+        metadata_cache.put_file(file)
+        return file
+
+
+class BackgroundDrive:
+    """
+    AsyncDrive running on its own event loop thread, for blocking code.
+
+    ``submit`` returns a concurrent.futures.Future, so threaded command
+    code can keep many requests in flight over one connection pool.
+    Cancelling the future cancels the request. Use as a context manager.
+    """
+
+    def __init__(self, max_connections: int = 100):
+        self.drive = AsyncDrive(max_connections=max_connections)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='gdup-async', daemon=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def start(self) -> None:
+        """Start the loop thread and open the connection pool."""
+        self._thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self.drive.open(), self._loop).result()
+        except BaseException:
+            self.close()
+            raise
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def submit(self, func: Callable[..., Awaitable], *args) -> concurrent.futures.Future:
+        """Schedule ``func(drive, *args)`` on the loop."""
+        return asyncio.run_coroutine_threadsafe(func(self.drive, *args), self._loop)
+
+    def close(self) -> None:
+        """Close the connection pool and stop the loop thread."""
+        if self._thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self.drive.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        self._loop.close()
+
+
+def _record_http(method: str, url: str, status: Optional[int], sent: int, received: int,
+                 start: float, error: Optional[str] = None) -> None:
+    """Record one HTTP exchange the way the blocking transport does."""
+    if trace.tracer is not None:
+        trace.tracer.http(method, url, status, sent, received, time.perf_counter() - start, error)
+    if metrics.registry is not None:
+        metrics.registry.http(status, sent, received)
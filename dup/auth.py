@@ -1,17 +1,46 @@
-"""Google OAuth authentication for DUP."""
+"""Google OAuth authentication for DUP.
+
+A process holds one OAuth credential, owned by a CredentialsManager. A
+background thread refreshes the access token a few minutes before it
+expires (GDUP_TOKEN_REFRESH_MARGIN), so worker threads read a valid token
+without waiting for a refresh, even in the middle of a long transfer.
+Refreshes happen under a lock, one at a time, and the token file is
+replaced atomically so concurrent gdup processes never read a partly
+written file.
+"""
 
 import os
 import json
+import calendar
+import tempfile
+import threading
+import time
 from pathlib import Path
+from typing import Optional
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-from .config import get_token_path
+from .config import get_token_path, get_setting
+from .transport import build_http
+from . import trace
 
 # If modifying these scopes, delete token.json
 SCOPES = ['https://www.googleapis.com/auth/drive']
 
+# Seconds before expiry at which the background thread refreshes the token
+DEFAULT_REFRESH_MARGIN = 300
+
+# Seconds to wait before retrying a failed background refresh
+REFRESH_RETRY = 30
+
+# Longest single sleep of the refresh thread; it re-checks the expiry after it
+# (a far-future expiry would overflow the wait otherwise)
+REFRESH_RECHECK = 3600
+
+# A refresh requested (e.g. after a 401) this soon after the last one is skipped
+REFRESH_DEDUP = 10
+
 
 def get_credentials_json() -> dict:
     """
@@ -32,10 +61,14 @@ def get_credentials_json() -> dict:
         return json.load(f)
 
 
-def authenticate() -> Credentials:
+def authenticate(interactive: bool = True) -> Credentials:
     """
     Authenticate with Google Drive using OAuth 2.0.
     
+    Args:
+        interactive: Start the browser login when there is no usable token;
+            when False, raise PermissionError instead
+    
     Returns:
         Credentials object for Google API access
     """
@@ -44,42 +77,269 @@ def authenticate() -> Credentials:
     
     # Load existing token if available
     if token_path.exists():
-        creds = Credentials.from_authorized_user_file(str(token_path), SCOPES)
+        with trace.span('auth.load_token'):
+            creds = Credentials.from_authorized_user_file(str(token_path), SCOPES)
     
     # If there are no (valid) credentials, let the user log in
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             try:
-                creds.refresh(Request())
+                with trace.span('auth.refresh'):
+                    creds.refresh(Request())
             except Exception:
                 # Refresh failed, need to re-authenticate
                 creds = None
         
         if not creds:
+            if not interactive:
+                raise PermissionError("Not authenticated with Google Drive")
             credentials_json = get_credentials_json()
             flow = InstalledAppFlow.from_client_config(
                 credentials_json,
                 SCOPES
             )
-            creds = flow.run_local_server(port=0)
+            with trace.span('auth.login'):
+                creds = flow.run_local_server(port=0)
         
         # Save the credentials for the next run
-        with open(token_path, 'w') as token:
-            token.write(creds.to_json())
+        save_token(creds, token_path)
     
     return creds
 
 
+def save_token(creds: Credentials, token_path: Path) -> None:
+    """
+    Write credentials to the token file atomically.
+    
+    The token is written to a temporary file in the same directory, which
+    then replaces the token file, so readers see either the old or the new
+    token, never a partial one.
+    """
+    fd, temp_path = tempfile.mkstemp(prefix='.token-', suffix='.json', dir=str(token_path.parent))
+    try:
+        with os.fdopen(fd, 'w') as token:
+            token.write(creds.to_json())
+            token.flush()
+            os.fsync(token.fileno())
+        os.chmod(temp_path, 0o600)
+        os.replace(temp_path, token_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _expires_at(creds: Credentials) -> Optional[float]:
+    """Expiry of a credential as a Unix timestamp (None if it does not expire)."""
+    if creds.expiry is None:
+        return None
+    return calendar.timegm(creds.expiry.timetuple())
+
+
+class ManagedCredentials:
+    """
+    Credentials-compatible view of a CredentialsManager.
+    
+    Implements what AuthorizedSession uses (token, valid, before_request,
+    refresh), always answering with the manager's current token.
+    """
+    
+    def __init__(self, manager: 'CredentialsManager'):
+        self._manager = manager
+    
+    @property
+    def token(self) -> str:
+        return self._manager.get_token()
+    
+    @property
+    def valid(self) -> bool:
+        return self._manager.valid
+    
+    def before_request(self, request, method, url, headers) -> None:
+        """Add the authorization header, refreshing only if the token expired."""
+        headers['authorization'] = f'Bearer {self._manager.get_token(request)}'
+    
+    def refresh(self, request) -> None:
+        """Refresh after the server rejected the token (e.g. it was revoked)."""
+        self._manager.refresh(request)
+
+
+class CredentialsManager:
+    """Single in-memory OAuth credential, refreshed ahead of expiry in the background."""
+    
+    def __init__(self, creds: Credentials, token_path: Path, margin: Optional[float] = None):
+        """
+        Args:
+            creds: Authenticated credentials
+            token_path: File the refreshed token is written to
+            margin: Seconds before expiry to refresh (default: GDUP_TOKEN_REFRESH_MARGIN)
+        """
+        self._creds = creds
+        self.token_path = token_path
+        self.margin = margin if margin is not None else get_setting('token_refresh_margin', DEFAULT_REFRESH_MARGIN)
+        self.credentials = ManagedCredentials(self)
+        
+        # Readers take (token, expiry) from one tuple, replaced whole after a refresh
+        self._state = (creds.token, _expires_at(creds))
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @property
+    def valid(self) -> bool:
+        """Whether the current token can still be used."""
+        token, expires_at = self._state
+        return token is not None and (expires_at is None or time.time() < expires_at)
+    
+    def get_token(self, request=None) -> str:
+        """
+        Get the current access token.
+        
+        Only blocks when the token has already expired, which the
+        background refresh normally prevents.
+        """
+        if not self.valid:
+            with self._lock:
+                if not self.valid:
+                    self._refresh(request)
+        return self._state[0]
+    
+    def refresh(self, request=None) -> None:
+        """Refresh the token now, unless another thread just did."""
+        with self._lock:
+            if time.monotonic() - self._refreshed_at >= REFRESH_DEDUP:
+                self._refresh(request)
+    
+    def _refresh(self, request=None) -> None:
+        # Caller holds the lock
+        if not self._adopt_saved():
+            with trace.span('auth.refresh'):
+                self._creds.refresh(request or Request())
+            save_token(self._creds, self.token_path)
+        self._state = (self._creds.token, _expires_at(self._creds))
+        self._refreshed_at = time.monotonic()
+    
+    def _adopt_saved(self) -> bool:
+        """Use a fresher token another gdup process already wrote, if there is one."""
+        try:
+            saved = Credentials.from_authorized_user_file(str(self.token_path), SCOPES)
+        except Exception:
+            return False
+        expires_at = _expires_at(saved)
+        current = self._state[1]
+        if saved.token == self._state[0] or expires_at is None or current is None:
+            return False
+        if expires_at - self.margin <= max(current, time.time()):
+            return False
+        self._creds = saved
+        return True
+    
+    def _due(self) -> bool:
+        expires_at = self._state[1]
+        return expires_at is not None and time.time() >= expires_at - self.margin
+    
+    def _run(self) -> None:
+        retry = None
+        while True:
+            expires_at = self._state[1]
+            if expires_at is None:
+                return
+            wait = retry if retry is not None else expires_at - self.margin - time.time()
+            if self._stop.wait(min(max(wait, 0), REFRESH_RECHECK)):
+                return
+            try:
+                with self._lock:
+                    if self._due():
+                        self._refresh()
+                retry = None
+            except Exception:
+                # The token may still be valid; workers keep using it until then
+                retry = REFRESH_RETRY
+    
+    def start(self) -> None:
+        """Start the background refresh thread (if the token expires and can be refreshed)."""
+        if self._thread is not None or self._state[1] is None or not self._creds.refresh_token:
+            return
+        self._thread = threading.Thread(target=self._run, name='gdup-token-refresh', daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_credentials_manager(interactive: bool = True) -> CredentialsManager:
+    """
+    Get the process-wide credentials manager, authenticating on first use.
+    
+    Args:
+        interactive: Allow the browser login on first use (see ``authenticate``)
+    
+    Returns:
+        CredentialsManager with its background refresh running
+    """
+    global _manager
+    
+    if _manager is not None:
+        return _manager
+    
+    with _manager_lock:
+        if _manager is None:
+            manager = CredentialsManager(authenticate(interactive), get_token_path())
+            manager.start()
+            _manager = manager
+    
+    return _manager
+
+
+_service = None
+_http = None
+_service_lock = threading.Lock()
+
+
 def get_drive_service():
     """
     Get authenticated Google Drive service.
     
+    The service is built once per process on top of a pooled, thread-safe
+    transport, so repeated calls reuse the same keep-alive connections.
+    
     Returns:
         Google Drive API service object
     """
-    creds = authenticate()
-    service = build('drive', 'v3', credentials=creds)
-    return service
+    global _service, _http
+    
+    if _service is not None:
+        return _service
+    
+    with _service_lock:
+        if _service is None:
+            _http = build_http(get_credentials_manager().credentials)
+            with trace.span('auth.build_service'):
+                _service = build('drive', 'v3', http=_http, cache_discovery=False)
+    
+    return _service
+
+
+def reset_drive_service() -> None:
+    """Drop the cached service so the next call re-authenticates."""
+    global _service, _http
+    
+    with _service_lock:
+        if _http is not None:
+            _http.close()
+        _service = None
+        _http = None
 
 
 def is_authenticated() -> bool:
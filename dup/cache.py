@@ -0,0 +1,179 @@
+"""In-memory metadata cache for DUP.
+
+Folder listings and file metadata are cached for a short time so that
+repeated lookups within a command (and across commands in ``gdup shell``)
+do not go back to the Drive API. Files seen in a listing are indexed by
+ID, which lets ``get_file_by_name`` and ``get_file_by_id`` answer from an
+earlier ``list_files`` call.
+
+Listings are also handed to the on-disk listing store (see listings.py)
+that shell completion reads. They are written on a background thread,
+and not at all while the cache is disabled.
+
+Every change a process makes to Drive bumps a generation stamp in the
+config directory. Long-lived processes (gdupd, ``gdup shell``) call
+``sync`` before each command and drop their cache when another process
+has written since, so a forwarded ``ls`` sees a file that ``gdup up``
+just uploaded.
+
+Settings (environment variables):
+    GDUP_CACHE_TTL  Seconds cached metadata stays valid (0 disables)
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from .config import get_config_dir, get_setting
+from .listings import ListingWriter, get_writer
+
+
+class MetadataCache:
+    """Thread-safe TTL cache of folder listings and file metadata."""
+
+    def __init__(self, ttl: float = 60.0, store: Optional[ListingWriter] = None,
+                 generation_path: Optional[Path] = None):
+        self.ttl = ttl
+        self.store = store
+        self.generation_path = generation_path
+        self._generation = self._read_generation()
+        self._lock = threading.Lock()
+        self._listings: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._files: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _fresh(self, entry) -> bool:
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get_listing(self, folder_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Get a cached folder listing, or None if missing or expired."""
+        with self._lock:
+            entry = self._listings.get(folder_id)
+            if self._fresh(entry):
+                self.hits += 1
+                return list(entry[1])
+            self.misses += 1
+            return None
+
+    def has_listing(self, folder_id: str) -> bool:
+        """Check for a fresh cached listing without counting a hit or miss."""
+        with self._lock:
+            return self._fresh(self._listings.get(folder_id))
+
+    def put_listing(self, folder_id: str, files: List[Dict[str, Any]]) -> None:
+        """Cache a folder listing and index its entries by ID."""
+        if not self.enabled:
+            return
+
+        if self.store is not None:
+            self.store.put(folder_id, files)
+
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._listings[folder_id] = (expires, list(files))
+            for file in files:
+                if 'id' in file:
+                    self._files[file['id']] = (expires, {'parents': [folder_id], **file})
+
+    def find_child(self, parent_id: str, name: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Look up a file by name in a cached listing.
+
+        Returns:
+            Tuple of (known, file). ``known`` is False when the parent's
+            listing is not cached; otherwise ``file`` is the match or None.
+        """
+        with self._lock:
+            entry = self._listings.get(parent_id)
+            if not self._fresh(entry):
+                self.misses += 1
+                return False, None
+
+            self.hits += 1
+            for file in entry[1]:
+                if file.get('name') == name:
+                    return True, {'parents': [parent_id], **file}
+            return True, None
+
+    def get_file(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Get cached metadata for a file, or None if missing or expired."""
+        with self._lock:
+            entry = self._files.get(file_id)
+            if self._fresh(entry):
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+            return None
+
+    def put_file(self, file: Dict[str, Any]) -> None:
+        """Cache metadata for a single file."""
+        if not self.enabled or 'id' not in file:
+            return
+
+        with self._lock:
+            self._files[file['id']] = (time.monotonic() + self.ttl, dict(file))
+
+    def invalidate(self, folder_id: str) -> None:
+        """Drop the cached listing (and metadata) of a folder after it changed."""
+        with self._lock:
+            self._listings.pop(folder_id, None)
+            self._files.pop(folder_id, None)
+
+        if self.store is not None:
+            self.store.mark_stale(folder_id)
+        self._bump_generation()
+
+    def _read_generation(self) -> Optional[str]:
+        if self.generation_path is None:
+            return None
+        try:
+            return self.generation_path.read_text()
+        except OSError:
+            return None
+
+    def _bump_generation(self) -> None:
+        """Tell other processes that Drive changed."""
+        if self.generation_path is None:
+            return
+        stamp = f"{os.getpid()}:{time.time_ns()}"
+        try:
+            self.generation_path.write_text(stamp)
+        except OSError:
+            return
+        with self._lock:
+            self._generation = stamp
+
+    def sync(self) -> bool:
+        """
+        Drop everything if another process changed Drive since the last sync.
+
+        Returns:
+            True if the cache was cleared
+        """
+        generation = self._read_generation()
+        with self._lock:
+            if generation == self._generation:
+                return False
+            self._generation = generation
+        self.clear()
+        return True
+
+    def clear(self) -> None:
+        """Drop everything."""
+        with self._lock:
+            self._listings.clear()
+            self._files.clear()
+
+
+def get_generation_path() -> Path:
+    """Get the path of the metadata generation stamp."""
+    return get_config_dir() / 'cache-generation'
+
+
+metadata_cache = MetadataCache(get_setting('cache_ttl', 60.0), get_writer(), get_generation_path())
@@ -2,8 +2,10 @@
 
 import typer
 from rich.console import Console
-from typing import Optional
+from typing import List, Optional
 from . import __version__
+from . import trace
+from . import metrics
 from .auth import authenticate, is_authenticated, get_drive_service
 from .commands.ls import ls_command
 from .commands.tree import tree_command
@@ -12,14 +14,27 @@ from .commands.pwd import pwd_command
 from .commands.upload import upload_command
 from .commands.link import link_command
 from .commands.download import download_command
+from .commands.shell import shell_command
+from .commands.jobs import jobs_app
+from .commands.cache import cache_app
+from .commands.find import find_command
+from .commands.du import du_command
+from .commands.watch import watch_command
+from .commands.pull import pull_command
 
 app = typer.Typer(
     name="gdup",
     help="Google Drive Upload Program - Manage Google Drive from the command line",
     add_completion=False
 )
+app.add_typer(jobs_app, name="jobs")
+app.add_typer(cache_app, name="cache")
 console = Console()
 
+# Commands that only touch local state and run without a login
+# ('jobs run' checks for one itself)
+LOCAL_COMMANDS = {'login', 'completion', 'version', 'jobs', 'cache'}
+
 
 @app.command()
 def login():
@@ -43,15 +58,22 @@ def login():
 
 
 @app.command()
-def ls(path: Optional[str] = typer.Argument(None, help="Path to list (optional)")):
+def ls(
+    path: Optional[str] = typer.Argument(None, help="Path to list (optional)"),
+    output_format: Optional[str] = typer.Option(None, "--format", help="Machine-readable output: ndjson or tsv")
+):
     """List files in current or specified Drive folder."""
-    ls_command(path)
+    ls_command(path, output_format)
 
 
 @app.command()
-def tree(path: Optional[str] = typer.Argument(None, help="Path to show tree for (optional)")):
+def tree(
+    path: Optional[str] = typer.Argument(None, help="Path to show tree for (optional)"),
+    plain: bool = typer.Option(False, "--plain", help="Plain text output without formatting (faster for large trees)"),
+    output_format: Optional[str] = typer.Option(None, "--format", help="Machine-readable output: ndjson or tsv")
+):
     """Show recursive folder structure."""
-    tree_command(path)
+    tree_command(path, plain, output_format)
 
 
 @app.command()
@@ -67,24 +89,109 @@ def pwd():
 
 
 @app.command()
-def up(path: str = typer.Argument(..., help="Local file or folder to upload")):
-    """Upload file or folder to current Drive location."""
-    upload_command(path)
+def up(
+    paths: Optional[List[str]] = typer.Argument(None, help="Local files, folders or glob patterns to upload"),
+    queue: bool = typer.Option(False, "--queue", "-q", help="Add to the transfer queue instead of uploading now"),
+    priority: int = typer.Option(0, "--priority", "-p", help="Queue priority (higher runs first)"),
+    parallel: Optional[int] = typer.Option(None, "--parallel", "-P", help="Files uploaded at the same time (default: GDUP_PARALLEL or 4)"),
+    from_file: Optional[str] = typer.Option(None, "--from-file", "-f", help="Upload the paths listed in a manifest ('-' for stdin)"),
+    log: Optional[str] = typer.Option(None, "--log", help="Append NDJSON results here; items already logged as ok are skipped"),
+    verify: Optional[bool] = typer.Option(None, "--verify/--no-verify", help="Check uploads against Drive's MD5 checksum (default: GDUP_VERIFY)")
+):
+    """Upload files or folders to current Drive location."""
+    upload_command(paths, queue, priority, parallel, from_file, log, verify)
+
+
+@app.command()
+def find(
+    name: Optional[str] = typer.Argument(None, help="Name or glob pattern to search for"),
+    file_type: Optional[str] = typer.Option(None, "--type", "-t", help="folder, file, doc, sheet, slides, pdf, image, video, audio or a MIME type"),
+    larger: Optional[str] = typer.Option(None, "--larger", help="Only files larger than this size (e.g. 10M)"),
+    smaller: Optional[str] = typer.Option(None, "--smaller", help="Only files smaller than this size"),
+    newer: Optional[str] = typer.Option(None, "--newer", help="Modified after this time (e.g. 7d, 12h, 2024-01-31)"),
+    older: Optional[str] = typer.Option(None, "--older", help="Modified before this time"),
+    text: Optional[str] = typer.Option(None, "--contains", "-c", help="Full-text search in names and content"),
+    within: Optional[str] = typer.Option(None, "--in", help="Only show results under this folder"),
+    long: bool = typer.Option(False, "--long", "-l", help="Show size and modification date"),
+    limit: Optional[int] = typer.Option(None, "--limit", "-n", help="Stop after this many results")
+):
+    """Search the whole drive with one server-side query."""
+    find_command(name, file_type, larger, smaller, newer, older, text, within, long, limit)
+
+
+@app.command()
+def du(
+    path: Optional[str] = typer.Argument(None, help="Folder to analyze (default: current folder)"),
+    top: int = typer.Option(20, "--top", "-n", help="Number of folders to show")
+):
+    """Show the folders using the most storage."""
+    du_command(path, top)
 
 
 @app.command()
-def link(name: str = typer.Argument(..., help="File name to get link for")):
-    """Generate shareable Google Drive link for a file."""
-    link_command(name)
+def link(
+    names: List[str] = typer.Argument(..., help="File names or glob patterns to get links for"),
+    recursive: bool = typer.Option(False, "--recursive", "-r", help="Link every file below the given folders"),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Make private files public without asking"),
+    output_format: Optional[str] = typer.Option(None, "--format", help="Machine-readable output: ndjson or csv")
+):
+    """Generate shareable Google Drive links for files."""
+    link_command(names, recursive, yes, output_format)
 
 
 @app.command()
 def down(
-    filename: str = typer.Argument(..., help="File name to download"),
-    destination: str = typer.Option(".", "--dest", "-d", help="Download destination (default: current directory)")
+    filename: Optional[str] = typer.Argument(None, help="File name or glob pattern (e.g. '*.csv') to download"),
+    destination: str = typer.Option(".", "--dest", "-d", help="Download destination (default: current directory)"),
+    queue: bool = typer.Option(False, "--queue", "-q", help="Add to the transfer queue instead of downloading now"),
+    priority: int = typer.Option(0, "--priority", "-p", help="Queue priority (higher runs first)"),
+    parallel: Optional[int] = typer.Option(None, "--parallel", "-P", help="Files downloaded at the same time (default: GDUP_PARALLEL or 4)"),
+    from_file: Optional[str] = typer.Option(None, "--from-file", "-f", help="Download the file IDs listed in a manifest ('-' for stdin)"),
+    log: Optional[str] = typer.Option(None, "--log", help="Append NDJSON results here; items already logged as ok are skipped"),
+    verify: Optional[bool] = typer.Option(None, "--verify/--no-verify", help="Check downloads against Drive's MD5 checksum (default: GDUP_VERIFY)")
+):
+    """Download files from current Drive location."""
+    download_command(filename, destination, queue, priority, parallel, from_file, log, verify)
+
+
+@app.command()
+def watch(
+    local_dir: str = typer.Argument(..., help="Local directory to mirror"),
+    to: Optional[str] = typer.Option(None, "--to", help="Drive folder to mirror into (default: a folder named like the directory in the current folder)"),
+    once: bool = typer.Option(False, "--once", help="Sync once and exit instead of watching"),
+    parallel: Optional[int] = typer.Option(None, "--parallel", "-P", help="Files uploaded at the same time (default: GDUP_PARALLEL or 4)"),
+    exclude: Optional[List[str]] = typer.Option(None, "--exclude", "-x", help="Skip names matching this pattern (repeatable)"),
+    verify: Optional[bool] = typer.Option(None, "--verify/--no-verify", help="Check uploads against Drive's MD5 checksum (default: GDUP_VERIFY)")
+):
+    """Mirror a local directory to Drive, uploading changes as they happen."""
+    watch_command(local_dir, to, once, parallel, exclude, verify)
+
+
+@app.command()
+def pull(
+    remote: str = typer.Argument(..., help="Drive folder to download"),
+    local_dir: Optional[str] = typer.Argument(None, help="Local directory (default: the folder's name)"),
+    parallel: Optional[int] = typer.Option(None, "--parallel", "-P", help="Files downloaded at the same time (default: GDUP_PARALLEL or 4)"),
+    verify: Optional[bool] = typer.Option(None, "--verify/--no-verify", help="Check downloads against Drive's MD5 checksum (default: GDUP_VERIFY)")
 ):
-    """Download a file from current Drive location."""
-    download_command(filename, destination)
+    """Download a Drive folder, then only what changed in it since the last pull."""
+    pull_command(remote, local_dir, parallel, verify)
+
+
+@app.command()
+def shell():
+    """Start an interactive shell that keeps the Drive connection warm."""
+    shell_command()
+
+
+@app.command()
+def completion(shell: str = typer.Argument(..., help="bash or zsh")):
+    """Print a shell completion script (e.g. eval "$(gdup completion bash)")."""
+    from .completion import SCRIPTS
+    if shell not in SCRIPTS:
+        console.print(f"[red]Error:[/red] Unsupported shell: {shell} (use bash or zsh)")
+        raise typer.Exit(1)
+    typer.echo(SCRIPTS[shell], nl=False)
 
 
 @app.command()
@@ -102,6 +209,30 @@ def main(
         "-v",
         help="Show version information",
         is_eager=True
+    ),
+    trace_file: Optional[str] = typer.Option(
+        None,
+        "--trace",
+        help="Write per-request timing to a JSON lines file and print a summary",
+        envvar="GDUP_TRACE"
+    ),
+    metrics_file: Optional[str] = typer.Option(
+        None,
+        "--metrics",
+        help="Keep throughput metrics in an OpenMetrics text file",
+        envvar="GDUP_METRICS"
+    ),
+    metrics_port: Optional[int] = typer.Option(
+        None,
+        "--metrics-port",
+        help="Serve OpenMetrics on http://127.0.0.1:PORT/metrics while running",
+        envvar="GDUP_METRICS_PORT"
+    ),
+    metrics_summary: Optional[str] = typer.Option(
+        None,
+        "--metrics-summary",
+        help="Write a JSON summary of throughput, retries and cache hits when done",
+        envvar="GDUP_METRICS_SUMMARY"
     )
 ):
     """
@@ -118,8 +249,18 @@ def main(
         console.print(ctx.get_help())
         raise typer.Exit()
     
+    if trace_file:
+        trace.start(trace_file)
+    
+    if metrics_file or metrics_port or metrics_summary:
+        try:
+            metrics.start(metrics_file, metrics_port or 0, metrics_summary)
+        except OSError as e:
+            console.print(f"[red]Error:[/red] Cannot start metrics: {str(e)}")
+            raise typer.Exit(1)
+    
     # Check if user is authenticated for commands that need it
-    if ctx.invoked_subcommand and ctx.invoked_subcommand != 'login':
+    if ctx.invoked_subcommand and ctx.invoked_subcommand not in LOCAL_COMMANDS:
         if not is_authenticated():
             console.print("[yellow]⚠️  Not authenticated with Google Drive[/yellow]")
             console.print("Run [cyan]gdup login[/cyan] to authenticate")
@@ -128,7 +269,11 @@ def main(
 
 def cli():
     """Entry point for the CLI."""
-    app()
+    try:
+        app()
+    finally:
+        trace.finish()
+        metrics.finish()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,133 @@
+"""Thin gdup entry point that forwards commands to a running gdupd.
+
+This module only imports the standard library and dup.config, so a
+forwarded command does not pay for importing the Google client libraries.
+When no daemon is running, or it does not start the command within
+GDUP_DAEMON_TIMEOUT seconds (e.g. because it is busy with another
+client's command), the command runs in-process as usual.
+"""
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+from typing import List, Optional
+from .config import get_config_dir, get_setting
+
+# Commands the daemon runs on behalf of clients (non-interactive only).
+# Transfers are not forwarded: the daemon runs one command at a time, and
+# a long upload or download would hold up every other client.
+FORWARDED_COMMANDS = {'ls', 'cd', 'pwd', 'tree', 'find', 'du'}
+
+
+def get_socket_path() -> Path:
+    """Get the path of the daemon's Unix socket."""
+    return get_config_dir() / 'gdupd.sock'
+
+
+def connect(timeout: Optional[float] = None) -> Optional[socket.socket]:
+    """
+    Connect to the daemon socket.
+
+    Returns:
+        Connected socket, or None if no daemon is listening
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+
+    path = get_socket_path()
+    if not path.exists():
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def send_request(sock: socket.socket, request: dict):
+    """Send a request and yield the response frames."""
+    sock.sendall(json.dumps(request).encode() + b'\n')
+    with sock.makefile('rb') as reader:
+        for line in reader:
+            yield json.loads(line)
+
+
+def forward(argv: List[str]) -> Optional[int]:
+    """
+    Run a command through the daemon if one is running.
+
+    Args:
+        argv: Command line arguments (without the program name)
+
+    Returns:
+        Exit code, or None if the command must run in-process
+    """
+    if not argv or argv[0] not in FORWARDED_COMMANDS:
+        return None
+    if os.getenv('GDUP_NO_DAEMON') or os.getenv('GDUP_TRACE') or any(
+        os.getenv(name) for name in ('GDUP_METRICS', 'GDUP_METRICS_PORT', 'GDUP_METRICS_SUMMARY')
+    ):
+        return None
+    if '-' in argv:
+        return None  # Reads stdin, which the daemon cannot see
+
+    # Bounds the connect and the wait for the daemon to start the command
+    timeout = get_setting('daemon_timeout', 2.0)
+    sock = connect(timeout=timeout if timeout > 0 else None)
+    if sock is None:
+        return None
+
+    try:
+        size = os.get_terminal_size(sys.stdout.fileno())
+        columns = size.columns
+    except (OSError, ValueError):
+        columns = None
+
+    request = {
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'tty': sys.stdout.isatty(),
+        'columns': columns,
+    }
+
+    exit_code = None
+    started = False
+    try:
+        with sock:
+            for frame in send_request(sock, request):
+                if not started:
+                    started = True
+                    sock.settimeout(None)  # The command is running; wait for it
+                if 'out' in frame:
+                    sys.stdout.write(frame['out'])
+                    sys.stdout.flush()
+                elif 'exit' in frame:
+                    exit_code = frame['exit']
+    except (OSError, ValueError):
+        pass  # Includes socket.timeout: the daemon did not start the command in time
+
+    if exit_code is None:
+        # Daemon went away or is busy; only fall back if the command never started
+        return 1 if started else None
+    return exit_code
+
+
+def main():
+    """Entry point for the gdup command."""
+    if sys.argv[1:2] == ['__complete']:
+        # Shell completion answers from local data only and must be fast
+        from .completion import run
+        sys.exit(run(sys.argv[2:]))
+
+    exit_code = forward(sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+    from .cli import cli
+    cli()
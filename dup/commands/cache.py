@@ -0,0 +1,77 @@
+"""Local file cache commands."""
+
+import typer
+from typing import Optional
+from rich.console import Console
+from rich.table import Table
+from ..drive import get_export_cache, get_blob_store
+from .ls import format_size
+
+console = Console()
+
+cache_app = typer.Typer(help="Show and clear the local export and download caches.", invoke_without_command=True)
+
+CACHES = {
+    'exports': get_export_cache,
+    'blobs': get_blob_store,
+}
+
+
+def print_caches() -> None:
+    """Print usage, hit rate and bytes saved of each cache."""
+    table = Table(show_header=True, header_style="bold cyan")
+    table.add_column("Cache")
+    table.add_column("Files", justify="right")
+    table.add_column("Size", justify="right")
+    table.add_column("Hits", justify="right")
+    table.add_column("Misses", justify="right")
+    table.add_column("Hit rate", justify="right")
+    table.add_column("Saved", justify="right")
+    table.add_column("Evicted", justify="right")
+
+    for name, get_cache in CACHES.items():
+        cache = get_cache()
+        if cache is None:
+            table.add_row(name, "[dim]off[/dim]", "-", "-", "-", "-", "-", "-")
+            continue
+        stats = cache.stats()
+        table.add_row(
+            name,
+            str(stats['entries']),
+            f"{format_size(stats['bytes'])} of {format_size(stats['max_bytes'])}",
+            str(stats['hits']),
+            str(stats['misses']),
+            f"{stats['hit_rate'] * 100:.0f}%",
+            format_size(stats['bytes_saved']),
+            str(stats['evictions']),
+        )
+
+    console.print(table)
+
+
+@cache_app.callback()
+def cache_callback(ctx: typer.Context):
+    """Show usage, hit rate and bytes saved of the local caches."""
+    if ctx.invoked_subcommand is None:
+        try:
+            print_caches()
+        except Exception as e:
+            console.print(f"[red]Error:[/red] {str(e)}")
+            raise typer.Exit(1)
+
+
+@cache_app.command("clear")
+def clear_command(name: Optional[str] = typer.Argument(None, help="exports or blobs (default: both)")):
+    """Remove cached files."""
+    if name is not None and name not in CACHES:
+        console.print(f"[red]Error:[/red] Unknown cache: {name} (use {' or '.join(CACHES)})")
+        raise typer.Exit(1)
+
+    for cache_name, get_cache in CACHES.items():
+        if name is not None and cache_name != name:
+            continue
+        cache = get_cache()
+        if cache is None:
+            continue
+        count = cache.clear()
+        console.print(f"[green]✓ Removed {count} file(s) from {cache_name}[/green]")
@@ -4,6 +4,7 @@ import typer
 from rich.console import Console
 from ..drive import resolve_path, get_full_path, is_folder, get_file_by_id
 from ..config import get_current_folder_id, set_current_folder
+from .. import prefetch
 
 console = Console()
 
@@ -35,6 +36,9 @@ def cd_command(path: str):
         
         console.print(f"[green]Changed to:[/green] [cyan]{new_path}[/cyan]")
         
+        # The next command is most likely an ls or a cd into a subfolder
+        prefetch.schedule(new_folder_id)
+        
     except Exception as e:
         console.print(f"[red]Error:[/red] {str(e)}")
         raise typer.Exit(1)
@@ -1,21 +1,258 @@
 """Download file command."""
 
+import itertools
 import os
 import typer
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn, TimeRemainingColumn
-from ..drive import get_file_by_name, download_file, is_folder
+from ..drive import get_file_by_name, get_file_by_id, download_file, is_folder, is_glob, find_files
 from ..config import get_current_folder_id
+from ..jobs import JobStore
+from ..manifest import read_manifest, ResultLog
+from ..pull import disambiguate
+from ..transfer import Transfer, run_transfers
 
 console = Console()
 
+# Metadata lookups for --from-file downloads: threads used without the
+# async engine, and lookups kept running ahead of the downloads
+LOOKUP_WORKERS = 8
+LOOKUP_AHEAD = 64
 
-def download_command(filename: str, destination: str = "."):
+
+def local_name(file, taken: set) -> str:
+    """
+    Name to save a file under, keeping files with the same Drive name apart.
+    
+    Drive allows several files with one name in a folder; every one after
+    the first gets its ID added, as ``gdup pull`` does.
+    """
+    name = file['name']
+    if name in taken:
+        name = disambiguate(name, file['id'])
+    taken.add(name)
+    return name
+
+
+def download_matching(pattern: str, folder_id: str, destination: str, queue: bool = False,
+                      priority: int = 0, parallel: Optional[int] = None, verify: Optional[bool] = None):
+    """Download every file in a folder whose name matches a glob pattern."""
+    dest_dir = Path(destination)
+    if dest_dir.exists() and not dest_dir.is_dir():
+        console.print(f"[red]Error:[/red] Destination must be a directory: {destination}")
+        raise typer.Exit(1)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    
+    taken = set()
+    if queue:
+        store = JobStore()
+        count = 0
+        with console.status("[bold green]Finding files..."):
+            for file in find_files(pattern, folder_id, files_only=True):
+                name = local_name(file, taken)
+                store.add('down', file['id'], str((dest_dir / name).resolve()), name,
+                          priority, int(file.get('size') or 0))
+                count += 1
+        if not count:
+            console.print(f"[red]Error:[/red] No files match: {pattern}")
+            raise typer.Exit(1)
+        console.print(f"[green]✓ Queued {count} download(s)[/green]")
+        console.print("[dim]Run 'gdup jobs run' to start them.[/dim]")
+        return
+    
+    matches = find_files(pattern, folder_id, files_only=True)
+    with console.status("[bold green]Finding files..."):
+        first = next(matches, None)
+    if first is None:
+        console.print(f"[red]Error:[/red] No files match: {pattern}")
+        raise typer.Exit(1)
+    
+    def transfers():
+        # Later result pages are fetched while the first files download
+        for file in itertools.chain([first], matches):
+            name = local_name(file, taken)
+            dest_file = str(dest_dir / name)
+            yield Transfer(
+                name,
+                int(file.get('size') or 0),
+                lambda callback, file_id=file['id'], dest_file=dest_file: download_file(file_id, dest_file, callback, verify=verify)
+            )
+    
+    results = run_transfers(transfers(), console, "Downloading", parallel)
+    
+    failed = [t for t in results if t.error]
+    console.print(f"[green]✓ Downloaded {len(results) - len(failed)} file(s)[/green] to {dest_dir}")
+    if failed:
+        console.print(f"[red]✗ {len(failed)} file(s) failed[/red]")
+        raise typer.Exit(1)
+
+
+def queue_manifest(store: JobStore, manifest: str, destination: str, priority: int = 0) -> int:
+    """
+    Queue every file ID of a manifest for download.
+    
+    Returns:
+        Number of jobs queued
+    """
+    dest_dir = Path(destination)
+    taken = set()
+    count = 0
+    for item in read_manifest(manifest, 'id'):
+        file = get_file_by_id(item['id'])
+        if not file:
+            raise FileNotFoundError(f"File not found: {item['id']}")
+        if is_folder(file):
+            raise ValueError(f"'{file['name']}' is a folder")
+        dest_file = Path(item['dest']) if item.get('dest') else dest_dir / local_name(file, taken)
+        dest_file.parent.mkdir(parents=True, exist_ok=True)
+        store.add('down', file['id'], str(dest_file.resolve()), dest_file.name,
+                  priority, int(file.get('size') or 0))
+        count += 1
+    return count
+
+
+def download_manifest(manifest: str, destination: str, log_path: Optional[str] = None,
+                      parallel: Optional[int] = None, verify: Optional[bool] = None):
+    """
+    Download every file ID of a manifest through the parallel engine.
+    
+    Items already logged as successful in ``log_path`` are skipped.
+    """
+    dest_dir = Path(destination)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    
+    log = ResultLog(log_path)
+    done = log.completed('id')
+    skipped = 0
+    taken = set()
+    
+    def pending():
+        nonlocal skipped
+        for item in read_manifest(manifest, 'id'):
+            if item['id'] in done:
+                skipped += 1
+                continue
+            yield item
+    
+    def lookup(item):
+        return item, get_file_by_id(item['id'])
+    
+    async def lookup_async(drive, item):
+        return item, await drive.get_file_by_id(item['id'])
+    
+    def transfer(item, file):
+        if not file:
+            return Transfer.failing(item['id'], FileNotFoundError(f"File not found: {item['id']}"), item)
+        if is_folder(file):
+            return Transfer.failing(file['name'], ValueError(f"'{file['name']}' is a folder"), item)
+        dest_file = str(Path(item['dest']) if item.get('dest') else dest_dir / local_name(file, taken))
+        Path(dest_file).parent.mkdir(parents=True, exist_ok=True)
+        return Transfer(
+            file['name'],
+            int(file.get('size') or 0),
+            lambda callback, file_id=file['id'], dest_file=dest_file: download_file(file_id, dest_file, callback, verify=verify),
+            item
+        )
+    
+    def transfers(submit):
+        # Metadata lookups run a bounded distance ahead of the downloads;
+        # the ones still pending are dropped if we stop early
+        lookups = deque()
+        try:
+            for item in pending():
+                lookups.append(submit(item))
+                if len(lookups) >= LOOKUP_AHEAD:
+                    yield transfer(*lookups.popleft().result())
+            while lookups:
+                yield transfer(*lookups.popleft().result())
+        finally:
+            for future in lookups:
+                future.cancel()
+    
+    def on_done(transfer: Transfer):
+        log.write({
+            'op': 'down',
+            'id': transfer.item['id'],
+            'name': transfer.name,
+            'path': transfer.result,
+            'bytes': transfer.size,
+            'seconds': round(transfer.seconds, 3),
+            'status': 'error' if transfer.error else 'ok',
+            'error': str(transfer.error) if transfer.error else None,
+        })
+    
+    from .. import aiodrive  # Imported here: aiohttp is slow to import
+    if aiodrive.available():
+        # One event loop keeps every look-ahead lookup in flight at once
+        pool = aiodrive.BackgroundDrive(max_connections=LOOKUP_AHEAD)
+        pool.start()
+        items = transfers(lambda item: pool.submit(lookup_async, item))
+        close_pool = pool.close
+    else:
+        pool = ThreadPoolExecutor(max_workers=LOOKUP_WORKERS, thread_name_prefix='gdup-lookup')
+        items = transfers(lambda item: pool.submit(lookup, item))
+        close_pool = lambda: pool.shutdown(wait=True)
+    try:
+        # run_transfers returns only once every submitted transfer is done,
+        # so no result is written after the log is closed
+        results = run_transfers(items, console, "Downloading", parallel, on_done)
+    finally:
+        items.close()
+        close_pool()
+        log.close()
+    
+    failed = sum(1 for t in results if t.error)
+    console.print(f"[green]✓ Downloaded {len(results) - failed} file(s)[/green] to {dest_dir}")
+    if skipped:
+        console.print(f"[dim]Skipped {skipped} file(s) already downloaded according to {log_path}[/dim]")
+    if failed:
+        console.print(f"[red]✗ {failed} file(s) failed[/red]")
+        raise typer.Exit(1)
+
+
+def download_command(filename: Optional[str], destination: str = ".", queue: bool = False, priority: int = 0,
+                     parallel: Optional[int] = None, from_file: Optional[str] = None,
+                     log: Optional[str] = None, verify: Optional[bool] = None):
     """Download a file from current Drive location to local machine."""
     try:
+        if from_file and filename:
+            console.print("[red]Error:[/red] Give either a file name or --from-file, not both")
+            raise typer.Exit(1)
+        if priority and not queue:
+            console.print("[red]Error:[/red] --priority only applies with --queue")
+            raise typer.Exit(1)
+        if log and not from_file:
+            console.print("[red]Error:[/red] --log only applies with --from-file")
+            raise typer.Exit(1)
+        if queue and log:
+            console.print("[red]Error:[/red] --log cannot be used with --queue (see 'gdup jobs' for results)")
+            raise typer.Exit(1)
+        
+        if from_file:
+            if queue:
+                store = JobStore()
+                with console.status("[bold green]Queueing..."):
+                    count = queue_manifest(store, from_file, destination, priority)
+                console.print(f"[green]✓ Queued {count} download(s)[/green]")
+                console.print("[dim]Run 'gdup jobs run' to start them.[/dim]")
+                return
+            download_manifest(from_file, destination, log, parallel, verify)
+            return
+        
+        if not filename:
+            console.print("[red]Error:[/red] Give a file name to download or --from-file")
+            raise typer.Exit(1)
+        
         folder_id = get_current_folder_id()
         
+        if is_glob(filename):
+            download_matching(filename, folder_id, destination, queue, priority, parallel, verify)
+            return
+        
         # Find the file
         file = get_file_by_name(filename, folder_id)
         
@@ -43,6 +280,13 @@ def download_command(filename: str, destination: str = "."):
         # Ensure parent directory exists
         dest_file.parent.mkdir(parents=True, exist_ok=True)
         
+        if queue:
+            job_id = JobStore().add('down', file_id, str(dest_file.resolve()), filename,
+                                    priority, int(file.get('size') or 0))
+            console.print(f"[green]✓ Queued download[/green] #{job_id} {filename}")
+            console.print("[dim]Run 'gdup jobs run' to start it.[/dim]")
+            return
+        
         # Download with progress
         with Progress(
             SpinnerColumn(),
@@ -57,12 +301,14 @@ def download_command(filename: str, destination: str = "."):
             def callback(progress_val):
                 progress.update(task, completed=progress_val * 100)
             
-            result_path = download_file(file_id, str(dest_file), callback)
+            result_path = download_file(file_id, str(dest_file), callback, verify=verify)
             progress.update(task, completed=100)
         
         console.print(f"[green]✓ Downloaded:[/green] {filename}")
         console.print(f"[dim]Saved to: {result_path}[/dim]")
         
+    except typer.Exit:
+        raise
     except FileNotFoundError as e:
         console.print(f"[red]Error:[/red] {str(e)}")
         raise typer.Exit(1)
@@ -0,0 +1,151 @@
+"""Disk usage command."""
+
+import typer
+from collections import defaultdict
+from typing import Dict, Any, Iterable, List, Optional
+from rich.console import Console
+from rich.markup import escape
+from rich.table import Table
+from ..drive import scan_tree, search_files, is_folder, resolve_path, get_full_path, get_file_by_id
+from ..config import get_current_folder_id, get_current_path
+from .ls import format_size
+
+console = Console()
+
+DU_FIELDS = "id, name, mimeType, size, quotaBytesUsed, parents"
+
+
+def aggregate(root_id: str, root_path: str, entries: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Total up file sizes per folder, bottom-up.
+
+    Args:
+        root_id: ID of the folder the totals are computed for
+        root_path: Display path of that folder
+        entries: Every file and folder below it (with parents)
+
+    Returns:
+        One dict per folder with its path, size, quota, files and folders
+    """
+    names = {}
+    children = defaultdict(list)
+    # Sizes of the files directly inside each folder: [size, quota, files]
+    direct = defaultdict(lambda: [0, 0, 0])
+
+    for entry in entries:
+        parents = entry.get('parents') or []
+        if not parents:
+            continue
+        parent = parents[0]
+
+        if is_folder(entry):
+            names[entry['id']] = entry['name']
+            children[parent].append(entry['id'])
+        else:
+            size = int(entry.get('size') or 0)
+            totals = direct[parent]
+            totals[0] += size
+            totals[1] += int(entry.get('quotaBytesUsed') or size)
+            totals[2] += 1
+
+    # Depth-first order from the root; entries outside the subtree
+    # (e.g. files shared with the user) are never reached
+    order = []
+    paths = {root_id: root_path}
+    stack = [root_id]
+    while stack:
+        folder_id = stack.pop()
+        order.append(folder_id)
+        for child in children.get(folder_id, ()):
+            paths[child] = paths[folder_id].rstrip('/') + '/' + names[child]
+            stack.append(child)
+
+    # Children come after their parent in ``order``, so walking it
+    # backwards finishes every child before its parent
+    results = {}
+    for folder_id in reversed(order):
+        size, quota, files = direct.get(folder_id, (0, 0, 0))
+        folders = 0
+        for child in children.get(folder_id, ()):
+            total = results[child]
+            size += total['size']
+            quota += total['quota']
+            files += total['files']
+            folders += total['folders'] + 1
+        results[folder_id] = {
+            'id': folder_id,
+            'path': paths[folder_id],
+            'size': size,
+            'quota': quota,
+            'files': files,
+            'folders': folders,
+        }
+
+    return list(results.values())
+
+
+def du_command(path: Optional[str] = None, top: int = 20):
+    """Show the folders using the most storage below a Drive folder."""
+    try:
+        folder_id = get_current_folder_id()
+        current_path = get_current_path()
+
+        if path:
+            folder_id = resolve_path(path, folder_id)
+            if not folder_id:
+                console.print(f"[red]Error:[/red] Path not found: {path}")
+                raise typer.Exit(1)
+            current_path = get_full_path(folder_id)
+
+        # Parents of top-level entries are the real root ID, not the alias
+        if folder_id == 'root':
+            root = get_file_by_id('root')
+            folder_id = root['id'] if root else 'root'
+
+        if current_path == '/':
+            # The whole drive: one paginated scan is cheaper than walking it
+            entries = search_files('', fields=DU_FIELDS)
+        else:
+            entries = scan_tree(folder_id, fields=DU_FIELDS)
+
+        scanned = 0
+
+        def counted(items):
+            nonlocal scanned
+            for item in items:
+                scanned += 1
+                if scanned % 1000 == 0:
+                    status.update(f"[bold green]Scanning... {scanned} entries")
+                yield item
+
+        with console.status("[bold green]Scanning...") as status:
+            folders = aggregate(folder_id, current_path, counted(entries))
+
+        folders.sort(key=lambda f: f['size'], reverse=True)
+        root_total = next(f for f in folders if f['id'] == folder_id)
+
+        table = Table(show_header=True, header_style="bold cyan")
+        table.add_column("Size", justify="right")
+        table.add_column("Quota", justify="right")
+        table.add_column("Files", justify="right")
+        table.add_column("Path", style="cyan")
+
+        for folder in folders[:top]:
+            table.add_row(
+                format_size(folder['size']),
+                format_size(folder['quota']),
+                str(folder['files']),
+                escape(folder['path']),
+            )
+
+        console.print(table)
+        console.print(
+            f"\n[dim]{format_size(root_total['size'])} in {root_total['files']} files and "
+            f"{root_total['folders']} folders ({scanned} entries scanned)[/dim]"
+        )
+
+    except typer.Exit:
+        raise
+    except Exception as e:
+        console.print(f"[red]Error:[/red] {str(e)}")
+        raise typer.Exit(1)
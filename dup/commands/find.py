@@ -0,0 +1,146 @@
+"""Find files command."""
+
+import fnmatch
+import re
+import typer
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from rich.console import Console
+from rich.markup import escape
+from ..drive import search_files, is_glob, is_folder, resolve_path, get_full_path, PathResolver, FOLDER_MIME_TYPE, glob_query, quote_query
+from ..config import get_current_folder_id
+from .jobs import parse_size
+from .ls import format_size
+
+console = Console()
+
+# --type shortcuts: name -> query term
+TYPE_QUERIES = {
+    'folder': f"mimeType = '{FOLDER_MIME_TYPE}'",
+    'file': f"mimeType != '{FOLDER_MIME_TYPE}'",
+    'doc': "mimeType = 'application/vnd.google-apps.document'",
+    'sheet': "mimeType = 'application/vnd.google-apps.spreadsheet'",
+    'slides': "mimeType = 'application/vnd.google-apps.presentation'",
+    'pdf': "mimeType = 'application/pdf'",
+    'image': "mimeType contains 'image/'",
+    'video': "mimeType contains 'video/'",
+    'audio': "mimeType contains 'audio/'",
+}
+
+_RELATIVE_TIME = re.compile(r'^(\d+)([mhdw])$')
+_TIME_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+
+def parse_time(value: str) -> str:
+    """
+    Parse a time like 7d, 12h or 2024-01-31 into an RFC 3339 UTC timestamp.
+    """
+    match = _RELATIVE_TIME.match(value.strip().lower())
+    if match:
+        moment = datetime.now(timezone.utc) - timedelta(**{_TIME_UNITS[match.group(2)]: int(match.group(1))})
+    else:
+        try:
+            moment = datetime.fromisoformat(value.strip())
+        except ValueError:
+            raise typer.BadParameter(f"Invalid time: {value} (use e.g. 7d, 12h or 2024-01-31)")
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def build_query(name: Optional[str], file_type: Optional[str], newer: Optional[str],
+                older: Optional[str], text: Optional[str]) -> str:
+    """
+    Build the files.list query for the given predicates.
+
+    Drive matches ``name contains`` against name prefixes only, so glob
+    patterns contribute their literal prefix and are re-checked locally.
+    """
+    terms = []
+
+    if name:
+        term = glob_query(name) if is_glob(name) else f"name contains {quote_query(name)}"
+        if term:
+            terms.append(term)
+
+    if file_type:
+        if file_type in TYPE_QUERIES:
+            terms.append(TYPE_QUERIES[file_type])
+        elif '/' in file_type:
+            terms.append(f"mimeType = {quote_query(file_type)}")
+        else:
+            raise typer.BadParameter(
+                f"Unknown type: {file_type} (use a MIME type or one of: {', '.join(TYPE_QUERIES)})"
+            )
+
+    if newer:
+        terms.append(f"modifiedTime > '{parse_time(newer)}'")
+    if older:
+        terms.append(f"modifiedTime < '{parse_time(older)}'")
+    if text:
+        terms.append(f"fullText contains {quote_query(text)}")
+
+    return ' and '.join(terms)
+
+
+def find_command(name: Optional[str] = None, file_type: Optional[str] = None,
+                 larger: Optional[str] = None, smaller: Optional[str] = None,
+                 newer: Optional[str] = None, older: Optional[str] = None,
+                 text: Optional[str] = None, within: Optional[str] = None,
+                 long: bool = False, limit: Optional[int] = None):
+    """Search the whole drive and print the full path of every match."""
+    try:
+        query = build_query(name, file_type, newer, older, text)
+        min_size = parse_size(larger) if larger else None
+        max_size = parse_size(smaller) if smaller else None
+
+        prefix = None
+        if within:
+            folder_id = resolve_path(within, get_current_folder_id())
+            if not folder_id:
+                console.print(f"[red]Error:[/red] Path not found: {within}")
+                raise typer.Exit(1)
+            prefix = get_full_path(folder_id).rstrip('/') + '/'
+
+        paths = PathResolver()
+        count = 0
+
+        for file in search_files(query):
+            if name and is_glob(name) and not fnmatch.fnmatchcase(file['name'], name):
+                continue
+
+            # Drive cannot filter on size, so it is checked here
+            if min_size is not None or max_size is not None:
+                if is_folder(file) or 'size' not in file:
+                    continue
+                size = int(file['size'])
+                if (min_size is not None and size <= min_size) or (max_size is not None and size >= max_size):
+                    continue
+
+            if is_folder(file):
+                paths.add_folder(file)
+
+            path = paths.path_of(file)
+            if prefix and not path.startswith(prefix):
+                continue
+            if is_folder(file):
+                path += '/'
+
+            if long:
+                modified = file.get('modifiedTime', '')[:10]
+                console.print(f"{format_size(file.get('size')):>10}  {modified:10}  {escape(path)}", highlight=False)
+            else:
+                console.print(escape(path), highlight=False)
+
+            count += 1
+            if limit and count >= limit:
+                break
+
+        if count == 0:
+            console.print("[yellow]No matches[/yellow]")
+
+    except typer.Exit:
+        raise
+    except Exception as e:
+        console.print(f"[red]Error:[/red] {str(e)}")
+        raise typer.Exit(1)
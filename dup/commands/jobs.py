@@ -0,0 +1,178 @@
+"""Transfer queue commands."""
+
+import time
+import typer
+from typing import Optional
+from rich.console import Console
+from rich.table import Table
+from ..auth import is_authenticated
+from ..jobs import JobStore, Scheduler, DIRECTIONS, QUEUED, RUNNING, DONE, FAILED, CANCELLED
+from .ls import format_size
+
+console = Console()
+
+jobs_app = typer.Typer(help="Show and run queued transfers.", invoke_without_command=True)
+
+STATUS_STYLES = {
+    QUEUED: 'yellow',
+    RUNNING: 'cyan',
+    DONE: 'green',
+    FAILED: 'red',
+    CANCELLED: 'dim',
+}
+
+
+def parse_size(value: str) -> int:
+    """Parse sizes like 512K, 10M or 1G into bytes."""
+    value = value.strip().upper().rstrip('B')
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    try:
+        if value and value[-1] in units:
+            return int(float(value[:-1]) * units[value[-1]])
+        return int(float(value))
+    except ValueError:
+        raise typer.BadParameter(f"Invalid size: {value}")
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """Format a duration as h:mm:ss."""
+    if seconds is None:
+        return "-"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _throughput(job) -> Optional[float]:
+    """Bytes per second of a job (current rate while running, average when done)."""
+    if job['status'] in (RUNNING, DONE):
+        return job['rate'] or None
+    return None
+
+
+def _eta(job) -> Optional[float]:
+    if job['status'] != RUNNING or not job['rate']:
+        return None
+    return max(0, job['total_bytes'] - job['done_bytes']) / job['rate']
+
+
+def print_jobs(store: JobStore, show_all: bool) -> None:
+    """Print the job table."""
+    jobs = store.list(include_finished=show_all)
+    if not jobs:
+        console.print("[yellow]No jobs[/yellow]")
+        return
+
+    table = Table(show_header=True, header_style="bold cyan")
+    table.add_column("ID", justify="right")
+    table.add_column("Dir")
+    table.add_column("Name")
+    table.add_column("Pri", justify="right")
+    table.add_column("Status")
+    table.add_column("Progress", justify="right")
+    table.add_column("Speed", justify="right")
+    table.add_column("ETA", justify="right")
+
+    for job in jobs:
+        style = STATUS_STYLES.get(job['status'], '')
+        percent = job['done_bytes'] / job['total_bytes'] * 100 if job['total_bytes'] else 0
+        if job['status'] == DONE:
+            percent = 100
+        speed = _throughput(job)
+        status = f"[{style}]{job['status']}[/{style}]"
+        if job['status'] == FAILED and job['error']:
+            status += f" [dim]{job['error'][:40]}[/dim]"
+
+        table.add_row(
+            str(job['id']),
+            job['direction'],
+            job['name'],
+            str(job['priority']),
+            status,
+            f"{percent:.0f}% of {format_size(job['total_bytes'])}",
+            f"{format_size(speed)}/s" if speed else "-",
+            format_duration(_eta(job)),
+        )
+
+    console.print(table)
+
+
+@jobs_app.callback()
+def jobs_callback(
+    ctx: typer.Context,
+    show_all: bool = typer.Option(False, "--all", "-a", help="Include finished jobs")
+):
+    """Show queued and running transfers with throughput and ETA."""
+    if ctx.invoked_subcommand is None:
+        try:
+            print_jobs(JobStore(), show_all)
+        except Exception as e:
+            console.print(f"[red]Error:[/red] {str(e)}")
+            raise typer.Exit(1)
+
+
+@jobs_app.command("run")
+def run_command(
+    up: Optional[int] = typer.Option(None, "--up", help="Concurrent uploads (default: GDUP_JOBS_UP or 2)"),
+    down: Optional[int] = typer.Option(None, "--down", help="Concurrent downloads (default: GDUP_JOBS_DOWN or 2)"),
+    up_limit: Optional[str] = typer.Option(None, "--up-limit", help="Upload bandwidth, e.g. 10M (bytes/s)"),
+    down_limit: Optional[str] = typer.Option(None, "--down-limit", help="Download bandwidth, e.g. 10M (bytes/s)"),
+    watch: bool = typer.Option(False, "--watch", "-w", help="Keep running and wait for new jobs")
+):
+    """Run queued transfers until the queue is empty."""
+    if not is_authenticated():
+        console.print("[yellow]⚠️  Not authenticated with Google Drive[/yellow]")
+        console.print("Run [cyan]gdup login[/cyan] to authenticate")
+        raise typer.Exit(1)
+
+    concurrency = {d: n for d, n in zip(DIRECTIONS, (up, down)) if n}
+    bandwidth = {d: parse_size(v) for d, v in zip(DIRECTIONS, (up_limit, down_limit)) if v}
+
+    def on_event(event, job):
+        arrow = '↑' if job['direction'] == 'up' else '↓'
+        if event == 'start':
+            console.print(f"[cyan]{arrow} Starting[/cyan] #{job['id']} {job['name']}")
+        elif event == 'done':
+            console.print(f"[green]✓ Finished[/green] #{job['id']} {job['name']}")
+        elif event == 'failed':
+            console.print(f"[red]✗ Failed[/red] #{job['id']} {job['name']}: {job['error']}")
+        elif event == 'cancelled':
+            console.print(f"[yellow]Cancelled[/yellow] #{job['id']} {job['name']}")
+
+    try:
+        store = JobStore()
+        scheduler = Scheduler(store, concurrency, bandwidth, on_event=on_event)
+        started = time.monotonic()
+        scheduler.run(watch=watch)
+    except KeyboardInterrupt:
+        console.print("\n[yellow]Stopped. Unfinished jobs stay queued.[/yellow]")
+        raise typer.Exit(1)
+    except Exception as e:
+        console.print(f"[red]Error:[/red] {str(e)}")
+        raise typer.Exit(1)
+
+    console.print(f"[green]Queue empty[/green] [dim]({format_duration(time.monotonic() - started)})[/dim]")
+
+
+@jobs_app.command("cancel")
+def cancel_command(job_id: int = typer.Argument(..., help="Job ID")):
+    """Cancel a queued or running job."""
+    if not JobStore().cancel(job_id):
+        console.print(f"[red]Error:[/red] No queued or running job #{job_id}")
+        raise typer.Exit(1)
+    console.print(f"[green]✓ Cancelled job[/green] #{job_id}")
+
+
+@jobs_app.command("retry")
+def retry_command(job_id: int = typer.Argument(..., help="Job ID")):
+    """Requeue a failed or cancelled job."""
+    if not JobStore().retry(job_id):
+        console.print(f"[red]Error:[/red] No failed or cancelled job #{job_id}")
+        raise typer.Exit(1)
+    console.print(f"[green]✓ Requeued job[/green] #{job_id}")
+
+
+@jobs_app.command("clear")
+def clear_command():
+    """Remove finished, failed and cancelled jobs."""
+    count = JobStore().clear()
+    console.print(f"[green]✓ Removed {count} job(s)[/green]")
@@ -1,46 +1,161 @@
 """Generate shareable link command."""
 
+import csv
+import json
 import typer
+from typing import Any, Dict, Iterator, List, Optional
 from rich.console import Console
-from ..drive import get_file_by_name, get_file_link, make_file_public, is_file_public, resolve_path
+from rich.markup import escape
+from ..drive import (
+    iter_files, find_files, scan_tree, is_glob, is_folder, quote_query, get_file_link,
+    make_files_public, has_public_permission, PathResolver, SCAN_BATCH,
+)
 from ..config import get_current_folder_id
 
 console = Console()
 
+# Permissions come with the listing, so no per-file permissions.list call is needed
+LINK_FIELDS = "id, name, mimeType, webViewLink, parents, permissions(type, role)"
+
+OUTPUT_FORMATS = ('ndjson', 'csv')
+OUTPUT_COLUMNS = ['id', 'path', 'link', 'public']
+
+
+def lookup_files(names: List[str], folder_id: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Look up files by name in a folder, many names per query.
+
+    Returns:
+        Mapping of name to file metadata (missing names are left out)
+    """
+    found = {}
+    for start in range(0, len(names), SCAN_BATCH):
+        terms = ' or '.join(f"name = {quote_query(name)}" for name in names[start:start + SCAN_BATCH])
+        for file in iter_files(folder_id, terms, order_by=None, fields=LINK_FIELDS):
+            found.setdefault(file['name'], file)
+    return found
+
+
+def collect_targets(names: List[str], folder_id: str, recursive: bool) -> Iterator[Dict[str, Any]]:
+    """
+    Resolve names and glob patterns to the files to link.
+
+    With ``recursive``, matching folders are replaced by every file below
+    them (the folders themselves are yielded too, for path lookups).
+    """
+    plain = [name for name in names if not is_glob(name)]
+    found = lookup_files(plain, folder_id) if plain else {}
+
+    for name in names:
+        if is_glob(name):
+            matches = find_files(name, folder_id, files_only=not recursive, fields=LINK_FIELDS)
+        elif name in found:
+            matches = [found[name]]
+        else:
+            raise ValueError(f"File not found: {name}")
+
+        for file in matches:
+            if recursive and is_folder(file):
+                yield from scan_tree(file['id'], fields=LINK_FIELDS)
+            else:
+                yield file
+
+
+def write_links(rows: List[Dict[str, Any]], output_format: str) -> None:
+    """Write link rows as NDJSON or CSV to stdout."""
+    if output_format == 'ndjson':
+        for row in rows:
+            console.file.write(json.dumps(row) + '\n')
+    else:
+        writer = csv.DictWriter(console.file, fieldnames=OUTPUT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    console.file.flush()
+
+
+def link_command(names: List[str], recursive: bool = False, yes: bool = False,
+                 output_format: Optional[str] = None):
+    """Generate shareable Google Drive links for one or more files."""
+    if output_format and output_format not in OUTPUT_FORMATS:
+        console.print(f"[red]Error:[/red] Unknown format: {output_format} (use {' or '.join(OUTPUT_FORMATS)})")
+        raise typer.Exit(1)
+
+    # Keep stdout clean for machine-readable output
+    status = Console(stderr=True) if output_format else console
 
-def link_command(name: str):
-    """Generate shareable Google Drive link for a file."""
     try:
         folder_id = get_current_folder_id()
-        
-        # Try to find the file by name
-        file = get_file_by_name(name, folder_id)
-        
-        if not file:
-            console.print(f"[red]Error:[/red] File not found: {name}")
-            raise typer.Exit(1)
-        
-        file_id = file['id']
-        
-        # Check if file is already public
-        if is_file_public(file_id):
-            link = get_file_link(file_id)
-            console.print(f"[green]📎 Link:[/green] {link}")
-        else:
-            # Ask for confirmation to make public
-            console.print(f"[yellow]⚠️  File '{name}' is private.[/yellow]")
-            make_public = typer.confirm("Make it publicly accessible?")
-            
-            if make_public:
-                make_file_public(file_id)
-                link = get_file_link(file_id)
-                console.print(f"[green]✓ File is now public[/green]")
-                console.print(f"[green]📎 Link:[/green] {link}")
+
+        targets = {}
+        folders = PathResolver()
+        for file in collect_targets(names, folder_id, recursive):
+            if is_folder(file):
+                folders.add_folder(file)
+                if recursive:
+                    continue
+            targets.setdefault(file['id'], file)
+
+        if not targets:
+            status.print("[yellow]No files to link[/yellow]")
+            return
+
+        files = list(targets.values())
+        public = {file['id'] for file in files if has_public_permission(file)}
+        private = [file for file in files if file['id'] not in public]
+
+        if private:
+            if len(files) == 1:
+                status.print(f"[yellow]⚠️  File '{escape(private[0]['name'])}' is private.[/yellow]")
+                question = "Make it publicly accessible?"
             else:
-                console.print("[yellow]File remains private. Getting link anyway...[/yellow]")
-                link = get_file_link(file_id)
-                console.print(f"[dim]📎 Link (requires access):[/dim] {link}")
-        
+                status.print(f"[yellow]⚠️  {len(private)} of {len(files)} files are private.[/yellow]")
+                question = "Make them publicly accessible?"
+
+            if yes or typer.confirm(question, err=bool(output_format)):
+                errors = make_files_public([file['id'] for file in private])
+                for file in private:
+                    error = errors[file['id']]
+                    if error is None:
+                        public.add(file['id'])
+                    else:
+                        status.print(f"[red]✗ {escape(file['name'])}:[/red] {str(error)}")
+                made = len(private) - sum(1 for e in errors.values() if e is not None)
+                if len(files) == 1 and made:
+                    status.print("[green]✓ File is now public[/green]")
+                elif made:
+                    status.print(f"[green]✓ {made} file(s) are now public[/green]")
+            elif len(files) == 1:
+                status.print("[yellow]File remains private. Getting link anyway...[/yellow]")
+            else:
+                status.print("[yellow]Files remain private. Getting links anyway...[/yellow]")
+
+        # A single link is printed without its path, which saves the lookups
+        show_paths = bool(output_format) or len(files) > 1
+        rows = [
+            {
+                'id': file['id'],
+                'path': folders.path_of(file) if show_paths else file['name'],
+                'link': file.get('webViewLink') or get_file_link(file['id']),
+                'public': file['id'] in public,
+            }
+            for file in files
+        ]
+
+        if output_format:
+            write_links(rows, output_format)
+        elif len(rows) == 1:
+            row = rows[0]
+            if row['public']:
+                console.print(f"[green]📎 Link:[/green] {row['link']}")
+            else:
+                console.print(f"[dim]📎 Link (requires access):[/dim] {row['link']}")
+        else:
+            for row in rows:
+                marker = "[green]📎[/green]" if row['public'] else "[dim]🔒[/dim]"
+                console.print(f"{marker} {escape(row['path'])}  {row['link']}", highlight=False)
+
+    except typer.Exit:
+        raise
     except Exception as e:
-        console.print(f"[red]Error:[/red] {str(e)}")
+        status.print(f"[red]Error:[/red] {str(e)}")
         raise typer.Exit(1)
@@ -1,13 +1,21 @@
 """List files command."""
 
+import json
 import typer
+from typing import Any, Dict, Iterable, Optional, TextIO
 from rich.console import Console
 from rich.table import Table
-from ..drive import list_files, is_folder
+from ..drive import list_files, stream_files, is_folder
 from ..config import get_current_folder_id, get_current_path
+from .. import prefetch
 
 console = Console()
 
+OUTPUT_FORMATS = ('ndjson', 'tsv')
+RECORD_FIELDS = ['id', 'name', 'mimeType', 'size', 'modifiedTime', 'path']
+
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
 
 def format_size(size) -> str:
     """Format file size in human-readable format."""
@@ -28,8 +36,55 @@ def format_size(size) -> str:
     return f"{size:.1f} PB"
 
 
-def ls_command(path: str = None):
+def check_format(output_format: Optional[str]) -> None:
+    """Exit with an error for an unknown --format value."""
+    if output_format and output_format not in OUTPUT_FORMATS:
+        console.print(f"[red]Error:[/red] Unknown format: {output_format} (use {' or '.join(OUTPUT_FORMATS)})")
+        raise typer.Exit(1)
+
+
+def file_record(file: Dict[str, Any], path: str) -> Dict[str, Any]:
+    """The fields of a file written by --format, with its full path."""
+    size = file.get('size')
+    return {
+        'id': file['id'],
+        'name': file['name'],
+        'mimeType': file.get('mimeType'),
+        'size': int(size) if size is not None else None,
+        'modifiedTime': file.get('modifiedTime'),
+        'path': path,
+    }
+
+
+def write_records(records: Iterable[Dict[str, Any]], output_format: str, out: TextIO) -> int:
+    """
+    Write records as NDJSON or TSV (with a header line) as they are produced.
+    
+    Tabs, newlines and backslashes in TSV values are written as \\t, \\n
+    and \\\\, so every record stays on one line.
+    
+    Returns:
+        Number of records written
+    """
+    count = 0
+    if output_format == 'tsv':
+        out.write('\t'.join(RECORD_FIELDS) + '\n')
+    for record in records:
+        if output_format == 'ndjson':
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            out.write('\t'.join(
+                '' if record[field] is None else str(record[field]).translate(_TSV_ESCAPES)
+                for field in RECORD_FIELDS
+            ) + '\n')
+        count += 1
+    out.flush()
+    return count
+
+
+def ls_command(path: str = None, output_format: Optional[str] = None):
     """List files in current or specified Drive folder."""
+    check_format(output_format)
     try:
         folder_id = get_current_folder_id()
         current_path = get_current_path()
@@ -43,9 +98,21 @@ def ls_command(path: str = None):
                 raise typer.Exit(1)
             current_path = get_full_path(folder_id)
         
+        if output_format:
+            # Stream raw records as pages arrive, without building a table
+            base = current_path.rstrip('/') + '/'
+            write_records(
+                (file_record(file, base + file['name']) for file in stream_files(folder_id)),
+                output_format,
+                console.file,
+            )
+            prefetch.schedule(folder_id)
+            return
+        
         console.print(f"[cyan]📂 {current_path}[/cyan]\n")
         
         files = list_files(folder_id)
+        prefetch.schedule(folder_id)
         
         if not files:
             console.print("[yellow]Empty folder[/yellow]")
@@ -69,6 +136,8 @@ def ls_command(path: str = None):
         console.print(table)
         console.print(f"\n[dim]{len(files)} items[/dim]")
         
+    except typer.Exit:
+        raise
     except Exception as e:
         console.print(f"[red]Error:[/red] {str(e)}")
         raise typer.Exit(1)
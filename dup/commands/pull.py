@@ -0,0 +1,61 @@
+"""Pull command: keep a local directory in step with a Drive folder."""
+
+import typer
+from pathlib import Path
+from typing import Optional
+from rich.console import Console
+from rich.markup import escape
+from ..drive import get_file_by_id, is_folder, resolve_path
+from ..config import get_current_folder_id
+from ..pull import Puller
+
+console = Console()
+
+ACTION_LABELS = {
+    'move': "[cyan]→ Moved[/cyan]",
+    'remove': "[yellow]✗ Removed[/yellow]",
+}
+
+
+def report(action: str, path: str) -> None:
+    """Print one local move or removal."""
+    console.print(f"{ACTION_LABELS[action]} {escape(path)}")
+
+
+def pull_command(remote: str, local_dir: Optional[str] = None, parallel: Optional[int] = None,
+                 verify: Optional[bool] = None):
+    """Download a Drive folder, then only what changed in it since the last pull."""
+    try:
+        folder_id = resolve_path(remote, get_current_folder_id())
+        if not folder_id:
+            console.print(f"[red]Error:[/red] Path not found: {remote}")
+            raise typer.Exit(1)
+        folder = get_file_by_id(folder_id)
+        if folder is None or not is_folder(folder):
+            console.print(f"[red]Error:[/red] Not a folder: {remote}")
+            raise typer.Exit(1)
+
+        root = Path(local_dir) if local_dir else Path(folder['name'])
+        if root.exists() and not root.is_dir():
+            console.print(f"[red]Error:[/red] Not a directory: {root}")
+            raise typer.Exit(1)
+
+        # Parents in listings and changes are the real root ID, not the 'root' alias
+        result = Puller(str(root), folder['id'], console, parallel, verify, report).pull()
+
+        if result.failed:
+            console.print(f"[red]✗ {result.failed} file(s) failed[/red] [dim](run again to retry)[/dim]")
+            raise typer.Exit(1)
+        if not (result.downloaded or result.moved or result.removed):
+            console.print("[green]✓ Up to date[/green]")
+            return
+        console.print(
+            f"[green]✓ Pulled {result.downloaded} file(s)[/green]"
+            f" [dim]({result.moved} moved, {result.removed} removed)[/dim]"
+        )
+
+    except typer.Exit:
+        raise
+    except Exception as e:
+        console.print(f"[red]Error:[/red] {str(e)}")
+        raise typer.Exit(1)
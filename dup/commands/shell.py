@@ -0,0 +1,94 @@
+"""Interactive shell command."""
+
+import shlex
+import typer
+from rich.console import Console
+from ..auth import get_drive_service
+from ..config import get_current_path
+from .. import prefetch
+
+console = Console()
+
+SHELL_COMMANDS = ['ls', 'cd', 'pwd', 'tree', 'find', 'du', 'up', 'down', 'link', 'jobs']
+
+try:
+    import readline  # noqa: F401 - enables line editing and history for input()
+except ImportError:  # Windows
+    readline = None
+
+
+def run_line(argv) -> int:
+    """
+    Run one gdup command line inside the current process.
+
+    Returns:
+        The command's exit code
+    """
+    from typer.main import get_command
+    from ..cli import app
+    from ..cache import metadata_cache
+
+    # Drop listings that other gdup processes have changed since
+    metadata_cache.sync()
+    command = get_command(app)
+    try:
+        return command.main(args=argv, prog_name='gdup', standalone_mode=False) or 0
+    except typer.Abort:
+        console.print()
+        return 1
+    except Exception as e:
+        # Usage errors know how to print themselves
+        if hasattr(e, 'show'):
+            e.show(file=console.file)
+        else:
+            console.print(f"[red]Error:[/red] {str(e)}")
+        return getattr(e, 'exit_code', 1)
+
+
+def shell_command():
+    """Run gdup commands in one long-lived process."""
+    try:
+        with console.status("[bold green]Connecting to Google Drive..."):
+            get_drive_service()
+        prefetch.enable()
+    except Exception as e:
+        console.print(f"[red]Error:[/red] {str(e)}")
+        raise typer.Exit(1)
+
+    console.print("[cyan]gdup shell[/cyan] - type [bold]help[/bold] for commands, [bold]exit[/bold] to quit")
+
+    while True:
+        try:
+            line = console.input(f"[cyan]gdup[/cyan]:[bold]{get_current_path()}[/bold]$ ")
+        except EOFError:
+            console.print()
+            break
+        except KeyboardInterrupt:
+            console.print()
+            continue
+
+        try:
+            argv = shlex.split(line)
+        except ValueError as e:
+            console.print(f"[red]Error:[/red] {str(e)}")
+            continue
+
+        if not argv:
+            continue
+
+        if argv[0] in ('exit', 'quit'):
+            break
+
+        if argv[0] == 'help':
+            console.print("Commands: " + ", ".join(SHELL_COMMANDS) + ", exit")
+            console.print("[dim]Use '<command> --help' for details.[/dim]")
+            continue
+
+        if argv[0] not in SHELL_COMMANDS:
+            console.print(f"[red]Error:[/red] Unknown command: {argv[0]}")
+            continue
+
+        try:
+            run_line(argv)
+        except KeyboardInterrupt:
+            console.print("\n[yellow]Interrupted[/yellow]")
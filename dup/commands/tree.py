@@ -1,16 +1,37 @@
 """Tree view command."""
 
 import typer
+from typing import Optional
 from rich.console import Console
 from rich.tree import Tree as RichTree
-from ..drive import list_files, is_folder, build_tree
+from ..drive import list_files, is_folder, iter_tree, walk_tree
 from ..config import get_current_folder_id, get_current_path
+from .ls import check_format, file_record, write_records
 
 console = Console()
 
 
-def tree_command(path: str = None):
+def iter_records(folder_id: str, root_path: str):
+    """
+    Generate a --format record for every entry of the tree, depth-first.
+    
+    Folders that cannot be read are reported on stderr and skipped.
+    """
+    # Path of the most recent folder at each depth
+    paths = [root_path.rstrip('/')]
+    for depth, _, file in walk_tree(folder_id):
+        if file is None:
+            Console(stderr=True).print(f"[red]Error:[/red] Could not read {paths[depth] or '/'}")
+            continue
+        del paths[depth + 1:]
+        path = f"{paths[depth]}/{file['name']}"
+        paths.append(path)
+        yield file_record(file, path)
+
+
+def tree_command(path: str = None, plain: bool = False, output_format: Optional[str] = None):
     """Show recursive folder structure."""
+    check_format(output_format)
     try:
         folder_id = get_current_folder_id()
         current_path = get_current_path()
@@ -24,18 +45,39 @@ def tree_command(path: str = None):
                 raise typer.Exit(1)
             current_path = get_full_path(folder_id)
         
-        console.print(f"[cyan]📂 {current_path}[/cyan]")
+        if output_format:
+            write_records(iter_records(folder_id, current_path), output_format, console.file)
+            return
         
-        # Build tree
-        tree_lines = build_tree(folder_id)
+        # Lines are printed as the walk produces them
+        tree_lines = iter_tree(folder_id)
         
-        if not tree_lines:
-            console.print("[yellow]Empty folder[/yellow]")
+        if plain:
+            # Write straight to the output stream, skipping rich's markup
+            # and layout processing
+            out = console.file
+            out.write(current_path + "\n")
+            empty = True
+            for line in tree_lines:
+                out.write(line + "\n")
+                empty = False
+            out.flush()
+            if empty:
+                console.print("[yellow]Empty folder[/yellow]")
             return
         
+        console.print(f"[cyan]📂 {current_path}[/cyan]")
+        
+        empty = True
         for line in tree_lines:
             console.print(line)
+            empty = False
+        
+        if empty:
+            console.print("[yellow]Empty folder[/yellow]")
         
+    except typer.Exit:
+        raise
     except Exception as e:
         console.print(f"[red]Error:[/red] {str(e)}")
         raise typer.Exit(1)
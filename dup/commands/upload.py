@@ -1,27 +1,261 @@
 """Upload file or folder command."""
 
+import glob
 import os
 import typer
 from pathlib import Path
+from typing import List, Optional
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn, TimeRemainingColumn
-from ..drive import upload_file, upload_folder, get_file_by_id
+from ..drive import upload_file, upload_folder, get_file_by_id, create_folder, is_glob, resolve_path
 from ..config import get_current_folder_id
+from ..jobs import JobStore
+from ..manifest import read_manifest, ResultLog
+from ..transfer import Transfer, run_transfers
 
 console = Console()
 
 
-def upload_command(path: str):
-    """Upload file or folder to current Drive location."""
-    try:
-        # Check if path exists
-        local_path = Path(path)
+def queue_upload(store: JobStore, local_path: Path, folder_id: str, priority: int = 0) -> int:
+    """
+    Queue a file or folder for upload.
+    
+    Remote folders are created right away so that every file can be
+    queued as its own job.
+    
+    Returns:
+        Number of jobs queued
+    """
+    if local_path.is_file():
+        store.add('up', str(local_path.resolve()), folder_id, local_path.name,
+                  priority, local_path.stat().st_size)
+        return 1
+    
+    folder = create_folder(local_path.name, folder_id)
+    count = 0
+    for item in sorted(local_path.iterdir()):
+        if item.is_file() or item.is_dir():
+            count += queue_upload(store, item, folder['id'], priority)
+    return count
+
+
+def expand_paths(paths: List[str]) -> List[Path]:
+    """
+    Expand local glob patterns the shell did not expand (e.g. quoted ones).
+    
+    Raises:
+        FileNotFoundError: If a path does not exist or a pattern matches nothing
+    """
+    expanded = []
+    for path in paths:
+        if not os.path.exists(path) and is_glob(path):
+            matches = sorted(glob.glob(path))
+            if not matches:
+                raise FileNotFoundError(f"No files match: {path}")
+            expanded.extend(Path(match) for match in matches)
+        elif os.path.exists(path):
+            expanded.append(Path(path))
+        else:
+            raise FileNotFoundError(f"Path not found: {path}")
+    return expanded
+
+
+def upload_many(local_paths: List[Path], folder_id: str, parallel: Optional[int] = None,
+                verify: Optional[bool] = None):
+    """Upload several files concurrently, then any folders."""
+    files = [p for p in local_paths if p.is_file()]
+    folders = [p for p in local_paths if p.is_dir()]
+    failed = 0
+    
+    if files:
+        results = run_transfers(
+            (Transfer(p.name, p.stat().st_size,
+                      lambda callback, p=p: upload_file(str(p), folder_id, callback, verify=verify))
+             for p in files),
+            console, "Uploading", parallel
+        )
+        failed = sum(1 for t in results if t.error)
+        console.print(f"[green]✓ Uploaded {len(results) - failed} file(s)[/green]")
+    
+    failed_folders = 0
+    for local_path in folders:
+        try:
+            with console.status(f"[bold green]Uploading folder {local_path.name}..."):
+                result = upload_folder(str(local_path), folder_id, verify=verify)
+        except Exception as e:
+            # Keep going: one failed folder should not skip the others
+            console.print(f"[red]Error:[/red] {local_path.name}: {str(e)}")
+            failed_folders += 1
+            continue
+        console.print(f"[green]✓ Uploaded folder:[/green] {result['name']}")
+    
+    if failed or failed_folders:
+        parts = []
+        if failed:
+            parts.append(f"{failed} file(s)")
+        if failed_folders:
+            parts.append(f"{failed_folders} folder(s)")
+        console.print(f"[red]✗ {' and '.join(parts)} failed[/red]")
+        raise typer.Exit(1)
+
+
+def manifest_parent(item, folder_id: str, folders: dict) -> str:
+    """
+    Get the Drive folder a manifest item goes to.
+    
+    Args:
+        item: Manifest item, with an optional 'parent' ID or 'dest' path
+        folder_id: Folder used when the item names neither
+        folders: Cache of resolved 'dest' paths, shared between items
+    """
+    if item.get('parent'):
+        return item['parent']
+    if item.get('dest'):
+        if item['dest'] not in folders:
+            folders[item['dest']] = resolve_path(item['dest'], folder_id)
+        if not folders[item['dest']]:
+            raise FileNotFoundError(f"Drive folder not found: {item['dest']}")
+        return folders[item['dest']]
+    return folder_id
+
+
+def queue_manifest(store: JobStore, manifest: str, folder_id: str, priority: int = 0) -> int:
+    """
+    Queue every item of a manifest for upload.
+    
+    Returns:
+        Number of jobs queued
+    """
+    folders = {}
+    count = 0
+    for item in read_manifest(manifest, 'path'):
+        local_path = Path(item['path'])
         if not local_path.exists():
-            console.print(f"[red]Error:[/red] Path not found: {path}")
+            raise FileNotFoundError(f"Path not found: {item['path']}")
+        count += queue_upload(store, local_path, manifest_parent(item, folder_id, folders), priority)
+    return count
+
+
+def upload_manifest(manifest: str, folder_id: str, log_path: Optional[str] = None,
+                    parallel: Optional[int] = None, verify: Optional[bool] = None):
+    """
+    Upload every item of a manifest through the parallel engine.
+    
+    Items already logged as successful in ``log_path`` are skipped.
+    """
+    log = ResultLog(log_path)
+    done = log.completed('source')
+    skipped = 0
+    folders = {}
+    
+    def transfers():
+        nonlocal skipped
+        for item in read_manifest(manifest, 'path'):
+            local_path = Path(item['path'])
+            source = str(local_path.resolve())
+            if source in done:
+                skipped += 1
+                continue
+            
+            item = {**item, 'source': source}
+            try:
+                item['parent'] = manifest_parent(item, folder_id, folders)
+                if local_path.is_file():
+                    run = lambda callback, p=source, parent=item['parent']: upload_file(p, parent, callback, verify=verify)
+                    yield Transfer(local_path.name, local_path.stat().st_size, run, item)
+                elif local_path.is_dir():
+                    run = lambda callback, p=source, parent=item['parent']: upload_folder(p, parent, verify=verify)
+                    yield Transfer(local_path.name, 0, run, item)
+                else:
+                    raise FileNotFoundError(f"Path not found: {item['path']}")
+            except Exception as e:
+                yield Transfer.failing(local_path.name, e, item)
+    
+    def on_done(transfer: Transfer):
+        log.write({
+            'op': 'up',
+            'source': transfer.item['source'],
+            'parent': transfer.item.get('parent'),
+            'id': (transfer.result or {}).get('id'),
+            'name': transfer.name,
+            'bytes': transfer.size,
+            'seconds': round(transfer.seconds, 3),
+            'status': 'error' if transfer.error else 'ok',
+            'error': str(transfer.error) if transfer.error else None,
+        })
+    
+    try:
+        # run_transfers returns only once every submitted transfer is done,
+        # so no result is written after the log is closed
+        results = run_transfers(transfers(), console, "Uploading", parallel, on_done)
+    finally:
+        log.close()
+    
+    failed = sum(1 for t in results if t.error)
+    console.print(f"[green]✓ Uploaded {len(results) - failed} item(s)[/green]")
+    if skipped:
+        console.print(f"[dim]Skipped {skipped} item(s) already uploaded according to {log_path}[/dim]")
+    if failed:
+        console.print(f"[red]✗ {failed} item(s) failed[/red]")
+        raise typer.Exit(1)
+
+
+def upload_command(paths: Optional[List[str]], queue: bool = False, priority: int = 0,
+                   parallel: Optional[int] = None, from_file: Optional[str] = None,
+                   log: Optional[str] = None, verify: Optional[bool] = None):
+    """Upload files or folders to current Drive location."""
+    try:
+        if from_file and paths:
+            console.print("[red]Error:[/red] Give either paths or --from-file, not both")
+            raise typer.Exit(1)
+        if priority and not queue:
+            console.print("[red]Error:[/red] --priority only applies with --queue")
+            raise typer.Exit(1)
+        if log and not from_file:
+            console.print("[red]Error:[/red] --log only applies with --from-file")
+            raise typer.Exit(1)
+        if queue and log:
+            console.print("[red]Error:[/red] --log cannot be used with --queue (see 'gdup jobs' for results)")
+            raise typer.Exit(1)
+        
+        if from_file:
+            folder_id = get_current_folder_id()
+            if queue:
+                store = JobStore()
+                with console.status("[bold green]Queueing..."):
+                    count = queue_manifest(store, from_file, folder_id, priority)
+                console.print(f"[green]✓ Queued {count} upload(s)[/green]")
+                console.print("[dim]Run 'gdup jobs run' to start them.[/dim]")
+                return
+            upload_manifest(from_file, folder_id, log, parallel, verify)
+            return
+        
+        if not paths:
+            console.print("[red]Error:[/red] Give a path to upload or --from-file")
+            raise typer.Exit(1)
+        
+        try:
+            local_paths = expand_paths(paths)
+        except FileNotFoundError as e:
+            console.print(f"[red]Error:[/red] {str(e)}")
             raise typer.Exit(1)
         
         folder_id = get_current_folder_id()
         
+        if queue:
+            store = JobStore()
+            with console.status("[bold green]Queueing..."):
+                count = sum(queue_upload(store, p, folder_id, priority) for p in local_paths)
+            console.print(f"[green]✓ Queued {count} upload(s)[/green]")
+            console.print("[dim]Run 'gdup jobs run' to start them.[/dim]")
+            return
+        
+        if len(local_paths) > 1:
+            upload_many(local_paths, folder_id, parallel, verify)
+            return
+        
+        local_path = local_paths[0]
+        
         if local_path.is_file():
             # Upload single file
             file_size = local_path.stat().st_size
@@ -39,7 +273,7 @@ def upload_command(path: str):
                 def callback(progress_val):
                     progress.update(task, completed=progress_val * 100)
                 
-                result = upload_file(str(local_path), folder_id, callback)
+                result = upload_file(str(local_path), folder_id, callback, verify=verify)
                 progress.update(task, completed=100)
             
             console.print(f"[green]✓ Uploaded:[/green] {result['name']}")
@@ -50,7 +284,7 @@ def upload_command(path: str):
             console.print(f"[cyan]Uploading folder:[/cyan] {local_path.name}")
             
             with console.status("[bold green]Uploading files..."):
-                result = upload_folder(str(local_path), folder_id)
+                result = upload_folder(str(local_path), folder_id, verify=verify)
             
             console.print(f"[green]✓ Uploaded folder:[/green] {result['name']}")
         
@@ -58,6 +292,8 @@ def upload_command(path: str):
             console.print(f"[red]Error:[/red] Invalid path type")
             raise typer.Exit(1)
             
+    except typer.Exit:
+        raise
     except Exception as e:
         console.print(f"[red]Error:[/red] {str(e)}")
         raise typer.Exit(1)
@@ -0,0 +1,83 @@
+"""Watch command: mirror a local directory to Drive."""
+
+import typer
+from pathlib import Path
+from typing import List, Optional
+from rich.console import Console
+from rich.markup import escape
+from ..drive import get_file_by_id, get_file_by_name, create_folder, is_folder, resolve_path
+from ..config import get_current_folder_id
+from ..watch import Watcher
+
+console = Console()
+
+ACTION_LABELS = {
+    'upload': "[green]↑ Uploaded[/green]",
+    'update': "[green]↑ Updated[/green]",
+    'mkdir': "[cyan]+ Folder[/cyan]",
+    'move': "[cyan]→ Moved[/cyan]",
+    'trash': "[yellow]✗ Trashed[/yellow]",
+}
+
+
+def report(action: str, path: str, error: Optional[Exception]) -> None:
+    """Print one applied change."""
+    if error is not None:
+        console.print(f"[red]Error:[/red] {action} {escape(path)}: {escape(str(error))}")
+    else:
+        console.print(f"{ACTION_LABELS[action]} {escape(path)}")
+
+
+def target_folder(local_dir: Path, remote: Optional[str]) -> str:
+    """
+    Get the Drive folder a directory is mirrored to.
+
+    Without ``remote`` this is a folder with the directory's name in the
+    current Drive folder, as ``gdup up`` would create; it is created when
+    missing.
+    """
+    folder_id = get_current_folder_id()
+    if remote:
+        target = resolve_path(remote, folder_id)
+        if not target:
+            raise FileNotFoundError(f"Path not found: {remote}")
+        # Parents of top-level entries are the real root ID, not the alias
+        if target == 'root':
+            root = get_file_by_id('root')
+            target = root['id'] if root else target
+        return target
+
+    existing = get_file_by_name(local_dir.name, folder_id)
+    if existing and is_folder(existing):
+        return existing['id']
+    return create_folder(local_dir.name, folder_id)['id']
+
+
+def watch_command(local_dir: str, remote: Optional[str] = None, once: bool = False,
+                  parallel: Optional[int] = None, excludes: Optional[List[str]] = None,
+                  verify: Optional[bool] = None):
+    """Mirror a local directory to Drive, uploading changes as they happen."""
+    try:
+        root = Path(local_dir).resolve()
+        if not root.is_dir():
+            console.print(f"[red]Error:[/red] Not a directory: {local_dir}")
+            raise typer.Exit(1)
+
+        watcher = Watcher(str(root), target_folder(root, remote), parallel, excludes, verify, report)
+
+        if once:
+            watcher.sync()
+            console.print("[green]✓ In sync[/green]")
+            return
+
+        console.print(f"[cyan]Watching {escape(str(root))}[/cyan] [dim](Ctrl+C to stop)[/dim]")
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            console.print("\n[dim]Stopped[/dim]")
+
+    except typer.Exit:
+        raise
+    except Exception as e:
+        console.print(f"[red]Error:[/red] {str(e)}")
+        raise typer.Exit(1)
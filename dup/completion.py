@@ -0,0 +1,247 @@
+"""Shell completion of remote Drive paths.
+
+``gdup completion bash`` and ``gdup completion zsh`` print a script that
+calls ``gdup __complete`` on every TAB. That call is answered by the thin
+client from the on-disk listing store (see listings.py) without importing
+the Google client libraries or touching the network.
+
+Listings that are missing or older than GDUP_COMPLETION_TTL are refreshed
+by a detached background process, so the prompt never waits for Drive;
+the fresh entries show up on the next TAB. Before ``gdup login`` there is
+nothing to refresh with, and no process is started.
+
+Settings (environment variables):
+    GDUP_COMPLETION_TTL  Seconds before a stored listing is refreshed
+"""
+
+import re
+import subprocess
+import sys
+from typing import List, Optional
+from .config import get_current_folder_id, get_setting, get_token_path
+from .listings import ListingStore, get_store
+
+DEFAULT_TTL = 300.0
+
+# Seconds before another refresh of the same folder may be started
+REFRESH_INTERVAL = 30.0
+
+COMMANDS = [
+    'login', 'ls', 'tree', 'cd', 'pwd', 'up', 'find', 'du', 'link', 'down',
+    'watch', 'pull', 'shell', 'jobs', 'cache', 'version', 'completion',
+]
+
+# Commands whose positional arguments are remote paths: name -> folders only
+REMOTE_COMMANDS = {
+    'ls': True,
+    'cd': True,
+    'tree': True,
+    'du': True,
+    'down': False,
+    'link': False,
+    'pull': True,
+}
+
+# Options that take a remote folder
+REMOTE_OPTIONS = {'--in', '--to'}
+
+BASH_SCRIPT = """\
+_gdup_complete() {
+    local IFS=$'\\n'
+    if [[ ( ${COMP_WORDS[1]} =~ ^(up|watch)$ && $COMP_CWORD -gt 1 && ${COMP_WORDS[COMP_CWORD-1]} != --to )
+          || ( ${COMP_WORDS[1]} == pull && $COMP_CWORD -gt 2 ) ]]; then
+        compopt -o default
+        COMPREPLY=()
+        return
+    fi
+    COMPREPLY=( $(gdup __complete bash "$COMP_CWORD" "${COMP_WORDS[@]}" 2>/dev/null) )
+}
+complete -o nospace -F _gdup_complete gdup
+"""
+
+ZSH_SCRIPT = """\
+#compdef gdup
+_gdup() {
+    if [[ ( ${words[2]} == (up|watch) && $CURRENT -gt 2 && ${words[CURRENT-1]} != --to )
+          || ( ${words[2]} == pull && $CURRENT -gt 3 ) ]]; then
+        _files
+        return
+    fi
+    local -a folders files
+    local line
+    for line in "${(@f)$(gdup __complete zsh $((CURRENT - 1)) "${words[@]}" 2>/dev/null)}"; do
+        case $line in
+            */) folders+=("$line") ;;
+            ?*) files+=("$line") ;;
+        esac
+    done
+    (( ${#folders} )) && compadd -S '' -- "${folders[@]}"
+    (( ${#files} )) && compadd -- "${files[@]}"
+}
+compdef _gdup gdup
+"""
+
+SCRIPTS = {'bash': BASH_SCRIPT, 'zsh': ZSH_SCRIPT}
+
+_BASH_SPECIAL = re.compile(r'([\s\'"\\()&;|<>$`!*?\[\]{}#~])')
+
+
+def _refresh_later(store: ListingStore, folder_id: str) -> None:
+    """List a folder in a detached process unless a refresh is already running."""
+    # Without a token the refresh could only start the browser login
+    if not get_token_path().exists():
+        return
+    if not store.claim_refresh(folder_id, REFRESH_INTERVAL):
+        return
+    subprocess.Popen(
+        [sys.executable, '-m', 'dup.completion', '--refresh', folder_id],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _listing_ready(store: ListingStore, folder_id: str) -> bool:
+    """Check a folder is stored, scheduling a refresh if it is missing or old."""
+    age = store.age(folder_id)
+    if age is None or age > get_setting('completion_ttl', DEFAULT_TTL):
+        _refresh_later(store, folder_id)
+    # Entries of a stale listing are still better than none
+    return age is not None
+
+
+def _resolve(store: ListingStore, path: str, folder_id: str) -> Optional[str]:
+    """Resolve the folder part of a remote path using stored listings only."""
+    if path.startswith('/'):
+        folder_id = 'root'
+
+    for part in path.split('/'):
+        if not part or part == '.':
+            continue
+        if part == '..':
+            folder_id = store.parent(folder_id) or 'root'
+            continue
+        if not _listing_ready(store, folder_id):
+            return None
+        child = store.child(folder_id, part)
+        if child is None or not child[1]:
+            return None
+        folder_id = child[0]
+
+    return folder_id
+
+
+def complete_path(store: ListingStore, word: str, folders_only: bool) -> List[str]:
+    """
+    Complete a remote path relative to the current Drive folder.
+
+    Returns:
+        Candidate paths; folders end with '/'
+    """
+    directory, _, prefix = word.rpartition('/')
+    if word.startswith('/') and not directory:
+        directory = '/'
+    elif directory:
+        directory += '/'
+
+    folder_id = _resolve(store, directory, get_current_folder_id())
+    if folder_id is None or not _listing_ready(store, folder_id):
+        return []
+
+    return [
+        directory + name + ('/' if is_folder else '')
+        for _, name, is_folder in store.children(folder_id, prefix)
+        if is_folder or not folders_only
+    ]
+
+
+def complete(words: List[str], cword: int) -> List[str]:
+    """
+    Get completion candidates for the word at index ``cword``.
+
+    Args:
+        words: Command line words, starting with the program name
+        cword: Index of the word being completed
+    """
+    word = words[cword] if cword < len(words) else ''
+
+    if cword == 1:
+        return [command for command in COMMANDS if command.startswith(word)]
+
+    command = words[1] if len(words) > 1 else ''
+    previous = words[cword - 1] if cword > 0 else ''
+
+    if previous in REMOTE_OPTIONS:
+        folders_only = True
+    elif command in REMOTE_COMMANDS and not word.startswith('-') and not previous.startswith('-'):
+        folders_only = REMOTE_COMMANDS[command]
+    else:
+        return []
+
+    store = get_store()
+    if store is None:
+        return []
+    return complete_path(store, word, folders_only)
+
+
+def _format(candidate: str, shell: str) -> str:
+    if shell != 'bash':
+        return candidate
+    escaped = _BASH_SPECIAL.sub(r'\\\1', candidate)
+    # bash is told not to add a space itself, so that folders can be continued
+    return escaped if candidate.endswith('/') else escaped + ' '
+
+
+def run(argv: List[str]) -> int:
+    """
+    Answer a ``gdup __complete <shell> <cword> <words...>`` request.
+
+    Returns:
+        Exit code
+    """
+    if len(argv) < 2 or argv[0] not in SCRIPTS:
+        return 1
+    shell = argv[0]
+    try:
+        cword = int(argv[1])
+    except ValueError:
+        return 1
+
+    words = argv[2:]
+    if cword < len(words):
+        # The shell passes the word as typed, with quotes and backslash escapes
+        words[cword] = re.sub(r'\\(.)', r'\1', words[cword].lstrip('\'"'))
+
+    try:
+        candidates = complete(words, cword)
+    except Exception:
+        # Completion must never print errors into the command line
+        return 1
+
+    for candidate in candidates:
+        sys.stdout.write(_format(candidate, shell) + '\n')
+    return 0
+
+
+def refresh(folder_id: str) -> None:
+    """List a folder from Drive and store the listing, never starting a login."""
+    from .auth import get_credentials_manager, is_authenticated
+    from .drive import list_files
+
+    if not is_authenticated():
+        raise PermissionError("Not authenticated with Google Drive")
+    # Raises instead of opening a browser when the token cannot be refreshed
+    get_credentials_manager(interactive=False)
+    files = list_files(folder_id)
+    store = get_store()
+    if store is not None:
+        store.put(folder_id, files)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '--refresh':
+        try:
+            refresh(sys.argv[2])
+        except Exception:
+            sys.exit(1)
@@ -6,6 +6,33 @@ from pathlib import Path
 from typing import Dict, Any
 
 
+def get_setting(name: str, default):
+    """
+    Get a tunable setting from the environment.
+    
+    Settings are read from ``GDUP_<NAME>`` environment variables and cast
+    to the type of the default value.
+    
+    Args:
+        name: Setting name (e.g., "rate_metadata")
+        default: Value used when the variable is unset or invalid
+    
+    Returns:
+        The configured value or the default
+    """
+    value = os.getenv(f"GDUP_{name.upper()}")
+    if value is None or value == '':
+        return default
+    
+    if isinstance(default, bool):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    
+    try:
+        return type(default)(value) if default is not None else value
+    except (ValueError, TypeError):
+        return default
+
+
 def get_config_dir() -> Path:
     """Get the configuration directory based on OS."""
     if os.name == 'nt':  # Windows
@@ -27,13 +54,30 @@ def get_state_path() -> Path:
     return get_config_dir() / 'state.json'
 
 
+# Last state read from or written to disk, keyed by the file's mtime
+_state_cache = None
+
+
 def load_state() -> Dict[str, Any]:
     """Load current state (current folder, path, etc.)."""
+    global _state_cache
     state_path = get_state_path()
     
-    if state_path.exists():
+    try:
+        mtime = state_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    
+    if mtime is not None:
+        # Long-running processes (gdup shell) keep the state in memory and
+        # only re-read it when another process changed the file
+        if _state_cache is not None and _state_cache[0] == mtime:
+            return dict(_state_cache[1])
+        
         with open(state_path, 'r') as f:
-            return json.load(f)
+            state = json.load(f)
+        _state_cache = (mtime, state)
+        return dict(state)
     
     # Default state
     return {
@@ -44,9 +88,11 @@ def load_state() -> Dict[str, Any]:
 
 def save_state(state: Dict[str, Any]) -> None:
     """Save current state to disk."""
+    global _state_cache
     state_path = get_state_path()
     with open(state_path, 'w') as f:
         json.dump(state, f, indent=2)
+    _state_cache = (state_path.stat().st_mtime_ns, dict(state))
 
 
 def get_current_folder_id() -> str:
@@ -0,0 +1,251 @@
+"""gdupd - background daemon that serves gdup commands over a Unix socket.
+
+The daemon holds the credentials, the pooled HTTP connection and the
+metadata cache for the lifetime of the process. ``gdup`` forwards
+non-interactive commands to it (see dup/client.py), so scripts that call
+gdup hundreds of times skip interpreter startup, imports, token loading
+and cold connections on every call.
+
+Commands run one at a time; their output is streamed back to the client.
+Before each command the metadata cache is dropped if another gdup process
+has changed Drive since (see dup/cache.py).
+The daemon answers with a start frame when it begins a command, and a
+client that gave up waiting (see GDUP_DAEMON_TIMEOUT) and ran the command
+itself is skipped.
+With GDUP_METRICS or GDUP_METRICS_PORT set, the daemon exports metrics
+for every command it serves (see dup/metrics.py).
+
+Usage:
+    gdupd            Run the daemon in the foreground
+    gdupd --status   Show whether the daemon is running
+    gdupd --stop     Stop a running daemon
+"""
+
+import argparse
+import json
+import os
+import select
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import Optional
+from rich.console import Console
+from .client import connect, get_socket_path, send_request, FORWARDED_COMMANDS
+
+console = Console()
+
+
+class _StreamWriter:
+    """File-like object that streams written text to the client."""
+
+    def __init__(self, wfile, tty: bool):
+        self._wfile = wfile
+        self._tty = tty
+        self.encoding = 'utf-8'
+
+    def write(self, text: str) -> int:
+        if text:
+            self._wfile.write(json.dumps({'out': text}).encode() + b'\n')
+            self._wfile.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def isatty(self) -> bool:
+        return self._tty
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: 'DaemonServer'
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+
+        control = request.get('control')
+        if control == 'ping':
+            return self._send({'status': self.server.status()})
+        if control == 'stop':
+            self._send({'status': 'stopping'})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+
+        argv = request.get('argv') or []
+        if not argv or argv[0] not in FORWARDED_COMMANDS:
+            return self._send({'exit': 2})
+
+        writer = _StreamWriter(self.wfile, bool(request.get('tty')))
+        try:
+            exit_code = self.server.run(argv, request.get('cwd'), writer, request.get('columns'),
+                                        self._start)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        if exit_code is not None:
+            self._send({'exit': exit_code})
+
+    def _start(self) -> bool:
+        """Tell the client its command is starting, unless it hung up."""
+        readable, _, _ = select.select([self.connection], [], [], 0)
+        if readable and not self.connection.recv(1, socket.MSG_PEEK):
+            return False
+        self._send({'started': True})
+        return True
+
+    def _send(self, frame: dict) -> None:
+        self.wfile.write(json.dumps(frame).encode() + b'\n')
+        self.wfile.flush()
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server executing gdup commands in-process."""
+
+    daemon_threads = True
+
+    def __init__(self, path: str):
+        super().__init__(path, _Handler)
+        self.started = time.time()
+        self.commands = 0
+        self._run_lock = threading.Lock()
+
+    def status(self) -> dict:
+        from .cache import metadata_cache
+        from . import prefetch
+        return {
+            'pid': os.getpid(),
+            'uptime': round(time.time() - self.started, 1),
+            'commands': self.commands,
+            'cache_hits': metadata_cache.hits,
+            'cache_misses': metadata_cache.misses,
+            'prefetch': prefetch.prefetcher.stats() if prefetch.prefetcher else None,
+        }
+
+    def run(self, argv, cwd, writer, columns, start=None) -> Optional[int]:
+        """
+        Run a command with its output redirected to the client.
+
+        Args:
+            start: Called once the command may run; returning False skips it
+
+        Returns:
+            Exit code, or None if the command was skipped
+        """
+        from .commands.shell import run_line
+
+        # Commands print through module-level consoles and read the
+        # process working directory, so run them one at a time.
+        with self._run_lock:
+            if start is not None and not start():
+                return None
+            self.commands += 1
+            saved_cwd = os.getcwd()
+            saved = _swap_consoles(writer, columns)
+            try:
+                if cwd:
+                    os.chdir(cwd)
+                return run_line(argv)
+            finally:
+                os.chdir(saved_cwd)
+                _restore_consoles(saved)
+
+
+def _swap_consoles(writer, columns):
+    """Point every dup module's console at the client's stream."""
+    saved = []
+    for name, module in list(sys.modules.items()):
+        if not name.startswith('dup.') or module is None:
+            continue
+        current = getattr(module, 'console', None)
+        if isinstance(current, Console) and name != __name__:
+            saved.append((module, current))
+            module.console = Console(
+                file=writer,
+                force_terminal=writer.isatty(),
+                width=columns,
+            )
+    return saved
+
+
+def _restore_consoles(saved) -> None:
+    for module, original in saved:
+        module.console = original
+
+
+def serve() -> None:
+    """Run the daemon until stopped."""
+    from .auth import get_drive_service
+    from . import cli  # noqa: F401 - import every command module up front
+    from . import prefetch
+    from . import metrics
+    from .config import get_setting
+
+    path = get_socket_path()
+    if connect() is not None:
+        console.print("[yellow]gdupd is already running[/yellow]")
+        raise SystemExit(1)
+    if path.exists():
+        path.unlink()
+
+    get_drive_service()
+    prefetch.enable()
+
+    metrics_file = get_setting('metrics', '')
+    metrics_port = get_setting('metrics_port', 0)
+    if metrics_file or metrics_port:
+        metrics.start(metrics_file or None, metrics_port)
+
+    # Create the socket owner-only: a chmod after bind() leaves a window in
+    # which other users could connect
+    umask = os.umask(0o077)
+    try:
+        server = DaemonServer(str(path))
+    finally:
+        os.umask(umask)
+    console.print(f"[green]gdupd listening on[/green] {path}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        metrics.finish()
+        if path.exists():
+            path.unlink()
+
+
+def main():
+    """Entry point for the gdupd command."""
+    parser = argparse.ArgumentParser(prog='gdupd', description="gdup background daemon")
+    parser.add_argument('--status', action='store_true', help="Show daemon status")
+    parser.add_argument('--stop', action='store_true', help="Stop the running daemon")
+    args = parser.parse_args()
+
+    if not hasattr(socket, 'AF_UNIX'):
+        console.print("[red]Error:[/red] gdupd requires Unix domain sockets")
+        raise SystemExit(1)
+
+    if args.status or args.stop:
+        sock = connect(timeout=5)
+        if sock is None:
+            console.print("[yellow]gdupd is not running[/yellow]")
+            raise SystemExit(1)
+        with sock:
+            for frame in send_request(sock, {'control': 'stop' if args.stop else 'ping'}):
+                status = frame.get('status')
+                if isinstance(status, dict):
+                    for key, value in status.items():
+                        console.print(f"[cyan]{key}:[/cyan] {value}")
+                else:
+                    console.print(f"[green]gdupd {status}[/green]")
+        return
+
+    serve()
+
+
+if __name__ == '__main__':
+    main()
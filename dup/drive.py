@@ -1,47 +1,587 @@
 """Google Drive API helper functions."""
 
+import fnmatch
 import io
+import json
 import os
+import re
+import shutil
 import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload, MediaIoBaseUpload
+from typing import List, Dict, Any, Optional, Tuple, Union
+from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload, DEFAULT_CHUNK_SIZE
 from googleapiclient.errors import HttpError
 from .auth import get_drive_service
+from . import ratelimit
+from . import trace
+from . import metrics
+from .cache import metadata_cache
+from .media import HashingFileUpload, HashingWriter, IntegrityError, ReadAheadUpload, file_md5, get_verify
+from .config import get_setting
+from .filecache import FileCache
 
+MAX_RETRIES = 3
 
-def list_files(folder_id: str = 'root', page_size: int = 100) -> List[Dict[str, Any]]:
+# Transfers attempted before a checksum mismatch is reported
+VERIFY_ATTEMPTS = 2
+
+# A resumed download continues only while these still match the revision
+# recorded next to the partial file
+PART_META_SUFFIX = '.meta'
+PART_META_FIELDS = ('md5Checksum', 'modifiedTime')
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# Export formats for Google Workspace files: type -> {extension: export mimeType}
+EXPORT_FORMATS = {
+    'document': {
+        'pdf': 'application/pdf',
+        'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        'odt': 'application/vnd.oasis.opendocument.text',
+        'rtf': 'application/rtf',
+        'txt': 'text/plain',
+        'html': 'text/html',
+        'epub': 'application/epub+zip',
+        'md': 'text/markdown',
+    },
+    'spreadsheet': {
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'ods': 'application/vnd.oasis.opendocument.spreadsheet',
+        'csv': 'text/csv',
+        'tsv': 'text/tab-separated-values',
+        'pdf': 'application/pdf',
+    },
+    'presentation': {
+        'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+        'odp': 'application/vnd.oasis.opendocument.presentation',
+        'pdf': 'application/pdf',
+        'txt': 'text/plain',
+    },
+    'drawing': {
+        'png': 'image/png',
+        'jpg': 'image/jpeg',
+        'svg': 'image/svg+xml',
+        'pdf': 'application/pdf',
+    },
+}
+
+# Format used per type unless GDUP_EXPORT_FORMATS (e.g. "document=docx,spreadsheet=csv") says otherwise
+DEFAULT_EXPORT_FORMATS = {
+    'document': 'pdf',
+    'spreadsheet': 'xlsx',
+    'presentation': 'pptx',
+    'drawing': 'png',
+}
+
+# Default export per Workspace mimeType: mimeType -> (export mimeType, extension)
+EXPORT_MIMETYPES = {
+    f'application/vnd.google-apps.{kind}': (EXPORT_FORMATS[kind][extension], f'.{extension}')
+    for kind, extension in DEFAULT_EXPORT_FORMATS.items()
+}
+
+DEFAULT_EXPORT_CACHE_SIZE = 512 * 1024 * 1024
+
+# The md5-keyed store of downloaded files is off unless given a budget
+DEFAULT_BLOB_CACHE_SIZE = 0
+
+
+def get_export_format(mime_type: str) -> Optional[Tuple[str, str]]:
     """
-    List files in a specific folder.
+    Get the export format for a Google Workspace file type.
+    
+    Args:
+        mime_type: Workspace mimeType (e.g. application/vnd.google-apps.document)
+    
+    Returns:
+        (export mimeType, extension), or None if the type cannot be exported
+    """
+    kind = mime_type.rsplit('.', 1)[-1]
+    formats = EXPORT_FORMATS.get(kind)
+    if not formats:
+        return None
+    
+    chosen = dict(DEFAULT_EXPORT_FORMATS)
+    for item in get_setting('export_formats', '').split(','):
+        if '=' in item:
+            name, extension = item.split('=', 1)
+            chosen[name.strip()] = extension.strip().lower().lstrip('.')
+    
+    extension = chosen[kind]
+    if extension not in formats:
+        raise ValueError(f"Cannot export {kind} as {extension} (use one of: {', '.join(formats)})")
+    return formats[extension], f'.{extension}'
+
+
+_file_caches: Dict[str, FileCache] = {}
+
+
+def _get_file_cache(name: str, default_size: int) -> Optional[FileCache]:
+    """Get a file cache sized by GDUP_<NAME>_CACHE_SIZE, or None if that is 0."""
+    if name not in _file_caches:
+        size = get_setting(f'{name}_cache_size', default_size)
+        if size <= 0:
+            return None
+        _file_caches[name] = FileCache(f'{name}s', size)
+    return _file_caches[name]
+
+
+def get_open_file_caches() -> Dict[str, FileCache]:
+    """Get the file caches this process has opened, named as in ``gdup cache``."""
+    return {f'{name}s': cache for name, cache in _file_caches.items()}
+
+
+def get_export_cache() -> Optional[FileCache]:
+    """Get the export cache, or None if GDUP_EXPORT_CACHE_SIZE is 0."""
+    return _get_file_cache('export', DEFAULT_EXPORT_CACHE_SIZE)
+
+
+def get_blob_store() -> Optional[FileCache]:
+    """Get the store of downloaded files keyed by md5Checksum, or None if GDUP_BLOB_CACHE_SIZE is 0."""
+    return _get_file_cache('blob', DEFAULT_BLOB_CACHE_SIZE)
+
+
+def _is_rate_limited(error: HttpError) -> bool:
+    """Check if an API error is a quota/rate limit response."""
+    status = getattr(error.resp, 'status', None)
+    if status == 429:
+        return True
+    content = error.content or b''
+    if isinstance(content, str):
+        content = content.encode()
+    return status == 403 and b'ratelimitexceeded' in content.lower()
+
+
+def _call(func, bucket: str = 'metadata', method: str = 'drive.request'):
+    """
+    Run a single Drive API call through the shared rate limiter.
+    
+    Connection errors are retried after a short pause and rate limit
+    responses back off every caller sharing the bucket.
+    
+    Args:
+        func: Callable performing the request (e.g. request.execute)
+        bucket: Rate limit bucket ('metadata' or 'media')
+        method: API method name used for tracing
+    
+    Returns:
+        Result of the call
+    """
+    tracer = trace.tracer
+    registry = metrics.registry
+    if tracer is not None or registry is not None:
+        start = time.perf_counter()
+    if tracer is not None:
+        bytes_in, bytes_out, _ = tracer.io_counters()
+    
+    retries = 0
+    sleep = 0.0
+    throttled = 0
+    error = None
+    succeeded = False
+    
+    try:
+        for attempt in range(MAX_RETRIES):
+            retries = attempt
+            sleep += ratelimit.acquire(bucket)
+            try:
+                result = func()
+                succeeded = True
+                return result
+            except HttpError as e:
+                if _is_rate_limited(e):
+                    throttled += 1
+                    if attempt < MAX_RETRIES - 1:
+                        if ratelimit.get_bucket(bucket).rate > 0:
+                            ratelimit.penalize(bucket, 2 ** attempt)
+                        else:
+                            # No bucket to drain when limiting is off: back off this caller
+                            time.sleep(2 ** attempt)
+                            sleep += 2 ** attempt
+                        continue
+                error = f"HttpError {e.resp.status}"
+                raise
+            except (ConnectionError, OSError) as e:
+                if attempt < MAX_RETRIES - 1:
+                    time.sleep(1)  # Wait before retry
+                    sleep += 1
+                    continue
+                error = type(e).__name__
+                raise ConnectionError(
+                    f"Connection error after {MAX_RETRIES} attempts. Please check your internet connection."
+                )
+    finally:
+        if tracer is not None:
+            total_in, total_out, status = tracer.io_counters()
+            tracer.call(
+                method, bucket, time.perf_counter() - start, retries, sleep, status,
+                total_in - bytes_in, total_out - bytes_out, error
+            )
+        if registry is not None:
+            registry.call(
+                method, bucket, time.perf_counter() - start, retries, sleep, throttled,
+                None if succeeded else error or 'error'
+            )
+
+
+def _execute(request, bucket: str = 'metadata'):
+    """Execute an API request with rate limiting and retries."""
+    return _call(request.execute, bucket, getattr(request, 'methodId', 'drive.request'))
+
+
+def _next_chunk(transfer, method: str):
+    """Transfer the next chunk of a resumable upload or download."""
+    return _call(transfer.next_chunk, 'media', method)
+
+
+def quote_query(value: str) -> str:
+    """Quote a string literal for a Drive query."""
+    return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+LIST_FIELDS = "id, name, mimeType, size, modifiedTime, webViewLink"
+
+
+def iter_files(folder_id: str = 'root', query: Optional[str] = None, page_size: int = 1000,
+               order_by: Optional[str] = "folder,name", fields: str = LIST_FIELDS):
+    """
+    Iterate over the files in a folder, fetching one page at a time.
     
     Args:
         folder_id: ID of the folder to list (default: root)
-        page_size: Maximum number of files to return
+        query: Extra query terms ANDed with the parent filter
+        page_size: Number of files fetched per request
+        order_by: Sort order, or None for the server's default
+        fields: File fields to return
+    
+    Yields:
+        File metadata dictionaries
+    """
+    q = f"{quote_query(folder_id)} in parents and trashed=false"
+    if query:
+        q += f" and ({query})"
+    
+    params = {
+        'q': q,
+        'pageSize': page_size,
+        'fields': f"nextPageToken, files({fields})",
+    }
+    if order_by:
+        params['orderBy'] = order_by
+    
+    yield from _paginate(params)
+
+
+def _paginate(params: Dict[str, Any]):
+    """Yield the files of a files.list query, one page at a time."""
+    service = get_drive_service()
+    params = dict(params)
+    
+    while True:
+        results = _execute(service.files().list(**params))
+        yield from results.get('files', [])
+        
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return
+        params['pageToken'] = page_token
+
+
+SEARCH_FIELDS = "id, name, mimeType, size, modifiedTime, webViewLink, parents"
+
+# Parent folders combined into one files.list query by scan_tree
+SCAN_BATCH = 40
+
+
+def search_files(query: str, page_size: int = 1000, fields: str = SEARCH_FIELDS):
+    """
+    Search the whole drive with a files.list query.
+    
+    Args:
+        query: Drive query terms (e.g. "name contains 'report'")
+        page_size: Number of files fetched per request
+        fields: File fields to return
+    
+    Yields:
+        Metadata of matching files (including parents) as pages arrive
+    """
+    q = "trashed=false"
+    if query:
+        q += f" and ({query})"
+    
+    yield from _paginate({
+        'q': q,
+        'pageSize': page_size,
+        'fields': f"nextPageToken, files({fields})",
+    })
+
+
+def scan_tree(folder_id: Union[str, List[str]], page_size: int = 1000, fields: str = SEARCH_FIELDS):
+    """
+    List every entry below a folder (or several), level by level.
+    
+    Up to SCAN_BATCH folders are listed per query ("'a' in parents or
+    'b' in parents ..."), so the number of requests depends on the number
+    of result pages rather than the number of folders.
+    
+    Args:
+        folder_id: ID of the folder to scan, or a list of IDs
+        page_size: Number of files fetched per request
+        fields: File fields to return (must include parents)
+    
+    Yields:
+        Metadata of every file and folder in the subtree
+    """
+    pending = [folder_id] if isinstance(folder_id, str) else list(folder_id)
+    
+    while pending:
+        batch, pending = pending[:SCAN_BATCH], pending[SCAN_BATCH:]
+        parents = ' or '.join(f"{quote_query(parent)} in parents" for parent in batch)
+        
+        for file in _paginate({
+            'q': f"({parents}) and trashed=false",
+            'pageSize': page_size,
+            'fields': f"nextPageToken, files({fields})",
+        }):
+            if is_folder(file):
+                pending.append(file['id'])
+            yield file
+
+
+CHANGE_FIELDS = "id, name, mimeType, size, md5Checksum, modifiedTime, parents, trashed"
+
+
+def get_start_page_token() -> str:
+    """Get a changes-feed page token for changes made from now on."""
+    service = get_drive_service()
+    return _execute(service.changes().getStartPageToken())['startPageToken']
+
+
+def list_changes(page_token: str, page_size: int = 1000,
+                 fields: str = CHANGE_FIELDS) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Get every change made since a page token.
+    
+    Args:
+        page_token: Token from get_start_page_token or an earlier call
+        page_size: Number of changes fetched per request
+        fields: File fields to return for each change
     
     Returns:
-        List of file metadata dictionaries
+        (changes, token for the next call). Each change has ``fileId``,
+        ``removed`` and, unless removed, ``file``
     """
     service = get_drive_service()
+    changes = []
+    
+    while True:
+        results = _execute(service.changes().list(
+            pageToken=page_token,
+            pageSize=page_size,
+            spaces='drive',
+            includeRemoved=True,
+            fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({fields}))"
+        ))
+        changes.extend(results.get('changes', []))
+        
+        if 'newStartPageToken' in results:
+            return changes, results['newStartPageToken']
+        page_token = results['nextPageToken']
+
+
+class PathResolver:
+    """
+    Rebuilds full Drive paths from parent IDs.
     
-    query = f"'{folder_id}' in parents and trashed=false"
+    Folder paths are memoized, so resolving many files in the same
+    folders costs one metadata lookup per distinct folder (served from
+    the metadata cache when possible) instead of a walk per file.
+    """
     
-    # Retry logic for SSL errors
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            results = service.files().list(
-                q=query,
-                pageSize=page_size,
-                fields="files(id, name, mimeType, size, modifiedTime, webViewLink)",
-                orderBy="folder,name"
-            ).execute()
-            
-            return results.get('files', [])
-        except (ConnectionError, OSError) as e:
-            if attempt < max_retries - 1:
-                time.sleep(1)  # Wait before retry
-                continue
-            raise Exception(f"Connection error after {max_retries} attempts. Please check your internet connection.")
+    def __init__(self):
+        self._paths: Dict[str, str] = {'root': '/'}
+        self._root_id: Optional[str] = None
+    
+    def _is_root(self, folder_id: str) -> bool:
+        if self._root_id is None:
+            root = get_file_by_id('root')
+            self._root_id = root['id'] if root else 'root'
+            self._paths[self._root_id] = '/'
+        return folder_id == self._root_id
+    
+    def add_folder(self, folder: Dict[str, Any]) -> None:
+        """Remember a folder seen elsewhere (e.g. in search results)."""
+        metadata_cache.put_file(folder)
+    
+    def folder_path(self, folder_id: str) -> str:
+        """Get the full path of a folder."""
+        chain = []
+        current = folder_id
+        
+        while current not in self._paths and not self._is_root(current):
+            folder = get_file_by_id(current)
+            if not folder:
+                # Not accessible (e.g. shared with us): show it as top level
+                self._paths[current] = '/'
+                break
+            chain.append((current, folder['name']))
+            parents = folder.get('parents') or []
+            if not parents:
+                self._paths[current] = f"/{folder['name']}"
+                chain.pop()
+                break
+            current = parents[0]
+        
+        path = self._paths.get(current, '/')
+        for folder_id_, name in reversed(chain):
+            path = path.rstrip('/') + '/' + name
+            self._paths[folder_id_] = path
+        return self._paths.get(folder_id, path)
+    
+    def path_of(self, file: Dict[str, Any]) -> str:
+        """Get the full path of a file."""
+        parents = file.get('parents') or []
+        if not parents:
+            return '/' + file['name']
+        return self.folder_path(parents[0]).rstrip('/') + '/' + file['name']
+
+
+def list_files(folder_id: str = 'root', page_size: int = 1000) -> List[Dict[str, Any]]:
+    """
+    List all files in a specific folder.
+    
+    Args:
+        folder_id: ID of the folder to list (default: root)
+        page_size: Number of files fetched per request
+    
+    Returns:
+        List of file metadata dictionaries
+    """
+    cached = metadata_cache.get_listing(folder_id)
+    if cached is not None:
+        return cached
+    
+    files = list(iter_files(folder_id, page_size=page_size))
+    metadata_cache.put_listing(folder_id, files)
+    return files
+
+
+def stream_files(folder_id: str = 'root', page_size: int = 1000):
+    """
+    Iterate over a folder like list_files, yielding entries as pages arrive.
+    
+    A listing that is read to the end is cached as list_files would.
+    
+    Args:
+        folder_id: ID of the folder to list (default: root)
+        page_size: Number of files fetched per request
+    
+    Yields:
+        File metadata dictionaries
+    """
+    cached = metadata_cache.get_listing(folder_id)
+    if cached is not None:
+        yield from cached
+        return
+    
+    files = []
+    for file in iter_files(folder_id, page_size=page_size):
+        files.append(file)
+        yield file
+    metadata_cache.put_listing(folder_id, files)
+
+
+def list_folders(folder_ids: List[str], page_size: int = 1000) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    List several folders with one query per SCAN_BATCH folders.
+    
+    Every listing is cached as if it came from list_files, in the same
+    order, so later list_files calls for these folders need no request.
+    
+    Args:
+        folder_ids: IDs of the folders to list
+        page_size: Number of files fetched per request
+    
+    Returns:
+        Mapping of folder ID to its entries
+    """
+    listings: Dict[str, List[Dict[str, Any]]] = {}
+    
+    for start in range(0, len(folder_ids), SCAN_BATCH):
+        batch = folder_ids[start:start + SCAN_BATCH]
+        parents = ' or '.join(f"{quote_query(parent)} in parents" for parent in batch)
+        batch_listings = {folder_id: [] for folder_id in batch}
+        
+        for file in _paginate({
+            'q': f"({parents}) and trashed=false",
+            'pageSize': page_size,
+            'orderBy': "folder,name",
+            'fields': f"nextPageToken, files({LIST_FIELDS}, parents)",
+        }):
+            for parent in file.pop('parents', []):
+                if parent in batch_listings:
+                    batch_listings[parent].append(file)
+        
+        # Only complete listings are cached, so a failed page caches nothing
+        for folder_id, files in batch_listings.items():
+            metadata_cache.put_listing(folder_id, files)
+        listings.update(batch_listings)
+    
+    return listings
+
+
+def is_glob(pattern: str) -> bool:
+    """Check if a name contains glob wildcards."""
+    return any(char in pattern for char in '*?[')
+
+
+def glob_query(pattern: str, files_only: bool = False) -> Optional[str]:
+    """
+    Translate a glob pattern into Drive query terms that narrow the listing.
+    
+    Drive's ``name contains`` only matches name prefixes, so only the
+    literal text before the first wildcard is sent to the server; the
+    pattern itself is applied client-side.
+    
+    Args:
+        pattern: Glob pattern (e.g. "report_*.csv")
+        files_only: Exclude folders
+    
+    Returns:
+        Query string, or None if the server cannot narrow the listing
+    """
+    terms = []
+    
+    prefix = re.split(r'[*?\[]', pattern, maxsplit=1)[0]
+    if prefix:
+        terms.append(f"name contains {quote_query(prefix)}")
+    if files_only:
+        terms.append(f"mimeType != '{FOLDER_MIME_TYPE}'")
+    
+    return ' and '.join(terms) or None
+
+
+def find_files(pattern: str, folder_id: str = 'root', files_only: bool = False,
+               fields: str = LIST_FIELDS):
+    """
+    Find files in a folder whose names match a glob pattern.
+    
+    Matches are streamed as each result page arrives.
+    
+    Args:
+        pattern: Glob pattern (e.g. "*.csv")
+        folder_id: ID of the folder to search
+        files_only: Skip folders
+        fields: File fields to return
+    
+    Yields:
+        Metadata of matching files
+    """
+    for file in iter_files(folder_id, glob_query(pattern, files_only), order_by=None, fields=fields):
+        if fnmatch.fnmatchcase(file['name'], pattern):
+            file = {'parents': [folder_id], **file}
+            # Lets download_file skip its metadata lookup
+            metadata_cache.put_file(file)
+            yield file
 
 
 def get_file_by_name(name: str, parent_id: str = 'root') -> Optional[Dict[str, Any]]:
@@ -55,27 +595,33 @@ def get_file_by_name(name: str, parent_id: str = 'root') -> Optional[Dict[str, A
     Returns:
         File metadata dictionary or None if not found
     """
+    known, cached = metadata_cache.find_child(parent_id, name)
+    if known:
+        return cached
+    
     service = get_drive_service()
     
-    query = f"name='{name}' and '{parent_id}' in parents and trashed=false"
+    query = f"name = {quote_query(name)} and {quote_query(parent_id)} in parents and trashed=false"
     
-    # Retry logic for SSL errors
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            results = service.files().list(
-                q=query,
-                pageSize=1,
-                fields="files(id, name, mimeType, size, modifiedTime, webViewLink)"
-            ).execute()
-            
-            files = results.get('files', [])
-            return files[0] if files else None
-        except (ConnectionError, OSError) as e:
-            if attempt < max_retries - 1:
-                time.sleep(1)
-                continue
-            return None
+    try:
+        results = _execute(service.files().list(
+            q=query,
+            pageSize=1,
+            fields="files(id, name, mimeType, size, modifiedTime, webViewLink)"
+        ))
+    except ConnectionError:
+        return None
+    
+    files = results.get('files', [])
+    if not files:
+        return None
+    
+    file = {'parents': [parent_id], **files[0]}
+    metadata_cache.put_file(file)
+    return file
+
+
+FILE_FIELDS = "id, name, mimeType, size, modifiedTime, md5Checksum, version, webViewLink, parents"
 
 
 def get_file_by_id(file_id: str) -> Optional[Dict[str, Any]]:
@@ -88,29 +634,27 @@ def get_file_by_id(file_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         File metadata dictionary
     """
+    cached = metadata_cache.get_file(file_id)
+    if cached is not None:
+        return cached
+    
     service = get_drive_service()
     
-    # Retry logic for SSL errors
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            file = service.files().get(
-                fileId=file_id,
-                fields="id, name, mimeType, size, modifiedTime, webViewLink, parents"
-            ).execute()
-            return file
-        except (ConnectionError, OSError) as e:
-            if attempt < max_retries - 1:
-                time.sleep(1)
-                continue
-            return None
-        except Exception:
-            return None
+    try:
+        file = _execute(service.files().get(
+            fileId=file_id,
+            fields=FILE_FIELDS
+        ))
+    except Exception:
+        return None
+    
+    metadata_cache.put_file(file)
+    return file
 
 
 def is_folder(file_metadata: Dict[str, Any]) -> bool:
     """Check if a file is a folder."""
-    return file_metadata.get('mimeType') == 'application/vnd.google-apps.folder'
+    return file_metadata.get('mimeType') == FOLDER_MIME_TYPE
 
 
 def create_folder(name: str, parent_id: str = 'root') -> Dict[str, Any]:
@@ -128,27 +672,22 @@ def create_folder(name: str, parent_id: str = 'root') -> Dict[str, Any]:
     
     file_metadata = {
         'name': name,
-        'mimeType': 'application/vnd.google-apps.folder',
+        'mimeType': FOLDER_MIME_TYPE,
         'parents': [parent_id]
     }
     
-    # Retry logic for SSL errors
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            folder = service.files().create(
-                body=file_metadata,
-                fields='id, name, mimeType'
-            ).execute()
-            return folder
-        except (ConnectionError, OSError) as e:
-            if attempt < max_retries - 1:
-                time.sleep(1)
-                continue
-            raise Exception(f"Connection error after {max_retries} attempts. Please check your internet connection.")
+    folder = _execute(service.files().create(
+        body=file_metadata,
+        fields='id, name, mimeType'
+    ))
+    
+    metadata_cache.invalidate(parent_id)
+    return folder
 
 
-def upload_file(file_path: str, parent_id: str = 'root', callback=None) -> Dict[str, Any]:
+def upload_file(file_path: str, parent_id: str = 'root', callback=None,
+                chunk_size: Optional[int] = None, session_uri: Optional[str] = None,
+                on_session=None, verify: Optional[bool] = None) -> Dict[str, Any]:
     """
     Upload a file to Google Drive.
     
@@ -156,12 +695,20 @@ def upload_file(file_path: str, parent_id: str = 'root', callback=None) -> Dict[
         file_path: Local path to the file
         parent_id: ID of the parent folder
         callback: Progress callback function
+        chunk_size: Bytes sent per request (default: googleapiclient's 100 MB)
+        session_uri: Resumable session to continue instead of starting a new one
+        on_session: Called with the resumable session URI once it is known
+        verify: Compare the MD5 of the sent bytes with Drive's md5Checksum
+            and upload again on a mismatch (default: GDUP_VERIFY)
     
     Returns:
         Uploaded file metadata
     """
     service = get_drive_service()
     
+    if verify is None:
+        verify = get_verify()
+    
     file_name = os.path.basename(file_path)
     
     file_metadata = {
@@ -169,37 +716,100 @@ def upload_file(file_path: str, parent_id: str = 'root', callback=None) -> Dict[
         'parents': [parent_id]
     }
     
-    media = MediaFileUpload(
-        file_path,
-        resumable=True
-    )
-    
-    request = service.files().create(
-        body=file_metadata,
-        media_body=media,
-        fields='id, name, mimeType, size, webViewLink'
-    )
+    fields = 'id, name, mimeType, size, webViewLink'
+    if verify:
+        fields += ', md5Checksum'
     
-    response = None
-    max_retries = 3
-    
-    while response is None:
-        for attempt in range(max_retries):
-            try:
-                status, response = request.next_chunk()
+    for attempt in range(VERIFY_ATTEMPTS if verify else 1):
+        media = (HashingFileUpload if verify else ReadAheadUpload)(
+            file_path,
+            chunksize=chunk_size or DEFAULT_CHUNK_SIZE,
+            resumable=True
+        )
+        
+        request = service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields=fields
+        )
+        
+        response = None
+        
+        if session_uri:
+            # Ask the server how much of the earlier session it has received
+            # before sending more
+            offset, response = _query_session(request, session_uri, media.size())
+            if offset is None:
+                session_uri = None
+            else:
+                request.resumable_uri = session_uri
+                request.resumable_progress = offset
+        
+        try:
+            while response is None:
+                status, response = _next_chunk(request, 'drive.files.create.chunk')
+                if on_session and request.resumable_uri != session_uri:
+                    session_uri = request.resumable_uri
+                    on_session(session_uri)
                 if status and callback:
                     callback(status.progress())
-                break  # Success, exit retry loop
-            except (ConnectionError, OSError) as e:
-                if attempt < max_retries - 1:
-                    time.sleep(1)
-                    continue
-                raise Exception(f"Connection error after {max_retries} attempts. Please check your internet connection.")
+        finally:
+            media.stop_reading()
+        
+        metadata_cache.invalidate(parent_id)
+        
+        expected = response.get('md5Checksum')
+        if not verify or not expected:
+            return response
+        actual = media.md5()
+        if actual == expected:
+            return response
+        
+        # The copy on Drive is damaged: remove it and send the file again
+        _execute(service.files().delete(fileId=response['id']))
+        session_uri = None
     
-    return response
+    raise IntegrityError(file_name, expected, actual)
 
 
-def upload_folder(folder_path: str, parent_id: str = 'root', callback=None) -> Dict[str, Any]:
+def _query_session(request, session_uri: str, total: int) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+    """
+    Ask a resumable upload session how many bytes the server has stored.
+    
+    Args:
+        request: Upload request whose transport sends the query
+        session_uri: Resumable session URI from an earlier attempt
+        total: Size of the file being uploaded
+    
+    Returns:
+        Tuple of (bytes received, file metadata if the upload already
+        finished); the offset is None when the session has expired
+    """
+    def query():
+        resp, content = request.http.request(
+            session_uri,
+            method='PUT',
+            body=b'',
+            headers={'Content-Range': f'bytes */{total}', 'Content-Length': '0'}
+        )
+        if resp.status not in (200, 201, 308, 404, 410):
+            raise HttpError(resp, content, uri=session_uri)
+        return resp, content
+    
+    resp, content = _call(query, 'media', 'drive.files.create.status')
+    
+    if resp.status in (404, 410):
+        return None, None
+    if resp.status in (200, 201):
+        return total, json.loads(content)
+    
+    # 308: the Range header covers the bytes stored so far, if any
+    match = re.match(r'bytes=0-(\d+)', resp.get('range', ''))
+    return (int(match.group(1)) + 1 if match else 0), None
+
+
+def upload_folder(folder_path: str, parent_id: str = 'root', callback=None,
+                  verify: Optional[bool] = None) -> Dict[str, Any]:
     """
     Upload a folder and its contents recursively.
     
@@ -207,6 +817,7 @@ def upload_folder(folder_path: str, parent_id: str = 'root', callback=None) -> D
         folder_path: Local path to the folder
         parent_id: ID of the parent folder
         callback: Progress callback function
+        verify: Verify every file against md5Checksum (default: GDUP_VERIFY)
     
     Returns:
         Created folder metadata
@@ -222,13 +833,121 @@ def upload_folder(folder_path: str, parent_id: str = 'root', callback=None) -> D
         item_path = os.path.join(folder_path, item)
         
         if os.path.isfile(item_path):
-            upload_file(item_path, folder_id, callback)
+            upload_file(item_path, folder_id, callback, verify=verify)
         elif os.path.isdir(item_path):
-            upload_folder(item_path, folder_id, callback)
+            upload_folder(item_path, folder_id, callback, verify)
     
     return folder_metadata
 
 
+def update_file(file_id: str, file_path: str, callback=None,
+                chunk_size: Optional[int] = None, verify: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Replace the content of a Drive file with a local file.
+    
+    The file keeps its ID, link and sharing settings.
+    
+    Args:
+        file_id: ID of the Drive file
+        file_path: Local path of the new content
+        callback: Progress callback function
+        chunk_size: Bytes sent per request (default: googleapiclient's 100 MB)
+        verify: Compare the MD5 of the sent bytes with Drive's md5Checksum
+            and upload again on a mismatch (default: GDUP_VERIFY)
+    
+    Returns:
+        Updated file metadata
+    """
+    service = get_drive_service()
+    
+    if verify is None:
+        verify = get_verify()
+    
+    fields = 'id, name, mimeType, size, parents'
+    if verify:
+        fields += ', md5Checksum'
+    
+    for attempt in range(VERIFY_ATTEMPTS if verify else 1):
+        media = (HashingFileUpload if verify else ReadAheadUpload)(
+            file_path,
+            chunksize=chunk_size or DEFAULT_CHUNK_SIZE,
+            resumable=True
+        )
+        request = service.files().update(fileId=file_id, media_body=media, fields=fields)
+        
+        response = None
+        try:
+            while response is None:
+                status, response = _next_chunk(request, 'drive.files.update.chunk')
+                if status and callback:
+                    callback(status.progress())
+        finally:
+            media.stop_reading()
+        
+        metadata_cache.invalidate(file_id)
+        for parent in response.get('parents', []):
+            metadata_cache.invalidate(parent)
+        
+        expected = response.get('md5Checksum')
+        if not verify or not expected:
+            return response
+        actual = media.md5()
+        if actual == expected:
+            return response
+    
+    raise IntegrityError(os.path.basename(file_path), expected, actual)
+
+
+def move_file(file_id: str, name: Optional[str] = None, new_parent: Optional[str] = None,
+              old_parent: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Rename a file or folder and/or move it to another folder.
+    
+    Args:
+        file_id: ID of the file or folder
+        name: New name (None keeps the name)
+        new_parent: Folder to move it to (None keeps the folder)
+        old_parent: Folder it is moved out of (looked up if not given)
+    
+    Returns:
+        Updated file metadata
+    """
+    service = get_drive_service()
+    
+    if new_parent and not old_parent:
+        file = get_file_by_id(file_id)
+        old_parent = ((file or {}).get('parents') or [None])[0]
+    
+    kwargs = {'fileId': file_id, 'body': {'name': name} if name else {}, 'fields': 'id, name, parents'}
+    if new_parent and new_parent != old_parent:
+        kwargs['addParents'] = new_parent
+        if old_parent:
+            kwargs['removeParents'] = old_parent
+    
+    response = _execute(service.files().update(**kwargs))
+    
+    for folder_id in (file_id, new_parent, old_parent):
+        if folder_id:
+            metadata_cache.invalidate(folder_id)
+    return response
+
+
+def trash_file(file_id: str, parent_id: Optional[str] = None) -> None:
+    """
+    Move a file or folder (with everything in it) to the trash.
+    
+    Args:
+        file_id: ID of the file or folder
+        parent_id: Folder it is in, whose cached listing is dropped
+    """
+    service = get_drive_service()
+    _execute(service.files().update(fileId=file_id, body={'trashed': True}, fields='id'))
+    
+    metadata_cache.invalidate(file_id)
+    if parent_id:
+        metadata_cache.invalidate(parent_id)
+
+
 def get_file_link(file_id: str) -> str:
     """
     Get the web view link for a file.
@@ -243,6 +962,45 @@ def get_file_link(file_id: str) -> str:
     return file.get('webViewLink', f'https://drive.google.com/file/d/{file_id}/view')
 
 
+PUBLIC_PERMISSION = {
+    'type': 'anyone',
+    'role': 'reader'
+}
+
+# Requests sent per batch call (the API accepts up to 100)
+BATCH_SIZE = 100
+
+
+def execute_batch(requests: List[Any], bucket: str = 'metadata') -> List[Tuple[Any, Optional[Exception]]]:
+    """
+    Execute API requests in as few HTTP round trips as possible.
+    
+    Requests are sent as multipart batch calls of up to BATCH_SIZE
+    requests each. Every batch call goes through the rate limiter once;
+    errors of individual requests are returned rather than raised.
+    
+    Args:
+        requests: Unexecuted API requests
+        bucket: Rate limit bucket
+    
+    Returns:
+        (response, exception) for every request, in order
+    """
+    service = get_drive_service()
+    results: List[Tuple[Any, Optional[Exception]]] = [(None, None)] * len(requests)
+    
+    for start in range(0, len(requests), BATCH_SIZE):
+        def callback(request_id, response, exception, start=start):
+            results[start + int(request_id)] = (response, exception)
+        
+        batch = service.new_batch_http_request(callback=callback)
+        for offset, request in enumerate(requests[start:start + BATCH_SIZE]):
+            batch.add(request, request_id=str(offset))
+        _call(batch.execute, bucket, 'drive.batch')
+    
+    return results
+
+
 def make_file_public(file_id: str) -> None:
     """
     Make a file publicly accessible.
@@ -252,25 +1010,36 @@ def make_file_public(file_id: str) -> None:
     """
     service = get_drive_service()
     
-    permission = {
-        'type': 'anyone',
-        'role': 'reader'
-    }
+    _execute(service.permissions().create(
+        fileId=file_id,
+        body=PUBLIC_PERMISSION
+    ))
+
+
+def make_files_public(file_ids: List[str]) -> Dict[str, Optional[Exception]]:
+    """
+    Make many files publicly accessible with batched permission calls.
     
-    # Retry logic for SSL errors
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            service.permissions().create(
-                fileId=file_id,
-                body=permission
-            ).execute()
-            return
-        except (ConnectionError, OSError) as e:
-            if attempt < max_retries - 1:
-                time.sleep(1)
-                continue
-            raise Exception(f"Connection error after {max_retries} attempts. Please check your internet connection.")
+    Args:
+        file_ids: IDs of the files
+    
+    Returns:
+        Mapping of file ID to the error it failed with (None on success)
+    """
+    service = get_drive_service()
+    
+    requests = [
+        service.permissions().create(fileId=file_id, body=PUBLIC_PERMISSION, fields='id')
+        for file_id in file_ids
+    ]
+    results = execute_batch(requests)
+    
+    return {file_id: error for file_id, (_, error) in zip(file_ids, results)}
+
+
+def has_public_permission(file: Dict[str, Any]) -> bool:
+    """Check the ``permissions`` of file metadata for public access."""
+    return any(p.get('type') == 'anyone' for p in file.get('permissions') or [])
 
 
 def is_file_public(file_id: str) -> bool:
@@ -285,27 +1054,118 @@ def is_file_public(file_id: str) -> bool:
     """
     service = get_drive_service()
     
-    # Retry logic for SSL errors
-    max_retries = 3
-    for attempt in range(max_retries):
+    try:
+        permissions = _execute(service.permissions().list(
+            fileId=file_id,
+            fields='permissions(type, role)'
+        ))
+    except Exception:
+        return False
+    
+    return has_public_permission(permissions)
+
+
+_END = object()
+
+
+def _advance(iterator):
+    """Next item of an iterator, or _END when exhausted."""
+    return next(iterator, _END)
+
+
+def _children(folder_id: str):
+    """Iterate over a folder's entries, streaming pages unless already cached."""
+    cached = metadata_cache.get_listing(folder_id)
+    if cached is not None:
+        return iter(cached)
+    return iter_files(folder_id)
+
+
+def walk_tree(folder_id: str = 'root', max_depth: int = 10):
+    """
+    Walk a folder hierarchy depth-first without recursion.
+    
+    Only one listing iterator (and its current page) per level is kept,
+    so memory grows with the depth of the tree rather than its size, and
+    the first entry is yielded as soon as the first page arrives.
+    
+    Args:
+        folder_id: ID of the folder to start from
+        max_depth: Maximum depth to descend
+    
+    Yields:
+        Tuples of (depth, is_last, file). ``file`` is None where a folder
+        could not be read.
+    """
+    if max_depth <= 0:
+        return
+    
+    # One [iterator, lookahead] pair per level
+    stack = []
+    
+    def push(parent_id):
+        iterator = _children(parent_id)
+        stack.append([iterator, _advance(iterator)])
+    
+    try:
+        push(folder_id)
+    except Exception:
+        yield 0, True, None
+        return
+    
+    while stack:
+        level = stack[-1]
+        item = level[1]
+        if item is _END:
+            stack.pop()
+            continue
+        
+        depth = len(stack) - 1
+        error = False
         try:
-            permissions = service.permissions().list(
-                fileId=file_id,
-                fields='permissions(type, role)'
-            ).execute()
-            
-            for permission in permissions.get('permissions', []):
-                if permission.get('type') == 'anyone':
-                    return True
-            
-            return False
-        except (ConnectionError, OSError) as e:
-            if attempt < max_retries - 1:
-                time.sleep(1)
-                continue
-            return False
+            level[1] = _advance(level[0])
         except Exception:
-            return False
+            level[1] = _END
+            error = True
+        
+        yield depth, level[1] is _END and not error, item
+        
+        if error:
+            yield depth, True, None
+        elif is_folder(item) and depth + 1 < max_depth:
+            try:
+                push(item['id'])
+            except Exception:
+                yield depth + 1, True, None
+
+
+def iter_tree(folder_id: str = 'root', prefix: str = '', max_depth: int = 10):
+    """
+    Generate the lines of a tree view as the hierarchy is walked.
+    
+    Args:
+        folder_id: ID of the folder to start from
+        prefix: Prefix for indentation
+        max_depth: Maximum depth to descend
+    
+    Yields:
+        Formatted tree lines
+    """
+    # Whether the most recent entry at each depth was the last one
+    lasts = []
+    
+    for depth, is_last, file in walk_tree(folder_id, max_depth):
+        del lasts[depth:]
+        indent = prefix + ''.join("    " if last else "│   " for last in lasts)
+        
+        if file is None:
+            yield indent + ("└── [Error reading folder]" if depth == 0 else "└── [Error reading subfolder]")
+        else:
+            connector = "└── " if is_last else "├── "
+            icon = "📁" if is_folder(file) else "📄"
+            yield f"{indent}{connector}{icon} {file['name']}"
+        
+        lasts.append(is_last)
 
 
 def build_tree(folder_id: str = 'root', prefix: str = '', is_last: bool = True, max_depth: int = 10, current_depth: int = 0) -> List[str]:
@@ -322,38 +1182,7 @@ def build_tree(folder_id: str = 'root', prefix: str = '', is_last: bool = True,
     Returns:
         List of formatted tree lines
     """
-    if current_depth >= max_depth:
-        return []
-    
-    try:
-        files = list_files(folder_id)
-    except Exception as e:
-        return [prefix + "└── [Error reading folder]"]
-    
-    lines = []
-    
-    for i, file in enumerate(files):
-        is_last_item = i == len(files) - 1
-        connector = "└── " if is_last_item else "├── "
-        
-        file_name = file['name']
-        if is_folder(file):
-            file_name = f"📁 {file_name}"
-        else:
-            file_name = f"📄 {file_name}"
-        
-        lines.append(prefix + connector + file_name)
-        
-        # If it's a folder, recurse
-        if is_folder(file):
-            extension = "    " if is_last_item else "│   "
-            try:
-                sub_lines = build_tree(file['id'], prefix + extension, is_last_item, max_depth, current_depth + 1)
-                lines.extend(sub_lines)
-            except Exception:
-                lines.append(prefix + extension + "└── [Error reading subfolder]")
-    
-    return lines
+    return list(iter_tree(folder_id, prefix, max_depth - current_depth))
 
 
 def resolve_path(path: str, current_folder_id: str = 'root') -> Optional[str]:
@@ -411,7 +1240,9 @@ def resolve_path(path: str, current_folder_id: str = 'root') -> Optional[str]:
     return current_folder_id
 
 
-def download_file(file_id: str, destination_path: str, callback=None) -> str:
+def download_file(file_id: str, destination_path: str, callback=None,
+                  chunk_size: Optional[int] = None, resume: bool = False,
+                  verify: Optional[bool] = None) -> str:
     """
     Download a file from Google Drive.
     
@@ -419,12 +1250,26 @@ def download_file(file_id: str, destination_path: str, callback=None) -> str:
         file_id: ID of the file to download
         destination_path: Local path where file should be saved
         callback: Progress callback function
+        chunk_size: Bytes fetched per request (default: googleapiclient's 100 MB)
+        resume: Continue a partial download already at destination_path;
+            the revision it holds is recorded in destination_path + '.meta'
+            and the download starts over if the file changed on Drive
+        verify: Compare the MD5 of the received bytes with Drive's
+            md5Checksum and download again on a mismatch (default:
+            GDUP_VERIFY; exports have no checksum and are not verified)
+    
+    When the blob store is enabled (GDUP_BLOB_CACHE_SIZE), a file whose
+    md5Checksum is already stored is linked or copied from the store
+    without a transfer, and every download is verified and then stored.
     
     Returns:
         Path to downloaded file
     """
     service = get_drive_service()
     
+    if verify is None:
+        verify = get_verify()
+    
     # Get file metadata
     file_metadata = get_file_by_id(file_id)
     if not file_metadata:
@@ -435,45 +1280,199 @@ def download_file(file_id: str, destination_path: str, callback=None) -> str:
     
     # Handle Google Workspace files by exporting them
     if mime_type.startswith('application/vnd.google-apps.'):
-        export_mimetypes = {
-            'application/vnd.google-apps.document': ('application/pdf', '.pdf'),
-            'application/vnd.google-apps.spreadsheet': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
-            'application/vnd.google-apps.presentation': ('application/vnd.openxmlformats-officedocument.presentationml.presentation', '.pptx'),
-        }
-        
-        export_info = export_mimetypes.get(mime_type)
-        if export_info:
-            export_mimetype, extension = export_info
-            request = service.files().export_media(fileId=file_id, mimeType=export_mimetype)
-            
-            # Add extension if not present
-            if not destination_path.endswith(extension):
-                destination_path += extension
-        else:
+        export_info = get_export_format(mime_type)
+        if not export_info:
             raise ValueError(f"Cannot download Google Apps file of type: {mime_type}")
-    else:
-        # Regular file download
-        request = service.files().get_media(fileId=file_id)
-    
-    # Download with progress
-    with open(destination_path, 'wb') as fh:
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        max_retries = 3
-        
-        while not done:
-            for attempt in range(max_retries):
-                try:
-                    status, done = downloader.next_chunk()
-                    if status and callback:
-                        callback(status.progress())
-                    break  # Success, exit retry loop
-                except (ConnectionError, OSError) as e:
-                    if attempt < max_retries - 1:
-                        time.sleep(1)
-                        continue
-                    raise Exception(f"Connection error after {max_retries} attempts. Please check your internet connection.")
+        export_mimetype, extension = export_info
+        
+        # Add extension if not present
+        if not destination_path.endswith(extension):
+            destination_path += extension
+        return _export_file(file_metadata, export_mimetype, destination_path, callback, chunk_size)
+    
+    # Regular file download
+    request = service.files().get_media(fileId=file_id)
+    
+    # Only verified content goes into the blob store
+    store = get_blob_store()
+    expected = None
+    if verify or store:
+        expected = file_metadata.get('md5Checksum') or _execute(service.files().get(
+            fileId=file_id, fields='md5Checksum'
+        )).get('md5Checksum')
+    
+    if store and expected and store.materialize(expected, destination_path):
+        if callback:
+            callback(1.0)
+        return destination_path
+    
+    part_meta = destination_path + PART_META_SUFFIX
+    
+    for attempt in range(VERIFY_ATTEMPTS if expected else 1):
+        offset = 0
+        if resume and os.path.exists(destination_path):
+            offset = os.path.getsize(destination_path)
+            if offset and not _same_source(part_meta, service, file_id):
+                # The file changed on Drive since the partial download began
+                offset = 0
+            elif offset == int(file_metadata.get('size') or -1):
+                if not expected or file_md5(destination_path) == expected:
+                    _remove_quietly(part_meta)
+                    if callback:
+                        callback(1.0)
+                    return destination_path
+                offset = 0
+        
+        if resume and not offset:
+            _write_part_meta(part_meta, file_metadata)
+        
+        # Download with progress
+        with open(destination_path, 'ab' if offset else 'wb') as fh:
+            writer = HashingWriter(fh) if expected else fh
+            if expected and offset:
+                writer.update_from(destination_path, offset)
+            _receive(request, writer, callback, chunk_size, offset)
+        
+        if not expected:
+            _remove_quietly(part_meta)
+            return destination_path
+        actual = writer.hexdigest()
+        if actual == expected:
+            _remove_quietly(part_meta)
+            if store:
+                _store_blob(store, expected, destination_path)
+            return destination_path
+        
+        # Start over: the damaged bytes may be anywhere in the file
+        resume = False
+    
+    _remove_quietly(part_meta)
+    os.remove(destination_path)
+    raise IntegrityError(file_metadata.get('name', file_id), expected, actual)
+
+
+def _write_part_meta(path: str, file_metadata: Dict[str, Any]) -> None:
+    """Record which revision of a file a partial download holds."""
+    with open(path, 'w') as fh:
+        json.dump({field: file_metadata.get(field) for field in PART_META_FIELDS}, fh)
+
+
+def _same_source(path: str, service, file_id: str) -> bool:
+    """Check that a partial download's revision is still the one on Drive."""
+    try:
+        with open(path) as fh:
+            recorded = json.load(fh)
+    except (OSError, ValueError):
+        # Without a record the bytes on disk cannot be trusted
+        return False
+    
+    # Fresh metadata: a cached entry could predate the change
+    current = _execute(service.files().get(fileId=file_id, fields=', '.join(PART_META_FIELDS)))
+    return all(recorded.get(field) == current.get(field) for field in PART_META_FIELDS)
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _store_blob(store: FileCache, md5: str, path: str) -> None:
+    """Add a verified download to the blob store."""
+    try:
+        store.ingest(md5, path)
+    except Exception:
+        # The store only saves later transfers; the download itself succeeded
+        pass
+
+
+def _receive(request, fh, callback=None, chunk_size: Optional[int] = None, offset: int = 0) -> None:
+    """Download a media or export request into an open file, chunk by chunk."""
+    if offset:
+        return _receive_from(request, fh, offset, callback, chunk_size)
+    
+    downloader = MediaIoBaseDownload(fh, request, chunksize=chunk_size or DEFAULT_CHUNK_SIZE)
+    done = False
+    
+    while not done:
+        status, done = _next_chunk(downloader, 'drive.files.download.chunk')
+        if status and callback:
+            callback(status.progress())
+
+
+def _receive_from(request, fh, offset: int, callback=None, chunk_size: Optional[int] = None) -> None:
+    """Continue a media download at ``offset`` with explicit Range requests."""
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    total = None
+    
+    def fetch(headers):
+        resp, content = request.http.request(request.uri, method='GET', headers=headers)
+        if resp.status != 206:
+            # A 200 would be the whole file, which cannot be appended
+            raise HttpError(resp, content, uri=request.uri)
+        return resp, content
+    
+    while total is None or offset < total:
+        headers = dict(request.headers)
+        headers['range'] = f'bytes={offset}-{offset + chunk_size - 1}'
+        resp, content = _call(lambda: fetch(headers), 'media', 'drive.files.download.chunk')
+        
+        match = re.match(r'bytes \d+-\d+/(\d+)', resp.get('content-range', ''))
+        total = int(match.group(1)) if match else offset + len(content)
+        fh.write(content)
+        offset += len(content)
+        if callback and total:
+            callback(offset / total)
+        if not content:
+            break
+
+
+def _export_file(file_metadata: Dict[str, Any], export_mimetype: str, destination_path: str,
+                 callback=None, chunk_size: Optional[int] = None) -> str:
+    """
+    Export a Google Workspace file, reusing an earlier export when unchanged.
     
+    Exports are cached by (file ID, version, export mimeType); a document
+    that has not changed since it was last exported is linked or copied
+    from the cache instead of being exported again.
+    
+    Returns:
+        Path to the exported file
+    """
+    service = get_drive_service()
+    file_id = file_metadata['id']
+    
+    cache = get_export_cache()
+    key = None
+    if cache:
+        # Metadata from a listing has no version; it changes with every edit
+        version = file_metadata.get('version') or _execute(service.files().get(
+            fileId=file_id, fields='version'
+        )).get('version')
+        key = f"{file_id}:{version}:{export_mimetype}" if version else None
+    
+    if key and cache.materialize(key, destination_path):
+        if callback:
+            callback(1.0)
+        return destination_path
+    
+    # Exports cannot be fetched by range, so they always start over
+    request = service.files().export_media(fileId=file_id, mimeType=export_mimetype)
+    target = cache.temp_path() if key else destination_path
+    try:
+        with open(target, 'wb') as fh:
+            _receive(request, fh, callback, chunk_size)
+    except BaseException:
+        if key:
+            os.remove(target)
+        raise
+    
+    if key and cache.fits(os.path.getsize(target)):
+        cache.place(cache.add(key, target), destination_path)
+    elif key:
+        # Larger than the whole cache: keep the export, just not cached
+        shutil.move(target, destination_path)
     return destination_path
 
 
@@ -0,0 +1,281 @@
+"""Size-capped local file cache.
+
+Cached files live in a directory under the config directory, with an
+SQLite index of their keys, sizes and last use. When the cache grows past
+its byte budget the least recently used files are removed.
+
+Files are fetched straight into the cache and then materialized at their
+destination as a reflink (copy-on-write clone) or, where the filesystem
+cannot clone, a plain copy. Either way the destination is a file of its
+own that the user may modify. Hardlinks are opt-in: they share the
+cache's read-only inode, so the destination cannot be written or
+re-downloaded in place until it is removed.
+
+Settings (environment variables):
+    GDUP_CACHE_LINK  How cached files are placed: reflink (reflink, then
+                     copy; the default), hardlink (reflink, hardlink, then
+                     copy) or copy
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import stat
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+from .config import get_config_dir, get_setting
+
+LINK_MODES = ('reflink', 'hardlink', 'copy')
+
+# ioctl request that clones a file's extents (Linux: btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def _reflink(source: str, destination: str) -> bool:
+    """Clone a file with copy-on-write where the filesystem supports it."""
+    if not sys.platform.startswith('linux'):
+        return False
+    import fcntl
+
+    try:
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        try:
+            os.remove(destination)
+        except OSError:
+            pass
+        return False
+
+
+class FileCache:
+    """LRU file cache with a byte budget, shared between processes."""
+
+    def __init__(self, name: str, max_bytes: int, directory: Optional[Path] = None):
+        self.directory = Path(directory or get_config_dir() / 'cache' / name)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.link_mode = get_setting('cache_link', 'reflink').lower()
+        if self.link_mode not in LINK_MODES:
+            self.link_mode = 'reflink'
+        self._index = self.directory / 'index.db'
+        self._lock = threading.Lock()
+        # Lookups by this process; stats() reports the totals of all processes
+        self.hits = 0
+        self.misses = 0
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(str(self._index), timeout=30, isolation_level=None)
+        try:
+            db.execute('PRAGMA journal_mode=WAL')
+            yield db
+        finally:
+            db.close()
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.directory / digest[:2] / digest
+
+    def _count(self, db: sqlite3.Connection, name: str, amount: int = 1) -> None:
+        db.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def get(self, key: str) -> Optional[Path]:
+        """
+        Look up a cached file and mark it as recently used.
+
+        Returns:
+            Path of the cached file, or None on a miss
+        """
+        path = self._path(key)
+        with self._connect() as db:
+            row = db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or not path.exists():
+                if row is not None:
+                    db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count(db, 'misses')
+                self.misses += 1
+                return None
+            db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._count(db, 'hits')
+            self._count(db, 'bytes_saved', row[0])
+            self.hits += 1
+        return path
+
+    def temp_path(self) -> str:
+        """A new temporary file path in the cache directory (for ``add``)."""
+        handle, path = tempfile.mkstemp(prefix='.incoming-', dir=self.directory)
+        os.close(handle)
+        return path
+
+    def fits(self, size: int) -> bool:
+        """Whether a file of ``size`` bytes can be cached within the budget."""
+        return size <= self.max_bytes
+
+    def add(self, key: str, source: str) -> Path:
+        """
+        Move a file into the cache and evict old entries past the budget.
+
+        The new entry itself is never evicted, so the returned path stays
+        valid; callers check ``fits`` first to keep the cache in budget.
+
+        Args:
+            key: Cache key
+            source: File to move (ideally from ``temp_path``, on the same filesystem)
+
+        Returns:
+            Path of the cached file
+        """
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        size = os.path.getsize(source)
+        os.chmod(source, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        os.replace(source, path)
+
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, size, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, size, now, now)
+            )
+        self.evict(keep=key)
+        return path
+
+    def ingest(self, key: str, source: str) -> Optional[Path]:
+        """
+        Add a file to the cache, leaving it where it is.
+
+        The cached copy is a reflink of ``source`` where possible, else a
+        copy. It is never a hardlink, whatever the link mode: that would
+        make the caller's file read-only along with the cache entry.
+
+        Returns:
+            Path of the cached file, or None if it is larger than the budget
+        """
+        if not self.fits(os.path.getsize(source)):
+            return None
+        temp = self.temp_path()
+        try:
+            if not _reflink(source, temp):
+                shutil.copyfile(source, temp)
+            return self.add(key, temp)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+    def materialize(self, key: str, destination: str) -> bool:
+        """
+        Place a cached file at ``destination``.
+
+        Returns:
+            True on a cache hit, False on a miss (destination untouched)
+        """
+        path = self.get(key)
+        if path is None:
+            return False
+        self.place(path, destination)
+        return True
+
+    def place(self, path: Path, destination: str) -> str:
+        """
+        Link or copy a cached file to ``destination``.
+
+        Returns:
+            How the file was placed: 'reflink', 'hardlink' or 'copy'
+        """
+        if os.path.lexists(destination):
+            os.remove(destination)
+
+        if self.link_mode != 'copy' and _reflink(str(path), destination):
+            return 'reflink'
+        if self.link_mode == 'hardlink':
+            try:
+                os.link(path, destination)
+                return 'hardlink'
+            except OSError:
+                pass  # Different filesystem or no hardlink support
+
+        shutil.copyfile(path, destination)
+        return 'copy'
+
+    def evict(self, max_bytes: Optional[int] = None, keep: Optional[str] = None) -> int:
+        """
+        Remove least recently used files until the cache fits its budget.
+
+        Args:
+            max_bytes: Budget to evict down to (default: the cache's own)
+            keep: Key of an entry that must stay (e.g. the one just added)
+
+        Returns:
+            Number of files removed
+        """
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        removed = 0
+        with self._lock, self._connect() as db:
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= budget:
+                return 0
+            for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+                if total <= budget:
+                    break
+                if key == keep:
+                    continue
+                try:
+                    self._path(key).unlink()
+                except FileNotFoundError:
+                    pass
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count(db, 'evictions')
+                total -= size
+                removed += 1
+        return removed
+
+    def clear(self) -> int:
+        """Remove every cached file."""
+        return self.evict(0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Entries, bytes used, hits, misses, hit rate and bytes saved."""
+        with self._connect() as db:
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'bytes_saved': counters.get('bytes_saved', 0),
+            'evictions': counters.get('evictions', 0),
+        }
@@ -0,0 +1,495 @@
+"""Persistent transfer queue for DUP.
+
+Uploads and downloads queued with ``gdup up --queue`` / ``gdup down --queue``
+are stored in a SQLite database in the config directory and executed by
+``gdup jobs run``. Jobs survive restarts: uploads keep their resumable
+session URI and downloads write to a ``.part`` file, so an interrupted
+job continues where it stopped.
+
+Every runner claims jobs from the same database, so the per-direction
+concurrency limits hold across processes, and the bandwidth limit is
+shared between all running jobs of a direction.
+
+Settings (environment variables):
+    GDUP_JOBS_UP          Concurrent uploads
+    GDUP_JOBS_DOWN        Concurrent downloads
+    GDUP_JOBS_UP_LIMIT    Upload bandwidth in bytes per second (0 = unlimited)
+    GDUP_JOBS_DOWN_LIMIT  Download bandwidth in bytes per second (0 = unlimited)
+    GDUP_JOBS_CHUNK_SIZE  Bytes per transfer request (multiple of 256 KB)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from .config import get_config_dir, get_setting
+from .ratelimit import TokenBucket
+
+DIRECTIONS = ('up', 'down')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+DEFAULT_CONCURRENCY = {'up': 2, 'down': 2}
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Seconds between progress writes to the database
+PROGRESS_INTERVAL = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    direction TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    name TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    total_bytes INTEGER NOT NULL DEFAULT 0,
+    done_bytes INTEGER NOT NULL DEFAULT 0,
+    rate REAL NOT NULL DEFAULT 0,
+    resume_uri TEXT,
+    result_id TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority DESC, id);
+"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a transfer when its job was cancelled."""
+
+
+class _Interrupted(Exception):
+    """Raised inside a transfer when the scheduler is stopping."""
+
+
+def get_jobs_path() -> Path:
+    """Get the path to the job database."""
+    return get_config_dir() / 'jobs.db'
+
+
+def get_concurrency(direction: str) -> int:
+    """Get the configured number of concurrent jobs for a direction."""
+    return max(1, get_setting(f"jobs_{direction}", DEFAULT_CONCURRENCY[direction]))
+
+
+def get_bandwidth(direction: str) -> float:
+    """Get the configured bandwidth limit for a direction (0 = unlimited)."""
+    return get_setting(f"jobs_{direction}_limit", 0.0)
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class JobStore:
+    """SQLite-backed queue of transfer jobs."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or get_jobs_path())
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per operation keeps the store usable
+        # from worker threads and other gdup processes at the same time
+        db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        try:
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            yield db
+        finally:
+            db.close()
+
+    def add(self, direction: str, source: str, target: str, name: str,
+            priority: int = 0, total_bytes: int = 0) -> int:
+        """
+        Queue a transfer.
+
+        Args:
+            direction: 'up' or 'down'
+            source: Local path (up) or Drive file ID (down)
+            target: Drive folder ID (up) or local path (down)
+            name: Display name
+            priority: Higher priorities run first
+            total_bytes: Size of the transfer, if known
+
+        Returns:
+            ID of the new job
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Invalid direction: {direction}")
+
+        with self._connect() as db:
+            cursor = db.execute(
+                "INSERT INTO jobs (direction, source, target, name, priority, total_bytes, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (direction, source, target, name, priority, total_bytes, time.time())
+            )
+            return cursor.lastrowid
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Get a job by ID."""
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, include_finished: bool = True) -> List[Dict[str, Any]]:
+        """List jobs, running first, then by priority and age."""
+        query = "SELECT * FROM jobs"
+        if not include_finished:
+            query += f" WHERE status IN ('{QUEUED}', '{RUNNING}')"
+        query += f" ORDER BY status = '{RUNNING}' DESC, status = '{QUEUED}' DESC, priority DESC, id"
+        with self._connect() as db:
+            return [dict(row) for row in db.execute(query)]
+
+    def recover(self) -> int:
+        """
+        Requeue running jobs whose worker process has exited.
+
+        Returns:
+            Number of jobs requeued
+        """
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            rows = db.execute(
+                "SELECT id, worker_pid FROM jobs WHERE status = ?", (RUNNING,)
+            ).fetchall()
+            stale = [row['id'] for row in rows if not _pid_alive(row['worker_pid'])]
+            for job_id in stale:
+                db.execute(
+                    "UPDATE jobs SET status = ?, worker_pid = NULL, rate = 0 WHERE id = ?",
+                    (QUEUED, job_id)
+                )
+            db.execute('COMMIT')
+        return len(stale)
+
+    def claim(self, direction: str, limit: int) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the next queued job of a direction.
+
+        No job is returned while ``limit`` jobs of the direction are
+        already running in any process.
+
+        Returns:
+            The claimed job, or None
+        """
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                running = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND direction = ?",
+                    (RUNNING, direction)
+                ).fetchone()[0]
+                if running >= limit:
+                    return None
+
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE status = ? AND direction = ? "
+                    "ORDER BY priority DESC, id LIMIT 1",
+                    (QUEUED, direction)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                now = time.time()
+                db.execute(
+                    "UPDATE jobs SET status = ?, worker_pid = ?, started = COALESCE(started, ?), "
+                    "updated = ?, error = NULL WHERE id = ?",
+                    (RUNNING, os.getpid(), now, now, row['id'])
+                )
+            finally:
+                db.execute('COMMIT')
+
+        job = dict(row)
+        job['status'] = RUNNING
+        return job
+
+    def running_count(self, direction: str) -> int:
+        """Count running jobs of a direction across all processes."""
+        with self._connect() as db:
+            return db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND direction = ?",
+                (RUNNING, direction)
+            ).fetchone()[0]
+
+    def update(self, job_id: int, **fields) -> None:
+        """Update columns of a job."""
+        if not fields:
+            return
+        fields['updated'] = time.time()
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def finish(self, job_id: int, status: str, **fields) -> None:
+        """Mark a job as finished with the given status."""
+        fields.setdefault('rate', 0)
+        self.update(job_id, status=status, finished=time.time(), worker_pid=None, **fields)
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancel a queued or running job.
+
+        Returns:
+            True if the job was cancelled
+        """
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, finished = ?, rate = 0 WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING)
+            )
+            return cursor.rowcount > 0
+
+    def retry(self, job_id: int) -> bool:
+        """
+        Requeue a failed or cancelled job.
+
+        Returns:
+            True if the job was requeued
+        """
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, error = NULL, finished = NULL WHERE id = ? AND status IN (?, ?)",
+                (QUEUED, job_id, FAILED, CANCELLED)
+            )
+            return cursor.rowcount > 0
+
+    def clear(self) -> int:
+        """
+        Remove finished jobs.
+
+        Returns:
+            Number of jobs removed
+        """
+        with self._connect() as db:
+            cursor = db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?)", (DONE, FAILED, CANCELLED)
+            )
+            return cursor.rowcount
+
+    def queued(self, direction: str) -> int:
+        """Count jobs of a direction waiting to run."""
+        with self._connect() as db:
+            return db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND direction = ?", (QUEUED, direction)
+            ).fetchone()[0]
+
+
+class _Progress:
+    """Tracks a job's progress, throttles its bandwidth and saves it periodically."""
+
+    def __init__(self, store: JobStore, job: Dict[str, Any], bandwidth: float,
+                 chunk_size: int, stop: threading.Event):
+        self.store = store
+        self.stop = stop
+        self.job = job
+        self.bandwidth = bandwidth
+        self.done = job['done_bytes']
+        self.rate = 0.0
+        self._bucket = TokenBucket(bandwidth, chunk_size) if bandwidth > 0 else None
+        self._started = self._last_time = time.monotonic()
+        self._last_done = self.done
+        self._share()
+
+    def _share(self) -> None:
+        # Split the direction's bandwidth between every running job
+        if self._bucket is not None:
+            running = max(1, self.store.running_count(self.job['direction']))
+            self._bucket.rate = self.bandwidth / running
+
+    def average(self) -> float:
+        """Average bytes per second since this run of the job started."""
+        elapsed = time.monotonic() - self._started
+        return (self.done - self.job['done_bytes']) / elapsed if elapsed > 0 else 0.0
+
+    def __call__(self, fraction: float) -> None:
+        done = int(fraction * self.job['total_bytes'])
+        if self._bucket is not None and done > self.done:
+            self._bucket.acquire(done - self.done)
+        self.done = done
+
+        if self.stop.is_set():
+            raise _Interrupted()
+
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        if elapsed < PROGRESS_INTERVAL:
+            return
+
+        current = self.store.get(self.job['id'])
+        if current is None or current['status'] != RUNNING:
+            raise JobCancelled()
+
+        speed = (self.done - self._last_done) / elapsed
+        # Smooth the rate so the ETA does not jump between chunks
+        self.rate = speed if not self.rate else 0.7 * self.rate + 0.3 * speed
+        self._last_time = now
+        self._last_done = self.done
+        self.store.update(self.job['id'], done_bytes=self.done, rate=self.rate)
+        self._share()
+
+
+class Scheduler:
+    """Runs queued jobs with per-direction worker threads."""
+
+    def __init__(self, store: Optional[JobStore] = None,
+                 concurrency: Optional[Dict[str, int]] = None,
+                 bandwidth: Optional[Dict[str, float]] = None,
+                 chunk_size: Optional[int] = None,
+                 on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        """
+        Args:
+            store: Job store (default: the config directory's database)
+            concurrency: Concurrent jobs per direction
+            bandwidth: Bytes per second per direction (0 = unlimited)
+            chunk_size: Bytes per transfer request
+            on_event: Called with ('start'|'done'|'failed'|'cancelled', job)
+        """
+        self.store = store or JobStore()
+        self.concurrency = {d: get_concurrency(d) for d in DIRECTIONS}
+        self.concurrency.update(concurrency or {})
+        self.bandwidth = {d: get_bandwidth(d) for d in DIRECTIONS}
+        self.bandwidth.update(bandwidth or {})
+        self.chunk_size = chunk_size or get_setting('jobs_chunk_size', DEFAULT_CHUNK_SIZE)
+        self.on_event = on_event
+        self._stop = threading.Event()
+
+    def run(self, watch: bool = False, poll_interval: float = 2.0) -> None:
+        """
+        Run jobs until the queue is empty (or forever when ``watch`` is set).
+
+        Args:
+            watch: Keep waiting for new jobs
+            poll_interval: Seconds between checks for new jobs
+        """
+        self.store.recover()
+
+        threads = []
+        for direction in DIRECTIONS:
+            for _ in range(self.concurrency[direction]):
+                thread = threading.Thread(
+                    target=self._worker, args=(direction, watch, poll_interval), daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(0.2)
+        except KeyboardInterrupt:
+            # Workers requeue their jobs at the next chunk boundary
+            self._stop.set()
+            for thread in threads:
+                thread.join(5)
+            raise
+
+    def stop(self) -> None:
+        """Stop after the current jobs."""
+        self._stop.set()
+
+    def _worker(self, direction: str, watch: bool, poll_interval: float) -> None:
+        while not self._stop.is_set():
+            job = self.store.claim(direction, self.concurrency[direction])
+            if job is None:
+                # Pick up jobs left behind by runners that died meanwhile
+                self.store.recover()
+                if not watch and self.store.queued(direction) == 0:
+                    return
+                self._stop.wait(poll_interval)
+                continue
+            self._run_job(job)
+
+    def _emit(self, event: str, job: Dict[str, Any]) -> None:
+        if self.on_event:
+            self.on_event(event, job)
+
+    def _run_job(self, job: Dict[str, Any]) -> None:
+        self._emit('start', job)
+        progress = _Progress(
+            self.store, job, self.bandwidth[job['direction']], self.chunk_size, self._stop
+        )
+        try:
+            if job['direction'] == 'up':
+                result_id = self._upload(job, progress)
+            else:
+                result_id = self._download(job, progress)
+        except JobCancelled:
+            self.store.update(job['id'], done_bytes=progress.done, worker_pid=None, rate=0)
+            self._emit('cancelled', job)
+            return
+        except _Interrupted:
+            self.store.update(job['id'], status=QUEUED, done_bytes=progress.done, worker_pid=None, rate=0)
+            return
+        except Exception as e:
+            self.store.finish(job['id'], FAILED, done_bytes=progress.done, error=str(e) or type(e).__name__)
+            self._emit('failed', {**job, 'error': str(e)})
+            return
+
+        progress.done = job['total_bytes']
+        self.store.finish(job['id'], DONE, done_bytes=progress.done, result_id=result_id,
+                          rate=progress.average())
+        self._emit('done', job)
+
+    def _upload(self, job: Dict[str, Any], progress: _Progress) -> str:
+        from .drive import upload_file
+
+        if not os.path.isfile(job['source']):
+            raise FileNotFoundError(f"Path not found: {job['source']}")
+
+        def on_session(uri):
+            self.store.update(job['id'], resume_uri=uri)
+
+        try:
+            result = upload_file(
+                job['source'], job['target'], progress,
+                chunk_size=self.chunk_size, session_uri=job['resume_uri'], on_session=on_session
+            )
+        except Exception as e:
+            if job['resume_uri'] and getattr(getattr(e, 'resp', None), 'status', None) in (404, 410):
+                # The resumable session expired; start a new one
+                self.store.update(job['id'], resume_uri=None, done_bytes=0)
+                result = upload_file(
+                    job['source'], job['target'], progress,
+                    chunk_size=self.chunk_size, on_session=on_session
+                )
+            else:
+                raise
+        return result['id']
+
+    def _download(self, job: Dict[str, Any], progress: _Progress) -> str:
+        from .drive import download_file
+
+        target = job['target']
+        part = target + '.part'
+        Path(target).parent.mkdir(parents=True, exist_ok=True)
+
+        result = download_file(job['source'], part, progress, chunk_size=self.chunk_size, resume=True)
+
+        # Exported Google Workspace files get an extension after '.part'
+        final = target + result[len(part):]
+        os.replace(result, final)
+        self.store.update(job['id'], target=final)
+        return job['source']
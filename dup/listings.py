@@ -0,0 +1,245 @@
+"""On-disk copy of folder listings.
+
+Every folder listing fetched from Drive is also written (names, IDs and
+folder flags only) to a SQLite database in the config directory. Shell
+completion reads it, so completing a remote path takes a local query
+instead of API calls, even in a fresh process.
+
+Commands hand listings to a ListingWriter, which writes them on a
+background thread in batches, so a command never waits on the database.
+Writes still queued when the process exits are flushed for up to a
+couple of seconds.
+
+Settings (environment variables):
+    GDUP_LISTINGS_CACHE  Keep the on-disk listing copy (default: on)
+"""
+
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .config import get_config_dir, get_setting
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    folder_id TEXT PRIMARY KEY,
+    updated REAL NOT NULL,
+    refreshing REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS entries (
+    folder_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    folder INTEGER NOT NULL,
+    PRIMARY KEY (folder_id, name, id)
+);
+CREATE INDEX IF NOT EXISTS entries_id ON entries (id);
+"""
+
+
+def get_listings_path() -> Path:
+    """Get the path to the listing database."""
+    return get_config_dir() / 'listings.db'
+
+
+class ListingStore:
+    """SQLite store of folder listings, safe to use from several processes."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or get_listings_path())
+        self._ready = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(str(self.path), timeout=5, isolation_level=None)
+        try:
+            if not self._ready:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.executescript(_SCHEMA)
+                self._ready = True
+            yield db
+        finally:
+            db.close()
+
+    def put(self, folder_id: str, files: List[Dict[str, Any]]) -> None:
+        """Replace the stored listing of a folder."""
+        self.apply([(folder_id, files)])
+
+    def mark_stale(self, folder_id: str) -> None:
+        """Keep a folder's entries but have the next reader refresh them."""
+        self.apply([(folder_id, None)])
+
+    def apply(self, changes: List[Tuple[str, Optional[List[Dict[str, Any]]]]]) -> None:
+        """
+        Store several listings in one transaction.
+
+        Args:
+            changes: (folder ID, files) pairs in order; files of None marks
+                the folder stale instead
+        """
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            for folder_id, files in changes:
+                if files is None:
+                    db.execute("UPDATE listings SET updated = 0 WHERE folder_id = ?", (folder_id,))
+                    continue
+                db.execute("DELETE FROM entries WHERE folder_id = ?", (folder_id,))
+                db.executemany(
+                    "INSERT OR IGNORE INTO entries (folder_id, id, name, folder) VALUES (?, ?, ?, ?)",
+                    [
+                        (folder_id, file['id'], file['name'], file.get('mimeType') == FOLDER_MIME_TYPE)
+                        for file in files if 'id' in file and 'name' in file
+                    ]
+                )
+                db.execute(
+                    "INSERT OR REPLACE INTO listings (folder_id, updated, refreshing) VALUES (?, ?, 0)",
+                    (folder_id, time.time())
+                )
+            db.execute('COMMIT')
+
+    def age(self, folder_id: str) -> Optional[float]:
+        """Seconds since a folder was listed, or None if it never was."""
+        with self._connect() as db:
+            row = db.execute("SELECT updated FROM listings WHERE folder_id = ?", (folder_id,)).fetchone()
+        return time.time() - row[0] if row else None
+
+    def claim_refresh(self, folder_id: str, interval: float) -> bool:
+        """
+        Record that a refresh of a folder is starting.
+
+        Returns:
+            False if another refresh started less than ``interval`` seconds ago
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute("SELECT refreshing FROM listings WHERE folder_id = ?", (folder_id,)).fetchone()
+            if row and now - row[0] < interval:
+                db.execute('ROLLBACK')
+                return False
+            if row:
+                db.execute("UPDATE listings SET refreshing = ? WHERE folder_id = ?", (now, folder_id))
+            else:
+                db.execute(
+                    "INSERT INTO listings (folder_id, updated, refreshing) VALUES (?, 0, ?)",
+                    (folder_id, now)
+                )
+            db.execute('COMMIT')
+        return True
+
+    def children(self, folder_id: str, prefix: str = '') -> List[Tuple[str, str, bool]]:
+        """
+        Get stored entries of a folder whose names start with ``prefix``.
+
+        Returns:
+            (id, name, is_folder) tuples sorted by name
+        """
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, name, folder FROM entries WHERE folder_id = ? AND substr(name, 1, ?) = ? ORDER BY name",
+                (folder_id, len(prefix), prefix)
+            ).fetchall()
+        return [(row[0], row[1], bool(row[2])) for row in rows]
+
+    def child(self, folder_id: str, name: str) -> Optional[Tuple[str, bool]]:
+        """Get the (id, is_folder) of a stored entry by exact name."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id, folder FROM entries WHERE folder_id = ? AND name = ? LIMIT 1",
+                (folder_id, name)
+            ).fetchone()
+        return (row[0], bool(row[1])) if row else None
+
+    def parent(self, folder_id: str) -> Optional[str]:
+        """Get the folder a stored entry was listed in."""
+        with self._connect() as db:
+            row = db.execute("SELECT folder_id FROM entries WHERE id = ? LIMIT 1", (folder_id,)).fetchone()
+        return row[0] if row else None
+
+
+class ListingWriter:
+    """Writes listings to a ListingStore on a background thread, in batches."""
+
+    # Changes written per transaction at most
+    BATCH = 200
+
+    def __init__(self, store: ListingStore):
+        self.store = store
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def put(self, folder_id: str, files: List[Dict[str, Any]]) -> None:
+        """Queue a folder listing to be stored."""
+        self._submit(folder_id, list(files))
+
+    def mark_stale(self, folder_id: str) -> None:
+        """Queue marking a folder's stored listing stale."""
+        self._submit(folder_id, None)
+
+    def _submit(self, folder_id: str, files: Optional[List[Dict[str, Any]]]) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='gdup-listings', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+        self._queue.put((folder_id, files))
+
+    def _run(self) -> None:
+        while True:
+            changes = [self._queue.get()]
+            while len(changes) < self.BATCH:
+                try:
+                    changes.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.store.apply(changes)
+            except (sqlite3.Error, OSError):
+                pass  # Completion data only; never fail a command over it
+            finally:
+                for _ in changes:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """
+        Wait for queued writes to be stored.
+
+        Returns:
+            False if some were still queued after ``timeout`` seconds
+        """
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+
+_store: Optional[ListingStore] = None
+_writer: Optional[ListingWriter] = None
+
+
+def get_store() -> Optional[ListingStore]:
+    """Get the process-wide listing store, or None when disabled."""
+    global _store
+    if _store is None and get_setting('listings_cache', True):
+        _store = ListingStore()
+    return _store
+
+
+def get_writer() -> Optional[ListingWriter]:
+    """Get the process-wide background writer of the listing store, or None when disabled."""
+    global _writer
+    store = get_store()
+    if _writer is None and store is not None:
+        _writer = ListingWriter(store)
+    return _writer
@@ -0,0 +1,95 @@
+"""Manifests and result logs for bulk transfers.
+
+A manifest lists the items of a batch, one per line. Lines are either
+plain values (a local path for uploads, a Drive file ID for downloads)
+or NDJSON objects with extra fields:
+
+    reports/q1.csv
+    {"path": "reports/q2.csv", "parent": "1AbC..."}
+
+    1XyZ...
+    {"id": "1XyZ...", "dest": "out/renamed.csv"}
+
+The result log is NDJSON with one line per finished item. Items logged
+as successful are skipped when the same log is used again, so a
+partially failed batch can be re-run cheaply.
+"""
+
+import json
+import sys
+import threading
+from typing import Any, Dict, Iterator, Optional, Set
+
+
+def read_manifest(path: str, field: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read manifest items.
+
+    Args:
+        path: Manifest file, or '-' for stdin
+        field: Key that plain lines are stored under ('path' or 'id')
+
+    Yields:
+        One dict per non-empty, non-comment line
+    """
+    handle = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        for number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                try:
+                    item = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{number}: invalid JSON: {e}")
+                if field not in item:
+                    raise ValueError(f"{path}:{number}: missing \"{field}\"")
+                yield item
+            else:
+                yield {field: line}
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+class ResultLog:
+    """Thread-safe NDJSON log of per-item results."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+        self._handle = open(path, 'a', encoding='utf-8') if path else None
+
+    def completed(self, key: str) -> Set[str]:
+        """
+        Get the values of ``key`` for items that already succeeded.
+
+        Returns:
+            Set of keys (empty when no log is used)
+        """
+        done = set()
+        if not self.path:
+            return done
+        with open(self.path, 'r', encoding='utf-8') as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get('status') == 'ok' and key in entry:
+                    done.add(entry[key])
+        return done
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        """Append one result (flushed immediately)."""
+        if self._handle is None:
+            return
+        with self._lock:
+            self._handle.write(json.dumps(entry) + '\n')
+            self._handle.flush()
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
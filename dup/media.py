@@ -0,0 +1,309 @@
+"""Upload sources and streaming checksums for uploads and downloads.
+
+Uploads read the file ahead of the network: while one block is sent, a
+reader thread reads the next blocks into a bounded queue
+(ReadAheadStream), so disk reads, which are slow on network filesystems
+and cold caches, overlap with sending instead of alternating with it. At
+most GDUP_UPLOAD_BUFFERS blocks of GDUP_UPLOAD_BUFFER_SIZE bytes are held
+per upload.
+
+Drive reports an ``md5Checksum`` for every binary file. The helpers here
+compute the MD5 of a transfer from the same buffers that are sent or
+written, so verifying a transfer does not read the file a second time.
+Only bytes that an earlier process already transferred (a resumed upload
+session or a partial download) are read back from disk once.
+
+Settings (environment variables):
+    GDUP_VERIFY              Verify every upload and download against md5Checksum
+    GDUP_UPLOAD_BUFFERS      Blocks read ahead per upload (default: 2, 0 disables)
+    GDUP_UPLOAD_BUFFER_SIZE  Bytes per read-ahead block (default: 8 MB)
+"""
+
+import hashlib
+import os
+import queue
+import threading
+from typing import BinaryIO, Optional
+from googleapiclient.http import MediaFileUpload
+from .config import get_setting
+
+BLOCK_SIZE = 1024 * 1024
+
+DEFAULT_UPLOAD_BUFFERS = 2
+DEFAULT_UPLOAD_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+class IntegrityError(Exception):
+    """A transferred file does not match the checksum reported by Drive."""
+
+    def __init__(self, name: str, expected: str, actual: str):
+        super().__init__(f"Checksum mismatch for {name}: Drive has {expected}, local copy is {actual}")
+        self.expected = expected
+        self.actual = actual
+
+
+def get_verify() -> bool:
+    """Check whether transfers are verified by default."""
+    return get_setting('verify', False)
+
+
+class _HashingStream:
+    """
+    Seekable file wrapper that hashes the bytes read from it.
+
+    Each byte is hashed once, in order. Reads that go back over hashed
+    bytes (retried chunks) are not hashed again, and reads that skip ahead
+    (a resumed session) hash the skipped range from the file first.
+    """
+
+    def __init__(self, fd: BinaryIO):
+        self._fd = fd
+        self._md5 = hashlib.md5()
+        self._hashed = 0
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._fd.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._fd.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        start = self._fd.tell()
+        if start > self._hashed:
+            self._catch_up(start)
+        data = self._fd.read(size)
+        end = start + len(data)
+        if end > self._hashed:
+            self._md5.update(data[self._hashed - start:])
+            self._hashed = end
+        return data
+
+    def _catch_up(self, offset: int) -> None:
+        position = self._fd.tell()
+        self._fd.seek(self._hashed)
+        while self._hashed < offset:
+            block = self._fd.read(min(BLOCK_SIZE, offset - self._hashed))
+            if not block:
+                break
+            self._md5.update(block)
+            self._hashed += len(block)
+        self._fd.seek(position)
+
+    def hexdigest(self, size: int) -> str:
+        """MD5 of the first ``size`` bytes (reads any part not sent yet)."""
+        if self._hashed < size:
+            self._catch_up(size)
+        return self._md5.hexdigest()
+
+
+def _put(blocks: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put an item on the queue, giving up once ``stop`` is set."""
+    while not stop.is_set():
+        try:
+            blocks.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _read_blocks(source, offset: int, block_size: int, blocks: queue.Queue,
+                 stop: threading.Event) -> None:
+    """Read ``source`` from ``offset`` into ``blocks`` until EOF or ``stop``."""
+    try:
+        source.seek(offset)
+        while not stop.is_set():
+            block = source.read(block_size)
+            if not _put(blocks, (offset, block), stop) or not block:
+                return
+            offset += len(block)
+    except Exception as e:
+        _put(blocks, (offset, e), stop)
+
+
+class ReadAheadStream:
+    """
+    Seekable read-only stream whose next blocks are read on a thread.
+
+    Reads are served from the block at the current position, as memoryview
+    slices without copying. Sequential reads continue from the queue the
+    reader thread fills; a seek anywhere else (a retried chunk, a resumed
+    session) restarts the reader at the new position. Reads may return
+    fewer bytes than asked for, as raw streams do.
+    """
+
+    def __init__(self, source, buffers: int = DEFAULT_UPLOAD_BUFFERS,
+                 buffer_size: int = DEFAULT_UPLOAD_BUFFER_SIZE):
+        """
+        Args:
+            source: Seekable file object, only read by the reader thread
+            buffers: Blocks read ahead of the current one
+            buffer_size: Bytes per block
+        """
+        self._source = source
+        self.buffers = max(1, buffers)
+        self.buffer_size = buffer_size
+        self._position = 0
+        self._block = memoryview(b'')
+        self._block_offset = 0
+        self._next = None
+        self._eof = None
+        self._blocks = None
+        self._stop = None
+        self._thread = None
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 1:
+            offset += self._position
+        elif whence != 0:
+            raise ValueError("ReadAheadStream only seeks from the start or the current position")
+        self._position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._position
+
+    def read(self, size: int = -1) -> memoryview:
+        start = self._position - self._block_offset
+        if not 0 <= start < len(self._block):
+            if self._eof is not None and self._position >= self._eof:
+                return memoryview(b'')
+            self._fetch()
+            start = self._position - self._block_offset
+        end = len(self._block) if size is None or size < 0 else min(start + size, len(self._block))
+        data = self._block[start:end]
+        self._position += len(data)
+        return data
+
+    def _fetch(self) -> None:
+        """Make the block at the current position the current block."""
+        if self._thread is None or self._next != self._position:
+            self.stop()
+            self._blocks = queue.Queue(self.buffers)
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=_read_blocks,
+                args=(self._source, self._position, self.buffer_size, self._blocks, self._stop),
+                name='gdup-read-ahead', daemon=True
+            )
+            self._thread.start()
+
+        offset, block = self._blocks.get()
+        if isinstance(block, Exception):
+            self._thread = None
+            raise block
+        self._block = memoryview(block)
+        self._block_offset = offset
+        self._next = offset + len(block)
+        if not block:
+            self._eof = offset
+            self._thread = None
+
+    def stop(self) -> None:
+        """Stop reading ahead and drop the blocks read so far."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self._blocks = None
+        self._block = memoryview(b'')
+
+    def __del__(self):
+        if self._stop is not None:
+            self._stop.set()
+
+
+def get_upload_buffers() -> int:
+    """Number of blocks uploads read ahead (0 disables reading ahead)."""
+    return get_setting('upload_buffers', DEFAULT_UPLOAD_BUFFERS)
+
+
+def _advise_sequential(fd: BinaryIO) -> None:
+    """Tell the kernel a file is read sequentially, so it reads ahead further."""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        os.posix_fadvise(fd.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    except (OSError, ValueError):
+        pass
+
+
+class ReadAheadUpload(MediaFileUpload):
+    """MediaFileUpload that reads the next blocks of the file while a chunk is sent."""
+
+    def __init__(self, filename: str, buffers: Optional[int] = None, **kwargs):
+        """
+        Args:
+            filename: File to upload
+            buffers: Blocks read ahead (default: GDUP_UPLOAD_BUFFERS, 0 disables)
+            **kwargs: MediaFileUpload arguments (chunksize, resumable, ...)
+        """
+        super().__init__(filename, **kwargs)
+        _advise_sequential(self._fd)
+        self._source = self._fd
+        self._buffers = get_upload_buffers() if buffers is None else buffers
+        self._reader = None
+
+    def stream(self):
+        if self._buffers <= 0:
+            return self._source
+        if self._reader is None:
+            self._reader = ReadAheadStream(
+                self._source, self._buffers,
+                get_setting('upload_buffer_size', DEFAULT_UPLOAD_BUFFER_SIZE)
+            )
+        return self._reader
+
+    def stop_reading(self) -> None:
+        """Stop the reader thread and free its buffers (call once the upload ends)."""
+        if self._reader is not None:
+            self._reader.stop()
+
+
+class HashingFileUpload(ReadAheadUpload):
+    """ReadAheadUpload that computes the MD5 of the bytes it sends."""
+
+    def __init__(self, filename: str, **kwargs):
+        super().__init__(filename, **kwargs)
+        self._hashing = _HashingStream(self._fd)
+        self._source = self._hashing
+
+    def md5(self) -> str:
+        """MD5 of the whole file."""
+        self.stop_reading()
+        return self._hashing.hexdigest(self.size())
+
+
+class HashingWriter:
+    """Write-only file wrapper that computes the MD5 of everything written."""
+
+    def __init__(self, fh: BinaryIO):
+        self._fh = fh
+        self._md5 = hashlib.md5()
+
+    def update_from(self, path: str, length: int) -> None:
+        """Hash the first ``length`` bytes of an existing file (a partial download)."""
+        with open(path, 'rb') as fh:
+            remaining = length
+            while remaining > 0:
+                block = fh.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                self._md5.update(block)
+                remaining -= len(block)
+
+    def write(self, data: bytes) -> int:
+        self._md5.update(data)
+        return self._fh.write(data)
+
+    def hexdigest(self) -> str:
+        return self._md5.hexdigest()
+
+
+def file_md5(path: str) -> str:
+    """MD5 of a local file."""
+    md5 = hashlib.md5()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(BLOCK_SIZE), b''):
+            md5.update(block)
+    return md5.hexdigest()
@@ -0,0 +1,364 @@
+"""Throughput metrics for long-running gdup processes.
+
+When enabled, gdup counts Drive API calls (by method and outcome), their
+latency, retries, rate-limit responses and time spent sleeping on the
+client-side rate limiter or before retries, the limiter's own per-bucket
+wait counts and times, HTTP requests and bytes sent and received, and
+cache hits and misses. They can be exported as:
+
+- an OpenMetrics text file, rewritten atomically every
+  GDUP_METRICS_INTERVAL seconds and when the command finishes (e.g. for
+  node_exporter's textfile collector)
+- a local HTTP endpoint serving the same text on /metrics
+- a JSON summary of the whole run, written when the command finishes
+
+Like tracing, metrics are off by default; the instrumented code only
+checks whether ``registry`` is None.
+
+Settings (environment variables):
+    GDUP_METRICS           OpenMetrics file (same as --metrics)
+    GDUP_METRICS_PORT      Serve /metrics on this local port (same as --metrics-port)
+    GDUP_METRICS_SUMMARY   JSON summary file (same as --metrics-summary)
+    GDUP_METRICS_INTERVAL  Seconds between rewrites of the metrics file (default: 15)
+"""
+
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from .config import get_setting
+from . import ratelimit
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# Upper bounds (seconds) of the API latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+DEFAULT_INTERVAL = 15.0
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a sum and a count."""
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count) pairs, ending with +Inf."""
+        pairs = []
+        total = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            pairs.append(('+Inf' if bound == float('inf') else repr(bound), total))
+        return pairs
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (the largest bound if beyond)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return self.bounds[-1]
+
+
+def _number(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        for _, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+class Metrics:
+    """Thread-safe counters and histograms of one gdup process."""
+
+    # name -> (type, help)
+    FAMILIES = {
+        'gdup_api_calls': ('counter', "Drive API calls by method and outcome"),
+        'gdup_api_latency_seconds': ('histogram', "Drive API call latency, including retries"),
+        'gdup_api_retries': ('counter', "Drive API attempts repeated after an error"),
+        'gdup_api_throttled': ('counter', "Rate-limit responses (429, 403 rateLimitExceeded) from Drive"),
+        'gdup_api_sleep_seconds': ('counter', "Seconds spent waiting on the rate limiter or before retries"),
+        'gdup_ratelimit_calls': ('counter', "Tokens taken from a client-side rate limiter bucket"),
+        'gdup_ratelimit_waits': ('counter', "Rate limiter calls that had to wait for a token"),
+        'gdup_ratelimit_wait_seconds': ('counter', "Seconds callers waited on a rate limiter bucket"),
+        'gdup_http_requests': ('counter', "HTTP requests by status code"),
+        'gdup_http_sent_bytes': ('counter', "Bytes sent in HTTP request bodies"),
+        'gdup_http_received_bytes': ('counter', "Bytes received in HTTP response bodies"),
+        'gdup_cache_hits': ('counter', "Lookups answered from a cache"),
+        'gdup_cache_misses': ('counter', "Lookups a cache could not answer"),
+        'gdup_start_time_seconds': ('gauge', "Unix time the process started collecting metrics"),
+    }
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[Labels, Histogram] = {}
+
+    def _add(self, name: str, labels: Labels, value: float) -> None:
+        # Caller holds the lock
+        family = self._counters.setdefault(name, {})
+        family[labels] = family.get(labels, 0) + value
+
+    def call(self, method: str, bucket: str, latency: float, retries: int, sleep: float,
+             throttled: int, error: Optional[str] = None) -> None:
+        """Record a Drive API call made through the rate limiter."""
+        labels = (('method', method),)
+        with self._lock:
+            self._add('gdup_api_calls', labels + (('outcome', 'error' if error else 'ok'),), 1)
+            self._add('gdup_api_retries', labels, retries)
+            self._add('gdup_api_throttled', (('bucket', bucket),), throttled)
+            self._add('gdup_api_sleep_seconds', (('bucket', bucket),), sleep)
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                histogram = self._histograms[labels] = Histogram()
+            histogram.observe(latency)
+
+    def http(self, status: Optional[int], sent: int, received: int) -> None:
+        """Record an HTTP exchange made by the transport."""
+        with self._lock:
+            self._add('gdup_http_requests', (('status', str(status) if status else 'error'),), 1)
+            self._add('gdup_http_sent_bytes', (), sent)
+            self._add('gdup_http_received_bytes', (), received)
+
+    def _cache_counters(self) -> Dict[str, Tuple[int, int]]:
+        """Hits and misses of the caches this process uses."""
+        # Imported here: the cache modules import the instrumented drive code
+        from .cache import metadata_cache
+        from .drive import get_open_file_caches
+
+        caches = {'metadata': (metadata_cache.hits, metadata_cache.misses)}
+        for name, cache in get_open_file_caches().items():
+            caches[name] = (cache.hits, cache.misses)
+        return caches
+
+    def _snapshot(self) -> Tuple[Dict[str, Dict[Labels, float]], Dict[Labels, Histogram]]:
+        counters = {}
+        for name, stats in ratelimit.get_stats().items():
+            labels = (('bucket', name),)
+            counters.setdefault('gdup_ratelimit_calls', {})[labels] = stats['calls']
+            counters.setdefault('gdup_ratelimit_waits', {})[labels] = stats['waited_calls']
+            counters.setdefault('gdup_ratelimit_wait_seconds', {})[labels] = stats['total_wait']
+        for name, (hits, misses) in self._cache_counters().items():
+            counters.setdefault('gdup_cache_hits', {})[(('cache', name),)] = hits
+            counters.setdefault('gdup_cache_misses', {})[(('cache', name),)] = misses
+        with self._lock:
+            for name, family in self._counters.items():
+                counters[name] = dict(family)
+            histograms = {}
+            for labels, histogram in self._histograms.items():
+                copy = Histogram(histogram.bounds)
+                copy.counts = list(histogram.counts)
+                copy.sum, copy.count = histogram.sum, histogram.count
+                histograms[labels] = copy
+        return counters, histograms
+
+    def render(self) -> str:
+        """Render every metric in the OpenMetrics text format."""
+        counters, histograms = self._snapshot()
+        lines = []
+        for name, (kind, help_text) in self.FAMILIES.items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"# HELP {name} {help_text}.")
+            if kind == 'counter':
+                for labels, value in sorted(counters.get(name, {}).items()):
+                    lines.append(f"{name}_total{_labels(labels)} {_number(value)}")
+            elif kind == 'histogram':
+                for labels, histogram in sorted(histograms.items()):
+                    for le, count in histogram.cumulative():
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {count}")
+                    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+            elif name == 'gdup_start_time_seconds':
+                lines.append(f"{name} {self.started:.3f}")
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals, rates and per-method figures of the run, for the JSON summary."""
+        counters, histograms = self._snapshot()
+        duration = time.time() - self.started
+
+        def total(name: str) -> float:
+            return sum(counters.get(name, {}).values())
+
+        methods = {}
+        for labels, histogram in histograms.items():
+            method = dict(labels)['method']
+            methods[method] = {
+                'calls': histogram.count,
+                'errors': int(counters.get('gdup_api_calls', {}).get(
+                    (('method', method), ('outcome', 'error')), 0)),
+                'retries': int(counters.get('gdup_api_retries', {}).get((('method', method),), 0)),
+                'latency_mean': round(histogram.sum / histogram.count, 6) if histogram.count else 0.0,
+                'latency_p50_le': histogram.quantile(0.5),
+                'latency_p95_le': histogram.quantile(0.95),
+            }
+
+        caches = {}
+        for labels, hits in counters.get('gdup_cache_hits', {}).items():
+            misses = counters.get('gdup_cache_misses', {}).get(labels, 0)
+            caches[dict(labels)['cache']] = {
+                'hits': int(hits),
+                'misses': int(misses),
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            }
+
+        sent = total('gdup_http_sent_bytes')
+        received = total('gdup_http_received_bytes')
+        return {
+            'started': round(self.started, 3),
+            'duration': round(duration, 3),
+            'api': {
+                'calls': int(total('gdup_api_calls')),
+                'errors': int(sum(value for labels, value in counters.get('gdup_api_calls', {}).items()
+                                  if ('outcome', 'error') in labels)),
+                'retries': int(total('gdup_api_retries')),
+                'throttled': int(total('gdup_api_throttled')),
+                'sleep_seconds': round(total('gdup_api_sleep_seconds'), 3),
+                'methods': dict(sorted(methods.items())),
+            },
+            'http': {
+                'requests': int(total('gdup_http_requests')),
+                'sent_bytes': int(sent),
+                'received_bytes': int(received),
+                'sent_bytes_per_second': round(sent / duration, 1) if duration else 0.0,
+                'received_bytes_per_second': round(received / duration, 1) if duration else 0.0,
+            },
+            'ratelimit': ratelimit.get_stats(),
+            'caches': caches,
+        }
+
+
+def _write_atomic(path: str, text: str) -> None:
+    """Replace a file's content so readers never see a partial file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.gdup-metrics-', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            fh.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Exporter:
+    """Writes the metrics file periodically and serves the HTTP endpoint."""
+
+    def __init__(self, metrics: Metrics, path: Optional[str] = None, port: int = 0,
+                 summary_path: Optional[str] = None, interval: Optional[float] = None):
+        """
+        Args:
+            metrics: Metrics to export
+            path: OpenMetrics file to rewrite periodically
+            port: Local port to serve /metrics on (0 for none)
+            summary_path: JSON summary file written by close()
+            interval: Seconds between rewrites (default: GDUP_METRICS_INTERVAL)
+        """
+        self.metrics = metrics
+        self.path = path
+        self.summary_path = summary_path
+        self.interval = interval if interval is not None else get_setting('metrics_interval', DEFAULT_INTERVAL)
+        self._stop = threading.Event()
+        self._writer = None
+        self._server = None
+
+        if port:
+            self._server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+            self._server.daemon_threads = True
+            self._server.metrics = metrics
+            threading.Thread(target=self._server.serve_forever, name='gdup-metrics-http',
+                             daemon=True).start()
+
+        if path:
+            self._writer = threading.Thread(target=self._run, name='gdup-metrics-file', daemon=True)
+            self._writer.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(max(self.interval, 1.0)):
+            try:
+                _write_atomic(self.path, self.metrics.render())
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        """Write the final metrics file and summary, and stop serving."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self.path:
+            _write_atomic(self.path, self.metrics.render())
+        if self.summary_path:
+            _write_atomic(self.summary_path, json.dumps(self.metrics.summary(), indent=2) + '\n')
+
+
+# Active metrics, or None when metrics are disabled
+registry: Optional[Metrics] = None
+_exporter: Optional[Exporter] = None
+
+
+def start(path: Optional[str] = None, port: int = 0, summary_path: Optional[str] = None) -> Metrics:
+    """Enable metrics, exporting them to a file, a local port and/or a JSON summary."""
+    global registry, _exporter
+    if registry is None:
+        registry = Metrics()
+        _exporter = Exporter(registry, path, port, summary_path)
+    return registry
+
+
+def finish() -> None:
+    """Write the final exports and stop collecting metrics."""
+    global registry, _exporter
+    if registry is None:
+        return
+
+    exporter, registry, _exporter = _exporter, None, None
+    exporter.close()
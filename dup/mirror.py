@@ -0,0 +1,166 @@
+"""Persisted maps between local directories and Drive folders.
+
+A mirror pairs a local directory with a Drive folder. For every path below
+the directory that has been synced, the map records the Drive ID of the
+file or folder, the size and modification time the local copy had at
+that moment, and the Drive revision (md5Checksum, or modifiedTime for
+Google Workspace files) it was synced with. Comparing a path with its
+entry tells whether it changed, and the entry says which Drive file to
+update, move or trash, so no folder has to be listed again. Pulled
+mirrors also keep the changes-feed page token to continue from.
+
+Paths are relative to the mirrored directory and use '/' as separator.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+from .config import get_config_dir
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mirrors (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    local_root TEXT NOT NULL,
+    folder_id TEXT NOT NULL,
+    page_token TEXT,
+    UNIQUE (local_root, folder_id)
+);
+CREATE TABLE IF NOT EXISTS entries (
+    mirror_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    folder INTEGER NOT NULL,
+    size INTEGER,
+    mtime INTEGER,
+    revision TEXT,
+    PRIMARY KEY (mirror_id, path)
+);
+CREATE INDEX IF NOT EXISTS entries_file_id ON entries (mirror_id, file_id);
+"""
+
+# Columns that databases created by earlier versions lack
+_ADDED_COLUMNS = {
+    'mirrors': ['page_token TEXT'],
+    'entries': ['revision TEXT'],
+}
+
+_ENTRY_COLUMNS = "path, file_id, folder, size, mtime, revision"
+
+
+def get_mirrors_path() -> Path:
+    """Get the path to the mirror database."""
+    return get_config_dir() / 'mirrors.db'
+
+
+def _under(path: str) -> str:
+    """GLOB pattern matching every path below ``path``."""
+    escaped = ''.join(f'[{char}]' if char in '*?[' else char for char in path)
+    return escaped + '/*'
+
+
+class MirrorState:
+    """Local path -> Drive ID map of one mirror, safe to use from several threads."""
+
+    def __init__(self, local_root: str, folder_id: str, path: Optional[Path] = None):
+        self.path = Path(path or get_mirrors_path())
+        with self._connect() as db:
+            for table, columns in _ADDED_COLUMNS.items():
+                existing = {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+                for column in columns:
+                    if existing and column.split()[0] not in existing:
+                        db.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+            db.executescript(_SCHEMA)
+            db.execute(
+                "INSERT OR IGNORE INTO mirrors (local_root, folder_id) VALUES (?, ?)",
+                (local_root, folder_id)
+            )
+            self.mirror_id = db.execute(
+                "SELECT id FROM mirrors WHERE local_root = ? AND folder_id = ?",
+                (local_root, folder_id)
+            ).fetchone()[0]
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute('PRAGMA journal_mode=WAL')
+            yield db
+        finally:
+            db.close()
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        """Get the entry of a path (file_id, folder, size, mtime, revision)."""
+        with self._connect() as db:
+            row = db.execute(
+                f"SELECT {_ENTRY_COLUMNS} FROM entries WHERE mirror_id = ? AND path = ?",
+                (self.mirror_id, path)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def find(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Get the entry of a Drive file or folder by its ID."""
+        with self._connect() as db:
+            row = db.execute(
+                f"SELECT {_ENTRY_COLUMNS} FROM entries WHERE mirror_id = ? AND file_id = ? LIMIT 1",
+                (self.mirror_id, file_id)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        """Get every entry, keyed by path."""
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT {_ENTRY_COLUMNS} FROM entries WHERE mirror_id = ?",
+                (self.mirror_id,)
+            ).fetchall()
+        return {row['path']: dict(row) for row in rows}
+
+    def put(self, path: str, file_id: str, folder: bool = False, size: Optional[int] = None,
+            mtime: Optional[int] = None, revision: Optional[str] = None) -> None:
+        """Record that a path is synced to a Drive file or folder."""
+        with self._connect() as db:
+            db.execute(
+                f"INSERT OR REPLACE INTO entries (mirror_id, {_ENTRY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.mirror_id, path, file_id, folder, size, mtime, revision)
+            )
+
+    def remove(self, path: str) -> int:
+        """
+        Forget a path and everything below it.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._connect() as db:
+            return db.execute(
+                "DELETE FROM entries WHERE mirror_id = ? AND (path = ? OR path GLOB ?)",
+                (self.mirror_id, path, _under(path))
+            ).rowcount
+
+    def move(self, old: str, new: str) -> None:
+        """Rename a path and everything below it."""
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            db.execute(
+                "DELETE FROM entries WHERE mirror_id = ? AND (path = ? OR path GLOB ?)",
+                (self.mirror_id, new, _under(new))
+            )
+            db.execute(
+                "UPDATE entries SET path = ? || substr(path, ?) "
+                "WHERE mirror_id = ? AND (path = ? OR path GLOB ?)",
+                (new, len(old) + 1, self.mirror_id, old, _under(old))
+            )
+            db.execute('COMMIT')
+
+    def get_token(self) -> Optional[str]:
+        """Get the changes-feed page token to continue from, if any."""
+        with self._connect() as db:
+            row = db.execute("SELECT page_token FROM mirrors WHERE id = ?", (self.mirror_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_token(self, page_token: str) -> None:
+        """Store the changes-feed page token for the next run."""
+        with self._connect() as db:
+            db.execute("UPDATE mirrors SET page_token = ? WHERE id = ?", (page_token, self.mirror_id))
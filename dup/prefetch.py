@@ -0,0 +1,120 @@
+"""Background prefetching of folder listings.
+
+After ``cd`` or ``ls`` the next command usually lists the same folder or
+one of its subfolders. When enabled, the prefetcher lists the folder and
+its immediate subfolders in the background and stores the listings in the
+metadata cache, so the follow-up command needs no request.
+
+Subfolders are listed SCAN_BATCH at a time with a single query, and every
+query takes a token from a separate 'prefetch' rate limit bucket on top of
+the shared metadata bucket, so prefetching never uses more than a small
+share of the API quota.
+
+Prefetching only pays off in long-lived processes (``gdup shell`` and the
+gdupd daemon), which call ``enable()``; one-shot commands exit before the
+cache could be used.
+
+Settings (environment variables):
+    GDUP_PREFETCH          Enable prefetching (default: off)
+    GDUP_PREFETCH_WORKERS  Folders prefetched at the same time
+    GDUP_PREFETCH_FOLDERS  Subfolders listed per prefetched folder
+    GDUP_RATE_PREFETCH     Prefetch requests per second
+    GDUP_BURST_PREFETCH    Prefetch request burst size
+"""
+
+import queue
+import threading
+from typing import Dict, Optional, Set
+from . import ratelimit
+from .cache import metadata_cache
+from .config import get_setting
+from .drive import list_files, list_folders, is_folder, SCAN_BATCH
+
+DEFAULT_WORKERS = 2
+DEFAULT_FOLDERS = 40
+
+
+class Prefetcher:
+    """Lists folders on daemon threads to warm the metadata cache."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_folders: int = DEFAULT_FOLDERS):
+        self.workers = max(1, workers)
+        self.max_folders = max_folders
+        self._queue: 'queue.Queue[str]' = queue.Queue()
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._threads = []
+
+        # Statistics
+        self.folders = 0
+        self.requests = 0
+        self.errors = 0
+
+    def schedule(self, folder_id: str) -> None:
+        """Prefetch a folder and its subfolders unless already queued."""
+        with self._lock:
+            if folder_id in self._pending:
+                return
+            self._pending.add(folder_id)
+            if not self._threads:
+                for number in range(self.workers):
+                    thread = threading.Thread(target=self._worker, name=f'gdup-prefetch-{number}', daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+        self._queue.put(folder_id)
+
+    def _worker(self) -> None:
+        while True:
+            folder_id = self._queue.get()
+            try:
+                self._warm(folder_id)
+            except Exception:
+                # Prefetching is best effort; the next command lists normally
+                self.errors += 1
+            finally:
+                with self._lock:
+                    self._pending.discard(folder_id)
+
+    def _warm(self, folder_id: str) -> None:
+        if not metadata_cache.has_listing(folder_id):
+            ratelimit.acquire('prefetch')
+            self.requests += 1
+            self.folders += 1
+        files = list_files(folder_id)
+
+        subfolders = [
+            file['id'] for file in files
+            if is_folder(file) and not metadata_cache.has_listing(file['id'])
+        ][:self.max_folders]
+
+        for start in range(0, len(subfolders), SCAN_BATCH):
+            ratelimit.acquire('prefetch')
+            self.requests += 1
+            self.folders += len(list_folders(subfolders[start:start + SCAN_BATCH]))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'folders': self.folders,
+            'requests': self.requests,
+            'errors': self.errors,
+            'pending': len(self._pending),
+        }
+
+
+prefetcher: Optional[Prefetcher] = None
+
+
+def enable() -> None:
+    """Turn on prefetching for this process if GDUP_PREFETCH is set."""
+    global prefetcher
+    if prefetcher is None and get_setting('prefetch', False):
+        prefetcher = Prefetcher(
+            get_setting('prefetch_workers', DEFAULT_WORKERS),
+            get_setting('prefetch_folders', DEFAULT_FOLDERS),
+        )
+
+
+def schedule(folder_id: str) -> None:
+    """Prefetch a folder in the background (no-op unless enabled)."""
+    if prefetcher is not None and metadata_cache.enabled:
+        prefetcher.schedule(folder_id)
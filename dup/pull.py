@@ -0,0 +1,319 @@
+"""Incremental download of a Drive folder into a local directory.
+
+The first pull downloads everything below the folder. Before the folder
+is scanned, a changes-feed page token is taken, so changes made while the
+download runs are not missed; it is stored with the mirror once every
+file arrived. Later pulls read only the changes made since that token
+(changes.list) and apply those under the folder: new and modified files
+are downloaded in parallel, renamed and moved entries are renamed
+locally, and trashed or deleted entries are removed. A pull therefore
+costs work in proportion to the changes, not to the size of the mirror.
+
+Local copies are recorded in a MirrorState (see mirror.py) with the Drive
+revision they were downloaded at, so a change that only renames or moves
+a file costs no download. Local edits inside a pulled directory are
+overwritten or removed when the Drive copy changes.
+
+Drive allows several entries with the same name in one folder. Only one
+of them gets the plain local name (on the first pull, the one with the
+smallest ID; later, the one that had it first); the others get their ID
+appended, e.g. ``report (1AbC...).pdf``.
+"""
+
+import os
+import shutil
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from rich.console import Console
+from .cache import metadata_cache
+from .drive import (
+    FOLDER_MIME_TYPE, CHANGE_FIELDS, download_file, get_export_format, get_start_page_token,
+    is_folder, list_changes, scan_tree,
+)
+from .mirror import MirrorState
+from .transfer import Transfer, run_transfers
+
+WORKSPACE_PREFIX = 'application/vnd.google-apps.'
+
+
+@dataclass
+class PullResult:
+    """What a pull did."""
+
+    changes: int = 0
+    downloaded: int = 0
+    moved: int = 0
+    removed: int = 0
+    failed: int = 0
+
+
+def revision(file: Dict[str, Any]) -> Optional[str]:
+    """Identify a file's content: md5Checksum, or modifiedTime for Workspace files."""
+    return file.get('md5Checksum') or file.get('modifiedTime')
+
+
+def local_name(file: Dict[str, Any]) -> Optional[str]:
+    """Local name of a Drive entry, or None for Workspace types that cannot be exported."""
+    name = file['name'].replace('/', '_')
+    if name in ('', '.', '..'):
+        name = '_'
+    mime_type = file.get('mimeType', '')
+    if mime_type == FOLDER_MIME_TYPE or not mime_type.startswith(WORKSPACE_PREFIX):
+        return name
+    export = get_export_format(mime_type)
+    if export is None:
+        return None
+    return name if name.endswith(export[1]) else name + export[1]
+
+
+def disambiguate(name: str, file_id: str) -> str:
+    """Local name of an entry whose name is taken by a sibling: the ID goes before the extension."""
+    stem, dot, extension = name.rpartition('.')
+    if not stem:
+        return f"{name} ({file_id})"
+    return f"{stem} ({file_id}){dot}{extension}"
+
+
+def _join(directory: str, name: str) -> str:
+    return f"{directory}/{name}" if directory else name
+
+
+class Puller:
+    """Keeps a local directory in step with a Drive folder."""
+
+    def __init__(self, root: str, folder_id: str, console: Console, parallel: Optional[int] = None,
+                 verify: Optional[bool] = None,
+                 report: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            root: Local directory to download into
+            folder_id: Drive folder to mirror
+            console: Console for the download progress display
+            parallel: Files downloaded at the same time (default: GDUP_PARALLEL)
+            verify: Verify downloads against md5Checksum (default: GDUP_VERIFY)
+            report: Called with (action, path) for every move and removal
+        """
+        self.root = Path(root).resolve()
+        self.folder_id = folder_id
+        self.state = MirrorState(str(self.root), folder_id)
+        self.console = console
+        self.parallel = parallel
+        self.verify = verify
+        self.report = report or (lambda action, path: None)
+        # Local path -> Drive ID of entries placed by the current pull
+        self._claims: Dict[str, str] = {}
+
+    def _local(self, path: str) -> Path:
+        return self.root / path if path else self.root
+
+    def pull(self) -> PullResult:
+        """Download everything on the first run, only the changes afterwards."""
+        token = self.state.get_token()
+        self._claims = {}
+        if token is None:
+            return self.initial()
+        return self.incremental(token)
+
+    def initial(self) -> PullResult:
+        """Download the whole folder and store the token to continue from."""
+        token = get_start_page_token()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        result = PullResult()
+        downloads = self._scan([(self.folder_id, '')])
+        self._download(downloads, result)
+        if not result.failed:
+            self.state.set_token(token)
+        return result
+
+    def incremental(self, token: str) -> PullResult:
+        """Apply the changes made since ``token``."""
+        changes, new_token = list_changes(token)
+        result = PullResult(changes=len(changes))
+
+        live: Dict[str, Dict[str, Any]] = {}
+        for change in changes:
+            file = change.get('file')
+            if change.get('removed') or not file or file.get('trashed'):
+                self._remove(change['fileId'], result)
+            elif file['id'] != self.folder_id:
+                live[file['id']] = file
+
+        # Folders first, each after its parent, so files land in place
+        pending = {file_id: file for file_id, file in live.items() if is_folder(file)}
+        new_folders: List[Tuple[str, str]] = []
+        new_ids = set()
+        while pending:
+            ready = [folder for folder in pending.values()
+                     if (folder.get('parents') or [None])[0] not in pending]
+            if not ready:
+                break
+            for folder in ready:
+                del pending[folder['id']]
+                known = self.state.find(folder['id']) is not None
+                path = self._place(folder, result)
+                if path is None or known:
+                    continue
+                # A folder new to the mirror may hold files that did not change
+                # themselves (e.g. it was moved in); scanning it covers its subfolders
+                new_ids.add(folder['id'])
+                if folder['parents'][0] not in new_ids:
+                    new_folders.append((folder['id'], path))
+
+        downloads: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        for file in live.values():
+            if is_folder(file):
+                continue
+            path = self._place(file, result)
+            if path is not None and self._changed(file, path):
+                downloads[file['id']] = (path, file)
+
+        for file_id, (path, file) in self._scan(new_folders).items():
+            downloads.setdefault(file_id, (path, file))
+
+        self._download(downloads, result)
+        if not result.failed:
+            self.state.set_token(new_token)
+        return result
+
+    def _parent_path(self, file: Dict[str, Any]) -> Optional[str]:
+        """Local path of a Drive entry's folder, or None if it is outside the mirror."""
+        parents = file.get('parents') or []
+        if not parents:
+            return None
+        if parents[0] == self.folder_id:
+            return ''
+        entry = self.state.find(parents[0])
+        return entry['path'] if entry and entry['folder'] else None
+
+    def _place(self, file: Dict[str, Any], result: PullResult) -> Optional[str]:
+        """
+        Move a changed entry to its current path, creating folders.
+
+        Returns:
+            Its local path, or None if it is not (or no longer) in the mirror
+        """
+        parent_path = self._parent_path(file)
+        name = local_name(file)
+        if parent_path is None or name is None:
+            self._remove(file['id'], result)
+            return None
+
+        path = self._claim(parent_path, name, file['id'])
+        entry = self.state.find(file['id'])
+        if entry and entry['path'] != path:
+            old = self._local(entry['path'])
+            target = self._local(path)
+            if os.path.lexists(old):
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(old, target)
+            self.state.move(entry['path'], path)
+            result.moved += 1
+            self.report('move', f"{entry['path']} -> {path}")
+
+        if is_folder(file):
+            self._local(path).mkdir(parents=True, exist_ok=True)
+            if entry is None:
+                self.state.put(path, file['id'], folder=True)
+        return path
+
+    def _claim(self, parent_path: str, name: str, file_id: str) -> str:
+        """
+        Pick the local path of an entry, keeping same-name siblings apart.
+
+        Returns:
+            The plain path, unless another entry of the mirror already has
+            it; then the path with the entry's ID added to its name
+        """
+        path = _join(parent_path, name)
+        owner = self._claims.get(path)
+        if owner is None:
+            entry = self.state.get(path)
+            owner = entry['file_id'] if entry else file_id
+        if owner != file_id:
+            path = _join(parent_path, disambiguate(name, file_id))
+        self._claims[path] = file_id
+        return path
+
+    def _changed(self, file: Dict[str, Any], path: str) -> bool:
+        """Check whether a file needs downloading."""
+        entry = self.state.find(file['id'])
+        return not (entry and entry['revision'] == revision(file) and self._local(path).is_file())
+
+    def _remove(self, file_id: str, result: PullResult) -> None:
+        """Delete the local copy of a Drive entry that was trashed, deleted or moved away."""
+        entry = self.state.find(file_id)
+        if entry is None:
+            return
+        local = self._local(entry['path'])
+        if local.is_dir() and not local.is_symlink():
+            shutil.rmtree(local)
+        elif os.path.lexists(local):
+            local.unlink()
+        self.state.remove(entry['path'])
+        result.removed += 1
+        self.report('remove', entry['path'])
+
+    def _scan(self, roots: List[Tuple[str, str]]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """
+        List everything below some mirrored folders, creating local folders.
+
+        Args:
+            roots: (folder ID, local path) pairs
+
+        Returns:
+            Files that need downloading: file ID -> (path, metadata)
+        """
+        if not roots:
+            return {}
+        children = defaultdict(list)
+        for file in scan_tree([folder_id for folder_id, _ in roots], fields=CHANGE_FIELDS):
+            parents = file.get('parents') or []
+            if parents:
+                children[parents[0]].append(file)
+
+        # Folder by folder, siblings in ID order, so same-name siblings get
+        # the same local names on every pull
+        downloads = {}
+        pending = list(roots)
+        while pending:
+            folder_id, folder_path = pending.pop()
+            for file in sorted(children.pop(folder_id, []), key=lambda file: file['id']):
+                name = local_name(file)
+                if name is None:
+                    continue
+                path = self._claim(folder_path, name, file['id'])
+                if is_folder(file):
+                    pending.append((file['id'], path))
+                    self._local(path).mkdir(parents=True, exist_ok=True)
+                    if self.state.get(path) is None:
+                        self.state.put(path, file['id'], folder=True)
+                elif self._changed(file, path):
+                    downloads[file['id']] = (path, file)
+        return downloads
+
+    def _download(self, downloads: Dict[str, Tuple[str, Dict[str, Any]]], result: PullResult) -> None:
+        """Download files on the thread pool and record them."""
+        if not downloads:
+            return
+
+        def fetch(callback, path: str, file: Dict[str, Any]) -> None:
+            target = self._local(path)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # The change already carries the metadata download_file needs
+            metadata_cache.put_file(file)
+            produced = download_file(file['id'], str(target) + '.part', callback, verify=self.verify)
+            os.replace(produced, target)
+            stat = target.stat()
+            self.state.put(path, file['id'], False, stat.st_size, stat.st_mtime_ns, revision(file))
+
+        transfers = run_transfers(
+            (Transfer(path, int(file.get('size') or 0),
+                      lambda callback, path=path, file=file: fetch(callback, path, file))
+             for path, file in downloads.values()),
+            self.console, "Downloading", self.parallel
+        )
+        result.failed += sum(1 for transfer in transfers if transfer.error)
+        result.downloaded += sum(1 for transfer in transfers if not transfer.error)
@@ -0,0 +1,164 @@
+"""Client-side rate limiting for Google Drive API calls.
+
+Drive enforces a per-user query quota. Every request made by DUP takes a
+token from a shared bucket first, so parallel uploads, listings and tree
+walks stay under the quota instead of being throttled with 429 errors.
+
+Metadata calls (list, get, create, permissions) and media requests
+(upload and download chunks) use separate buckets. Background prefetch
+requests additionally take a token from a small 'prefetch' bucket.
+
+Settings (environment variables):
+    GDUP_RATE_METADATA   Metadata requests per second (0 disables)
+    GDUP_BURST_METADATA  Metadata burst size
+    GDUP_RATE_MEDIA      Media requests per second (0 disables)
+    GDUP_BURST_MEDIA     Media burst size
+    GDUP_RATE_PREFETCH   Background prefetch requests per second
+    GDUP_BURST_PREFETCH  Background prefetch burst size
+"""
+
+import threading
+import time
+from typing import Dict, Any
+from .config import get_setting
+
+# Defaults stay well under Drive's per-user query quota. A small-file
+# upload or download is a single media request, so the media bucket is
+# sized for GDUP_PARALLEL transfers of small files: at 20 requests per
+# second, 4-16 parallel transfers are bounded by request latency rather
+# than by the limiter. Rate-limit responses still back the bucket off.
+DEFAULT_LIMITS = {
+    'metadata': (8.0, 20.0),
+    'media': (20.0, 40.0),
+    'prefetch': (1.0, 4.0),
+}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at ``rate`` per second up to ``burst``.
+    Callers that find the bucket empty reserve a future token and sleep
+    until it becomes available, so waiting callers are served in order.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.calls = 0
+        self.waited_calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens from the bucket without blocking.
+
+        Args:
+            tokens: Number of tokens to take
+
+        Returns:
+            Seconds the caller must wait before using the tokens
+        """
+        with self._lock:
+            self.calls += 1
+
+            if self.rate <= 0:
+                return 0.0
+
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+
+            if self._tokens >= 0:
+                return 0.0
+
+            delay = -self._tokens / self.rate
+            self.waited_calls += 1
+            self.total_wait += delay
+            self.max_wait = max(self.max_wait, delay)
+            return delay
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens from the bucket, sleeping until they are available.
+
+        Returns:
+            Seconds spent waiting
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def penalize(self, seconds: float) -> None:
+        """Drain the bucket so that no tokens are available for ``seconds``."""
+        if self.rate <= 0:
+            return
+
+        with self._lock:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return usage statistics for this bucket."""
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'calls': self.calls,
+                'waited_calls': self.waited_calls,
+                'total_wait': round(self.total_wait, 3),
+                'max_wait': round(self.max_wait, 3),
+            }
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(name: str = 'metadata') -> TokenBucket:
+    """
+    Get the process-wide bucket for a request class.
+
+    Args:
+        name: Bucket name ('metadata' or 'media')
+
+    Returns:
+        Shared TokenBucket instance
+    """
+    bucket = _buckets.get(name)
+    if bucket is not None:
+        return bucket
+
+    with _buckets_lock:
+        if name not in _buckets:
+            rate, burst = DEFAULT_LIMITS.get(name, DEFAULT_LIMITS['metadata'])
+            _buckets[name] = TokenBucket(
+                get_setting(f"rate_{name}", rate),
+                get_setting(f"burst_{name}", burst)
+            )
+        return _buckets[name]
+
+
+def acquire(name: str = 'metadata', tokens: float = 1.0) -> float:
+    """Wait for a token from the named bucket and return the time waited."""
+    return get_bucket(name).acquire(tokens)
+
+
+def penalize(name: str, seconds: float) -> None:
+    """Back off all callers of the named bucket for ``seconds``."""
+    get_bucket(name).penalize(seconds)
+
+
+def get_stats() -> Dict[str, Dict[str, Any]]:
+    """Return statistics for every bucket used so far."""
+    with _buckets_lock:
+        buckets = dict(_buckets)
+    return {name: bucket.stats() for name, bucket in buckets.items()}
@@ -0,0 +1,232 @@
+"""Per-request tracing for DUP.
+
+When enabled with ``gdup --trace FILE`` or the GDUP_TRACE environment
+variable, every Drive API call, transfer chunk, HTTP request and auth
+step is written to FILE as a JSON line, and a summary table is printed
+when the command finishes.
+
+Tracing is off by default; the instrumented code only checks whether
+``tracer`` is None, so disabled tracing costs nothing measurable.
+"""
+
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Any, List, Optional
+from rich.console import Console
+from rich.table import Table
+from . import ratelimit
+
+console = Console(stderr=True)
+
+
+class Tracer:
+    """Collects trace events and writes them as JSON lines."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started = time.perf_counter()
+        self._calls: List[Dict[str, Any]] = []
+        self._spans: List[Dict[str, Any]] = []
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        event['ts'] = round(time.time(), 6)
+        line = json.dumps(event)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def io_counters(self) -> tuple:
+        """Return (bytes_in, bytes_out, last_status) seen by this thread."""
+        local = self._local
+        return (
+            getattr(local, 'bytes_in', 0),
+            getattr(local, 'bytes_out', 0),
+            getattr(local, 'status', None),
+        )
+
+    def http(self, method: str, uri: str, status: Optional[int], bytes_out: int,
+             bytes_in: int, latency: float, error: Optional[str] = None) -> None:
+        """Record a single HTTP exchange made by the transport."""
+        local = self._local
+        local.bytes_in = getattr(local, 'bytes_in', 0) + bytes_in
+        local.bytes_out = getattr(local, 'bytes_out', 0) + bytes_out
+        local.status = status
+
+        self._write({
+            'kind': 'http',
+            'method': method,
+            'uri': uri.split('?', 1)[0],
+            'status': status,
+            'latency': round(latency, 6),
+            'bytes_in': bytes_in,
+            'bytes_out': bytes_out,
+            'error': error,
+        })
+
+    def call(self, method: str, bucket: str, latency: float, retries: int, sleep: float,
+             status: Optional[int], bytes_in: int, bytes_out: int,
+             error: Optional[str] = None) -> None:
+        """Record a Drive API call, including its retries and sleeps."""
+        event = {
+            'kind': 'call',
+            'method': method,
+            'bucket': bucket,
+            'status': status,
+            'latency': round(latency, 6),
+            'retries': retries,
+            'sleep': round(sleep, 6),
+            'bytes_in': bytes_in,
+            'bytes_out': bytes_out,
+            'error': error,
+        }
+        with self._lock:
+            self._calls.append(event)
+        self._write(event)
+
+    @contextmanager
+    def span(self, name: str):
+        """Time a block of work such as an auth refresh."""
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            event = {
+                'kind': 'span',
+                'method': name,
+                'latency': round(time.perf_counter() - start, 6),
+                'error': error,
+            }
+            with self._lock:
+                self._spans.append(event)
+            self._write(event)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Aggregate calls and spans per method."""
+        groups: Dict[str, Dict[str, Any]] = {}
+
+        with self._lock:
+            events = self._calls + self._spans
+
+        for event in events:
+            group = groups.setdefault(event['method'], {
+                'method': event['method'],
+                'latencies': [],
+                'errors': 0,
+                'retries': 0,
+                'sleep': 0.0,
+                'bytes_in': 0,
+                'bytes_out': 0,
+            })
+            group['latencies'].append(event['latency'])
+            group['errors'] += 1 if event.get('error') else 0
+            group['retries'] += event.get('retries', 0)
+            group['sleep'] += event.get('sleep', 0.0)
+            group['bytes_in'] += event.get('bytes_in', 0)
+            group['bytes_out'] += event.get('bytes_out', 0)
+
+        rows = []
+        for group in groups.values():
+            latencies = sorted(group.pop('latencies'))
+            group['calls'] = len(latencies)
+            group['total'] = sum(latencies)
+            group['p50'] = percentile(latencies, 50)
+            group['p95'] = percentile(latencies, 95)
+            rows.append(group)
+
+        rows.sort(key=lambda row: row['total'], reverse=True)
+        return rows
+
+    def print_summary(self) -> None:
+        """Print the end-of-command summary table."""
+        rows = self.summary()
+        if not rows:
+            return
+
+        table = Table(title="Trace summary", show_header=True, header_style="bold magenta")
+        table.add_column("Method")
+        table.add_column("Calls", justify="right")
+        table.add_column("Errors", justify="right")
+        table.add_column("Retries", justify="right")
+        table.add_column("p50", justify="right")
+        table.add_column("p95", justify="right")
+        table.add_column("Total", justify="right")
+        table.add_column("Sleep", justify="right")
+        table.add_column("In/Out", justify="right", style="dim")
+
+        for row in rows:
+            table.add_row(
+                row['method'],
+                str(row['calls']),
+                str(row['errors']),
+                str(row['retries']),
+                f"{row['p50'] * 1000:.0f} ms",
+                f"{row['p95'] * 1000:.0f} ms",
+                f"{row['total']:.2f} s",
+                f"{row['sleep']:.2f} s",
+                f"{row['bytes_in']}/{row['bytes_out']}",
+            )
+
+        total_sleep = sum(row['sleep'] for row in rows)
+        wall = time.perf_counter() - self._started
+
+        console.print(table)
+        for name, stats in ratelimit.get_stats().items():
+            console.print(
+                f"[dim]Rate limiter {name}: {stats['waited_calls']}/{stats['calls']} calls waited, "
+                f"{stats['total_wait']:.2f} s total, {stats['max_wait']:.2f} s max[/dim]"
+            )
+        console.print(
+            f"[dim]Wall time: {wall:.2f} s, sleep: {total_sleep:.2f} s, "
+            f"trace: {self.path}[/dim]"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100.0 * len(values)) - 1)
+    return values[index]
+
+
+# Active tracer, or None when tracing is disabled
+tracer: Optional[Tracer] = None
+
+
+def start(path: str) -> Tracer:
+    """Enable tracing to the given JSON lines file."""
+    global tracer
+    if tracer is None:
+        tracer = Tracer(path)
+    return tracer
+
+
+def finish() -> None:
+    """Print the summary and stop tracing."""
+    global tracer
+    if tracer is None:
+        return
+
+    active, tracer = tracer, None
+    active.print_summary()
+    active.close()
+
+
+def span(name: str):
+    """Context manager timing a block when tracing is enabled."""
+    if tracer is None:
+        return nullcontext()
+    return tracer.span(name)
@@ -0,0 +1,148 @@
+"""Parallel transfer engine for DUP.
+
+Runs many uploads or downloads on a thread pool with one shared progress
+display: an overall bar with the combined byte count and throughput,
+plus a bar for every file in flight. All transfers share the process-wide
+connection pool and rate limits.
+
+Settings (environment variables):
+    GDUP_PARALLEL  Number of files transferred at the same time
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional
+from rich.console import Console
+from rich.progress import (
+    Progress, SpinnerColumn, BarColumn, TextColumn, DownloadColumn,
+    TransferSpeedColumn, TimeRemainingColumn,
+)
+from .config import get_setting
+
+DEFAULT_PARALLEL = 4
+
+
+@dataclass
+class Transfer:
+    """One file transfer.
+
+    ``run`` performs the transfer and is called with a progress callback
+    taking the completed fraction (0.0 - 1.0). ``item`` is free for the
+    caller (e.g. the manifest entry the transfer came from).
+    """
+
+    name: str
+    size: int
+    run: Callable[[Callable[[float], None]], Any]
+    item: Any = None
+    result: Any = None
+    error: Optional[Exception] = None
+    seconds: float = 0.0
+
+    @classmethod
+    def failing(cls, name: str, error: Exception, item: Any = None) -> 'Transfer':
+        """A transfer that fails with ``error`` (for items that cannot start)."""
+        def run(callback):
+            raise error
+        return cls(name, 0, run, item)
+
+
+def get_parallel() -> int:
+    """Get the configured number of concurrent transfers."""
+    return max(1, get_setting('parallel', DEFAULT_PARALLEL))
+
+
+def run_transfers(transfers: Iterable[Transfer], console: Console,
+                  description: str = "Transferring", parallel: Optional[int] = None,
+                  on_done: Optional[Callable[[Transfer], None]] = None) -> List[Transfer]:
+    """
+    Run transfers concurrently with a shared progress display.
+
+    ``transfers`` may be a generator; transfers start while it is still
+    producing items (e.g. while later result pages are being listed).
+
+    Args:
+        transfers: Transfers to run
+        console: Console to draw the progress display on
+        description: Label of the overall progress bar
+        parallel: Number of concurrent transfers (default: GDUP_PARALLEL)
+        on_done: Called with each transfer as soon as it finishes
+
+    Returns:
+        The transfers, with ``result`` or ``error`` set
+    """
+    parallel = parallel or get_parallel()
+    submitted: List[Transfer] = []
+    lock = threading.Lock()
+    counts = {'done': 0, 'total': 0, 'bytes': 0}
+
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+        console=console
+    ) as progress:
+        overall = progress.add_task(description, total=0)
+
+        def label() -> str:
+            return f"{description} ({counts['done']}/{counts['total']} files)"
+
+        def run(transfer: Transfer) -> None:
+            task = progress.add_task(f"  {transfer.name}", total=transfer.size or 1)
+            sent = 0
+
+            def callback(fraction: float) -> None:
+                nonlocal sent
+                done = int(fraction * transfer.size)
+                progress.update(task, completed=done)
+                progress.advance(overall, done - sent)
+                sent = done
+
+            start = time.perf_counter()
+            try:
+                transfer.result = transfer.run(callback)
+                progress.advance(overall, transfer.size - sent)
+            except Exception as e:
+                transfer.error = e
+                progress.console.print(f"[red]✗ {transfer.name}:[/red] {str(e)}")
+            finally:
+                transfer.seconds = time.perf_counter() - start
+                progress.remove_task(task)
+                if on_done:
+                    on_done(transfer)
+                with lock:
+                    counts['done'] += 1
+                    progress.update(overall, description=label())
+
+        # Transfers are pulled from ``transfers`` only as slots free up, so a
+        # large glob or manifest is not queued all at once
+        window = threading.BoundedSemaphore(parallel * 2)
+        executor = ThreadPoolExecutor(max_workers=parallel, thread_name_prefix='gdup-transfer')
+        futures = []
+        try:
+            for transfer in transfers:
+                window.acquire()
+                submitted.append(transfer)
+                with lock:
+                    counts['total'] += 1
+                    counts['bytes'] += transfer.size
+                    progress.update(overall, total=counts['bytes'], description=label())
+                future = executor.submit(run, transfer)
+                future.add_done_callback(lambda _: window.release())
+                futures.append(future)
+            for future in futures:
+                future.result()
+        finally:
+            # On errors and interrupts, drop the transfers that have not
+            # started (cancel_futures needs 3.9) and let the running ones
+            # finish, so no on_done call happens after we return
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    return submitted
@@ -0,0 +1,144 @@
+"""Pooled HTTP transport for the Google Drive client.
+
+googleapiclient talks to Google over httplib2 by default, which opens a
+new TLS connection for every service object and is not safe to share
+between threads. SessionHttp exposes the httplib2 ``request()`` interface
+on top of a requests ``AuthorizedSession`` backed by a urllib3 connection
+pool, so one service object can be shared by all worker threads and
+consecutive API calls reuse keep-alive connections.
+
+Settings (environment variables):
+    GDUP_POOL_CONNECTIONS  Number of host pools to keep (default: 4)
+    GDUP_POOL_MAXSIZE      Connections kept alive per host (default: 32)
+    GDUP_HTTP_TIMEOUT      Socket timeout in seconds (default: 120)
+    GDUP_API_ENDPOINT      Send requests to another server instead of
+                           https://www.googleapis.com (used by benchmarks)
+"""
+
+import time
+import httplib2
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+from .config import get_setting
+from . import trace
+from . import metrics
+
+GOOGLE_API_ROOT = 'https://www.googleapis.com'
+
+
+def get_api_root() -> str:
+    """Get the API root URL, honouring the GDUP_API_ENDPOINT override."""
+    return get_setting('api_endpoint', GOOGLE_API_ROOT).rstrip('/')
+
+
+def _body_length(body, headers) -> int:
+    """Bytes in a request body (streamed upload chunks only declare Content-Length)."""
+    if not body:
+        return 0
+    if isinstance(body, (bytes, bytearray, str)):
+        return len(body)
+    for name, value in (headers or {}).items():
+        if name.lower() == 'content-length':
+            return int(value)
+    return 0
+
+
+class SessionHttp:
+    """httplib2.Http-compatible adapter over a pooled AuthorizedSession."""
+
+    def __init__(self, credentials, pool_connections: int = 4, pool_maxsize: int = 32,
+                 timeout: float = 120.0, api_root: str = GOOGLE_API_ROOT):
+        """
+        Args:
+            credentials: Google credentials used to authorize requests
+            pool_connections: Number of host pools to keep
+            pool_maxsize: Connections kept alive per host
+            timeout: Socket timeout in seconds
+            api_root: Server that receives requests addressed to googleapis.com
+        """
+        self.timeout = timeout
+        self.api_root = api_root
+        self.session = AuthorizedSession(credentials)
+
+        # Retries are handled by the drive helpers, not by urllib3
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=0
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=5,
+                connection_type=None):
+        """
+        Send a request using the httplib2 calling convention.
+
+        Returns:
+            Tuple of (httplib2.Response, content bytes)
+        """
+        if self.api_root != GOOGLE_API_ROOT and uri.startswith(GOOGLE_API_ROOT):
+            uri = self.api_root + uri[len(GOOGLE_API_ROOT):]
+
+        tracer = trace.tracer
+        registry = metrics.registry
+        if tracer is None and registry is None:
+            response = self._send(uri, method, body, headers, redirections)
+        else:
+            start = time.perf_counter()
+            sent = _body_length(body, headers)
+            try:
+                response = self._send(uri, method, body, headers, redirections)
+            except Exception as e:
+                if tracer is not None:
+                    tracer.http(method, uri, None, sent, 0, time.perf_counter() - start, type(e).__name__)
+                if registry is not None:
+                    registry.http(None, sent, 0)
+                raise
+            if tracer is not None:
+                tracer.http(
+                    method, uri, response.status_code, sent, len(response.content),
+                    time.perf_counter() - start
+                )
+            if registry is not None:
+                registry.http(response.status_code, sent, len(response.content))
+
+        info = dict(response.headers)
+        info['status'] = str(response.status_code)
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+
+        return resp, response.content
+
+    def _send(self, uri, method, body, headers, redirections):
+        return self.session.request(
+            method,
+            uri,
+            data=body,
+            headers=headers,
+            timeout=self.timeout,
+            allow_redirects=redirections > 0
+        )
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+
+def build_http(credentials) -> SessionHttp:
+    """
+    Create a pooled transport using the configured pool sizes.
+
+    Args:
+        credentials: Google credentials used to authorize requests
+
+    Returns:
+        SessionHttp instance safe to share across threads
+    """
+    return SessionHttp(
+        credentials,
+        pool_connections=get_setting('pool_connections', 4),
+        pool_maxsize=get_setting('pool_maxsize', 32),
+        timeout=get_setting('http_timeout', 120.0),
+        api_root=get_api_root()
+    )
@@ -0,0 +1,467 @@
+"""Mirror a local directory to Drive as it changes.
+
+Every directory of the tree has an inotify watch reporting created,
+written, moved and deleted entries. Events are collected per path and
+applied once the path has been quiet for GDUP_WATCH_DEBOUNCE seconds (or
+has kept changing for GDUP_WATCH_MAX_DELAY), so a burst of writes to one
+file becomes a single upload. What is applied is decided by the file
+system at that moment, so a file created and deleted within the window
+costs nothing.
+
+Synced paths are recorded in a MirrorState (see mirror.py) with their
+Drive ID, size and modification time. Each change therefore maps straight
+to one Drive operation - an upload, a content update, a rename or move, or
+a trash - without listing any folder. When watching starts the directory
+is compared with the map once, which also picks up changes made while
+nothing was watching. Uploads run on a thread pool.
+
+Settings (environment variables):
+    GDUP_WATCH_DEBOUNCE   Seconds a path must be quiet before it is synced
+    GDUP_WATCH_MAX_DELAY  Seconds after which a changing path is synced anyway
+"""
+
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .config import get_setting
+from .drive import (
+    create_folder, upload_file, update_file, move_file, trash_file, scan_tree, is_folder,
+)
+from .media import file_md5
+from .mirror import MirrorState
+from .transfer import get_parallel
+
+DEFAULT_DEBOUNCE = 1.0
+DEFAULT_MAX_DELAY = 30.0
+
+# inotify event bits (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+
+_EVENT = struct.Struct('iIII')
+
+MIRROR_FIELDS = "id, name, mimeType, size, md5Checksum, parents"
+
+
+class Inotify:
+    """Minimal ctypes binding of the Linux inotify API."""
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("gdup watch requires Linux (inotify)")
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path: str, mask: int = WATCH_MASK) -> int:
+        """Watch a directory; returns the watch descriptor."""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout: Optional[float]) -> List[Tuple[int, int, int, str]]:
+        """
+        Wait up to ``timeout`` seconds for events.
+
+        Returns:
+            (wd, mask, cookie, name) tuples
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _join(directory: str, name: str) -> str:
+    return f"{directory}/{name}" if directory else name
+
+
+def _parent(path: str) -> str:
+    return path.rpartition('/')[0]
+
+
+def _is_below(path: str, directory: str) -> bool:
+    return path.startswith(directory + '/')
+
+
+class Watcher:
+    """Keeps a Drive folder in step with a local directory."""
+
+    def __init__(self, root: str, folder_id: str, parallel: Optional[int] = None,
+                 excludes: Optional[List[str]] = None, verify: Optional[bool] = None,
+                 report: Optional[Callable[[str, str, Optional[Exception]], None]] = None):
+        """
+        Args:
+            root: Local directory to mirror
+            folder_id: Drive folder that mirrors it
+            parallel: Files uploaded at the same time (default: GDUP_PARALLEL)
+            excludes: Name patterns (e.g. '*.tmp') that are never synced
+            verify: Verify uploads against md5Checksum (default: GDUP_VERIFY)
+            report: Called with (action, path, error) for every change applied
+        """
+        self.root = Path(root).resolve()
+        self.folder_id = folder_id
+        self.state = MirrorState(str(self.root), folder_id)
+        self.parallel = parallel or get_parallel()
+        self.excludes = excludes or []
+        self.verify = verify
+        self.report = report or (lambda action, path, error: None)
+        self.debounce = get_setting('watch_debounce', DEFAULT_DEBOUNCE)
+        self.max_delay = get_setting('watch_max_delay', DEFAULT_MAX_DELAY)
+
+        # path -> [first event, last event, path it was moved from]
+        self._pending: Dict[str, List[Any]] = {}
+        # Move cookie -> source path, until the matching IN_MOVED_TO arrives
+        self._moves: Dict[int, str] = {}
+        # Watch descriptor -> directory path
+        self._watches: Dict[int, str] = {}
+        self._inotify: Optional[Inotify] = None
+        self._resync = False
+
+    # -- local files -------------------------------------------------------
+
+    def _excluded(self, path: str) -> bool:
+        name = path.rpartition('/')[2]
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.excludes)
+
+    def _local(self, path: str) -> Path:
+        return self.root / path if path else self.root
+
+    def _walk(self, path: str = ''):
+        """Yield (path, is_dir) for everything below a local directory, parents first."""
+        for directory, dirnames, filenames in os.walk(self._local(path)):
+            relative = Path(directory).relative_to(self.root).as_posix()
+            relative = '' if relative == '.' else relative
+            dirnames[:] = sorted(name for name in dirnames
+                                 if not os.path.islink(os.path.join(directory, name))
+                                 and not self._excluded(name))
+            for name in dirnames:
+                yield _join(relative, name), True
+            for name in sorted(filenames):
+                full = os.path.join(directory, name)
+                if os.path.isfile(full) and not os.path.islink(full) and not self._excluded(name):
+                    yield _join(relative, name), False
+
+    # -- Drive -------------------------------------------------------------
+
+    def _folder_id(self, path: str) -> str:
+        """Get the Drive folder of a local directory, creating it (and its parents) if needed."""
+        if not path:
+            return self.folder_id
+        entry = self.state.get(path)
+        if entry and entry['folder']:
+            return entry['file_id']
+        parent_id = self._folder_id(_parent(path))
+        folder = create_folder(path.rpartition('/')[2], parent_id)
+        self.state.put(path, folder['id'], folder=True)
+        self.report('mkdir', path, None)
+        return folder['id']
+
+    def adopt(self) -> int:
+        """
+        Map files already in the Drive folder to local paths (first run only).
+
+        Files with the same path and content are recorded as synced, and
+        files that differ are recorded so that they are updated in place,
+        so mirroring into a folder filled by ``gdup up`` creates no copies.
+
+        Returns:
+            Number of Drive entries adopted
+        """
+        paths = {self.folder_id: ''}
+        adopted = 0
+        for file in scan_tree(self.folder_id, fields=MIRROR_FIELDS):
+            parents = file.get('parents') or []
+            if not parents or parents[0] not in paths:
+                continue
+            path = _join(paths[parents[0]], file['name'])
+            local = self._local(path)
+
+            if is_folder(file):
+                paths[file['id']] = path
+                if local.is_dir() and not self.state.get(path):
+                    self.state.put(path, file['id'], folder=True)
+                    adopted += 1
+                continue
+
+            if not local.is_file() or self.state.get(path):
+                continue
+            stat = local.stat()
+            same = (int(file.get('size') or -1) == stat.st_size
+                    and file.get('md5Checksum') == file_md5(str(local)))
+            # A size of -1 never matches, so differing files get updated
+            self.state.put(path, file['id'], False,
+                           stat.st_size if same else -1, stat.st_mtime_ns if same else None)
+            adopted += 1
+        return adopted
+
+    def apply(self, changes: Dict[str, Optional[str]]) -> None:
+        """
+        Bring Drive in line with the local state of some paths.
+
+        Args:
+            changes: Changed paths, each with the path it was moved from (or None)
+        """
+        # Renames and moves first, so later steps see the new paths
+        for path, origin in sorted(changes.items()):
+            if not origin or not os.path.lexists(self._local(path)):
+                continue
+            entry = self.state.get(origin)
+            if entry is None:
+                continue
+            # The old parent may have been renamed in this batch too
+            old_parent = self.folder_id if not _parent(origin) else None
+            new_parent = self._folder_id(_parent(path))
+            name = path.rpartition('/')[2]
+            try:
+                move_file(entry['file_id'], name if name != origin.rpartition('/')[2] else None,
+                          new_parent, old_parent)
+                self.state.move(origin, path)
+                self.report('move', f"{origin} -> {path}", None)
+            except Exception as e:
+                self.report('move', path, e)
+
+        # Deleted paths: trashing a folder trashes everything in it
+        trashed: List[str] = []
+        for path in sorted(changes):
+            if os.path.lexists(self._local(path)) or any(_is_below(path, done) for done in trashed):
+                continue
+            entry = self.state.get(path)
+            if entry is None:
+                continue
+            try:
+                trash_file(entry['file_id'], self._folder_id(_parent(path)))
+                self.state.remove(path)
+                trashed.append(path)
+                self.report('trash', path, None)
+            except Exception as e:
+                self.report('trash', path, e)
+
+        # Existing paths; directories bring everything in them
+        files: Dict[str, None] = {}
+        for path in sorted(changes):
+            local = self._local(path)
+            if self._excluded(path) or local.is_symlink():
+                continue
+            if local.is_dir():
+                self._folder_id(path)
+                for child, child_is_dir in self._walk(path):
+                    if child_is_dir:
+                        self._folder_id(child)
+                    else:
+                        files[child] = None
+            elif local.is_file():
+                files[path] = None
+
+        self._upload(list(files))
+
+    def _upload(self, paths: List[str]) -> None:
+        """Upload new and changed files on the thread pool."""
+        entries = self.state.entries()
+        work = []
+        for path in paths:
+            try:
+                stat = self._local(path).stat()
+            except FileNotFoundError:
+                continue
+            entry = entries.get(path)
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+                continue
+            work.append((path, entry, stat, self._folder_id(_parent(path))))
+
+        if not work:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.parallel) as pool:
+            for future in [pool.submit(self._upload_one, *item) for item in work]:
+                future.result()
+
+    def _upload_one(self, path: str, entry: Optional[Dict[str, Any]], stat, parent_id: str) -> None:
+        local = str(self._local(path))
+        try:
+            if entry and not entry['folder']:
+                result = update_file(entry['file_id'], local, verify=self.verify)
+                action = 'update'
+            else:
+                result = upload_file(local, parent_id, verify=self.verify)
+                action = 'upload'
+        except Exception as e:
+            self.report('upload', path, e)
+            return
+        # The size and time from before the upload: a write during the
+        # upload leaves the entry out of date, so the file is sent again
+        self.state.put(path, result['id'], False, stat.st_size, stat.st_mtime_ns)
+        self.report(action, path, None)
+
+    def sync(self) -> None:
+        """Compare the whole directory with the map and apply every difference."""
+        entries = self.state.entries()
+        if not entries:
+            self.adopt()
+            entries = self.state.entries()
+
+        changes: Dict[str, Optional[str]] = {path: None for path, _ in self._walk()}
+        # Mapped paths that are gone locally get trashed
+        for path in entries:
+            if not os.path.lexists(self._local(path)):
+                changes.setdefault(path, None)
+        self.apply(changes)
+
+    # -- events ------------------------------------------------------------
+
+    def _add_watches(self, path: str = '') -> None:
+        """Watch a directory and every directory below it."""
+        directories = [path] + [child for child, is_dir in self._walk(path) if is_dir]
+        for directory in directories:
+            try:
+                wd = self._inotify.add_watch(str(self._local(directory)))
+            except OSError:
+                continue  # Removed again before it could be watched
+            self._watches[wd] = directory
+
+    def _drop_watches(self, path: str) -> None:
+        for wd, directory in list(self._watches.items()):
+            if directory == path or _is_below(directory, path):
+                self._inotify.rm_watch(wd)
+                self._watches.pop(wd, None)
+
+    def _touch(self, path: str, origin: Optional[str] = None) -> None:
+        now = time.monotonic()
+        pending = self._pending.get(path)
+        if pending is None:
+            self._pending[path] = [now, now, origin]
+        else:
+            pending[1] = now
+            if origin:
+                pending[2] = origin
+
+    def _handle(self, wd: int, mask: int, cookie: int, name: str) -> None:
+        if mask & IN_Q_OVERFLOW:
+            # Events were lost: compare everything on the next flush
+            self._resync = True
+            return
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return
+
+        directory = self._watches.get(wd)
+        if directory is None or not name:
+            return
+        path = _join(directory, name)
+        if self._excluded(path):
+            return
+
+        if mask & IN_MOVED_FROM:
+            self._moves[cookie] = path
+            self._touch(path)
+        elif mask & IN_MOVED_TO:
+            origin = self._moves.pop(cookie, None)
+            if origin is None:
+                # Moved in from outside the tree
+                self._touch(path)
+                if mask & IN_ISDIR:
+                    self._add_watches(path)
+                return
+
+            earlier = self._pending.pop(origin, None)
+            if earlier and earlier[2]:
+                # Moved twice before being synced
+                origin = earlier[2]
+            self._touch(path, origin)
+
+            if mask & IN_ISDIR:
+                for watched, watched_path in list(self._watches.items()):
+                    if watched_path == origin or _is_below(watched_path, origin):
+                        self._watches[watched] = path + watched_path[len(origin):]
+                for pending_path in [p for p in self._pending if _is_below(p, origin)]:
+                    self._pending[path + pending_path[len(origin):]] = self._pending.pop(pending_path)
+        else:
+            self._touch(path)
+            if mask & IN_CREATE and mask & IN_ISDIR:
+                self._add_watches(path)
+
+    def flush(self, force: bool = False) -> None:
+        """Apply the changes of every path that has settled."""
+        if self._resync:
+            self._resync = False
+            self._pending.clear()
+            self.sync()
+            return
+
+        now = time.monotonic()
+        ready = {
+            path: origin
+            for path, (first, last, origin) in self._pending.items()
+            if force or now - last >= self.debounce or now - first >= self.max_delay
+        }
+        for path in ready:
+            del self._pending[path]
+        if ready:
+            self.apply(ready)
+
+    def run(self, stop: Optional[Callable[[], bool]] = None) -> None:
+        """
+        Sync once, then follow changes until interrupted.
+
+        Args:
+            stop: Checked between events; watching ends when it returns True
+        """
+        self._inotify = Inotify()
+        try:
+            self._add_watches()
+            self.sync()
+            while not (stop and stop()):
+                timeout = self.debounce if self._pending else (1.0 if stop else None)
+                for event in self._inotify.read(timeout):
+                    self._handle(*event)
+                # A move out of the tree has no IN_MOVED_TO: the path is gone
+                for path in self._moves.values():
+                    self._drop_watches(path)
+                self._moves.clear()
+                self.flush()
+        finally:
+            self._inotify.close()
+            self._inotify = None
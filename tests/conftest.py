@@ -0,0 +1,10 @@
+"""Shared test setup."""
+
+import os
+import tempfile
+
+# dup creates its config directory (caches, listing store) on import; keep
+# it out of the real home directory
+_home = tempfile.mkdtemp(prefix='gdup-test-')
+os.environ['HOME'] = _home
+os.environ['APPDATA'] = os.path.join(_home, 'AppData')
@@ -0,0 +1,74 @@
+"""Tests for disk usage aggregation."""
+
+from dup.commands.du import aggregate
+from dup.drive import FOLDER_MIME_TYPE
+
+
+def folder(folder_id, name, parent):
+    return {'id': folder_id, 'name': name, 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent]}
+
+
+def file(file_id, parent, size, quota=None):
+    entry = {'id': file_id, 'name': file_id, 'mimeType': 'text/plain', 'parents': [parent], 'size': str(size)}
+    if quota is not None:
+        entry['quotaBytesUsed'] = str(quota)
+    return entry
+
+
+def by_id(results):
+    return {result['id']: result for result in results}
+
+
+def test_totals_roll_up_to_parents():
+    entries = [
+        folder('a', 'a', 'root'),
+        folder('b', 'b', 'a'),
+        file('f1', 'root', 10),
+        file('f2', 'a', 20),
+        file('f3', 'b', 30),
+        file('f4', 'b', 40),
+    ]
+
+    results = by_id(aggregate('root', '/', entries))
+
+    assert results['b'] == {'id': 'b', 'path': '/a/b', 'size': 70, 'quota': 70, 'files': 2, 'folders': 0}
+    assert results['a'] == {'id': 'a', 'path': '/a', 'size': 90, 'quota': 90, 'files': 3, 'folders': 1}
+    assert results['root'] == {'id': 'root', 'path': '/', 'size': 100, 'quota': 100, 'files': 4, 'folders': 2}
+
+
+def test_quota_falls_back_to_size():
+    entries = [file('f1', 'root', 10, quota=0), file('f2', 'root', 5)]
+
+    root = by_id(aggregate('root', '/', entries))['root']
+
+    assert root['size'] == 15
+    assert root['quota'] == 5
+
+
+def test_entries_outside_subtree_are_ignored():
+    entries = [
+        folder('a', 'a', 'root'),
+        file('f1', 'a', 10),
+        file('shared', 'elsewhere', 1000),
+        {'id': 'orphan', 'name': 'orphan', 'mimeType': 'text/plain', 'size': '5'},
+    ]
+
+    results = by_id(aggregate('root', '/', entries))
+
+    assert set(results) == {'root', 'a'}
+    assert results['root']['size'] == 10
+
+
+def test_subfolder_root_path():
+    entries = [folder('c', 'c', 'a'), file('f1', 'c', 1)]
+
+    results = by_id(aggregate('a', '/docs/a/', entries))
+
+    assert results['c']['path'] == '/docs/a/c'
+    assert results['a']['files'] == 1
+
+
+def test_empty_folder():
+    assert aggregate('root', '/', []) == [
+        {'id': 'root', 'path': '/', 'size': 0, 'quota': 0, 'files': 0, 'folders': 0}
+    ]
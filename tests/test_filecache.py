@@ -0,0 +1,98 @@
+"""Tests for the size-capped file cache."""
+
+import itertools
+import pytest
+from dup import filecache
+from dup.filecache import FileCache
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    # Distinct timestamps so LRU order does not depend on clock resolution
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(filecache.time, 'time', lambda: float(next(ticks)))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FileCache('test', 100, directory=tmp_path / 'cache')
+
+
+def add(cache, key, size):
+    source = cache.temp_path()
+    with open(source, 'wb') as fh:
+        fh.write(b'x' * size)
+    return cache.add(key, source)
+
+
+def test_fits(cache):
+    assert cache.fits(0)
+    assert cache.fits(100)
+    assert not cache.fits(101)
+
+
+def test_add_and_get(cache):
+    path = add(cache, 'a', 10)
+
+    assert cache.get('a') == path
+    assert path.read_bytes() == b'x' * 10
+    assert cache.get('missing') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['bytes_saved']) == (1, 1, 10)
+
+
+def test_evicts_least_recently_used(cache):
+    add(cache, 'a', 40)
+    add(cache, 'b', 40)
+    cache.get('a')
+    add(cache, 'c', 40)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (2, 80, 1)
+
+
+def test_evicted_files_are_removed(cache):
+    path = add(cache, 'a', 60)
+    add(cache, 'b', 60)
+
+    assert not path.exists()
+
+
+def test_new_entry_is_never_evicted(cache):
+    add(cache, 'a', 10)
+    path = add(cache, 'big', 150)
+
+    assert path.exists()
+    assert cache.get('a') is None
+    assert cache.get('big') == path
+
+
+def test_evict_to_smaller_budget(cache):
+    for key in 'abcd':
+        add(cache, key, 20)
+
+    assert cache.evict(40) == 2
+    assert [key for key in 'abcd' if cache.get(key)] == ['c', 'd']
+
+
+def test_clear(cache):
+    add(cache, 'a', 10)
+    add(cache, 'b', 10)
+
+    assert cache.clear() == 2
+    assert cache.stats()['bytes'] == 0
+
+
+def test_ingest_skips_files_over_budget(cache, tmp_path):
+    small = tmp_path / 'small'
+    small.write_bytes(b'y' * 50)
+    large = tmp_path / 'large'
+    large.write_bytes(b'y' * 101)
+
+    assert cache.ingest('large', str(large)) is None
+    assert cache.ingest('small', str(small)).read_bytes() == small.read_bytes()
+    # The source stays where it was
+    assert small.exists()
@@ -0,0 +1,64 @@
+"""Tests for glob matching of Drive names."""
+
+import pytest
+from dup import drive
+from dup.drive import FOLDER_MIME_TYPE, glob_query
+
+
+def test_glob_query_sends_literal_prefix():
+    assert glob_query('report_*.csv') == "name contains 'report_'"
+
+
+def test_glob_query_without_prefix_lists_everything():
+    assert glob_query('*.csv') is None
+    assert glob_query('?eport') is None
+    assert glob_query('[ab]*') is None
+
+
+def test_glob_query_files_only():
+    assert glob_query('*', files_only=True) == f"mimeType != '{FOLDER_MIME_TYPE}'"
+    assert glob_query('data*', files_only=True) == (
+        f"name contains 'data' and mimeType != '{FOLDER_MIME_TYPE}'"
+    )
+
+
+def test_glob_query_quotes_prefix():
+    assert glob_query("it's*") == "name contains 'it\\'s'"
+
+
+@pytest.fixture
+def listing(monkeypatch):
+    files = [
+        {'id': '1', 'name': 'report_jan.csv'},
+        {'id': '2', 'name': 'report_feb.CSV'},
+        {'id': '3', 'name': 'report_notes.txt'},
+        {'id': '4', 'name': 'report_a.csv'},
+    ]
+    queries = []
+
+    def iter_files(folder_id, query=None, **kwargs):
+        queries.append(query)
+        return iter(files)
+
+    monkeypatch.setattr(drive, 'iter_files', iter_files)
+    monkeypatch.setattr(drive.metadata_cache, 'put_file', lambda file: None)
+    return queries
+
+
+def test_find_files_filters_with_fnmatch(listing):
+    names = [file['name'] for file in drive.find_files('report_*.csv', 'folder')]
+
+    assert names == ['report_jan.csv', 'report_a.csv']
+    assert listing == ["name contains 'report_'"]
+
+
+def test_find_files_character_classes(listing):
+    names = [file['name'] for file in drive.find_files('report_?.csv', 'folder')]
+
+    assert names == ['report_a.csv']
+
+
+def test_find_files_sets_parent(listing):
+    files = list(drive.find_files('report_jan.csv', 'folder'))
+
+    assert files[0]['parents'] == ['folder']
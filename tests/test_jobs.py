@@ -0,0 +1,82 @@
+"""Tests for the persistent job queue."""
+
+import os
+import subprocess
+import sys
+import pytest
+from dup.jobs import JobStore, QUEUED, RUNNING, DONE
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(tmp_path / 'jobs.db')
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_claim_takes_highest_priority_first(store):
+    low = store.add('down', 'a', '/tmp/a', 'a')
+    high = store.add('down', 'b', '/tmp/b', 'b', priority=5)
+
+    assert store.claim('down', limit=2)['id'] == high
+    assert store.claim('down', limit=2)['id'] == low
+    assert store.claim('down', limit=2) is None
+
+
+def test_claim_marks_job_running(store):
+    job_id = store.add('up', '/tmp/a', 'root', 'a')
+
+    job = store.claim('up', limit=1)
+
+    assert job['status'] == RUNNING
+    stored = store.get(job_id)
+    assert stored['status'] == RUNNING
+    assert stored['worker_pid'] == os.getpid()
+    assert stored['started'] is not None
+
+
+def test_claim_respects_concurrency_limit(store):
+    store.add('up', '/tmp/a', 'root', 'a')
+    store.add('up', '/tmp/b', 'root', 'b')
+    store.add('down', 'c', '/tmp/c', 'c')
+
+    assert store.claim('up', limit=1) is not None
+    assert store.claim('up', limit=1) is None
+    # Limits are per direction
+    assert store.claim('down', limit=1) is not None
+
+
+def test_claim_frees_slot_when_job_finishes(store):
+    first = store.add('up', '/tmp/a', 'root', 'a')
+    second = store.add('up', '/tmp/b', 'root', 'b')
+
+    store.claim('up', limit=1)
+    store.finish(first, DONE)
+
+    assert store.claim('up', limit=1)['id'] == second
+
+
+def test_recover_requeues_jobs_of_dead_runners(store):
+    job_id = store.add('down', 'a', '/tmp/a', 'a')
+    store.claim('down', limit=1)
+    store.update(job_id, worker_pid=_dead_pid(), rate=100.0)
+
+    assert store.recover() == 1
+
+    job = store.get(job_id)
+    assert job['status'] == QUEUED
+    assert job['worker_pid'] is None
+    assert job['rate'] == 0
+    assert store.claim('down', limit=1)['id'] == job_id
+
+
+def test_recover_keeps_jobs_of_live_runners(store):
+    job_id = store.add('down', 'a', '/tmp/a', 'a')
+    store.claim('down', limit=1)
+
+    assert store.recover() == 0
+    assert store.get(job_id)['status'] == RUNNING
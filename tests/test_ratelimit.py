@@ -0,0 +1,70 @@
+"""Tests for the client-side token bucket."""
+
+import pytest
+from dup import ratelimit
+from dup.ratelimit import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, 'monotonic', clock)
+    return clock
+
+
+def test_burst_is_served_without_waiting(clock):
+    bucket = TokenBucket(rate=2.0, burst=5.0)
+
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.stats()['waited_calls'] == 1
+
+
+def test_waiting_callers_are_queued_in_order(clock):
+    bucket = TokenBucket(rate=4.0, burst=1.0)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.25)
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.stats()['max_wait'] == pytest.approx(0.5)
+
+
+def test_tokens_refill_at_rate(clock):
+    bucket = TokenBucket(rate=10.0, burst=10.0)
+    for _ in range(10):
+        bucket.reserve()
+
+    clock.now += 0.35
+    assert [bucket.reserve() for _ in range(3)] == [0.0] * 3
+    assert bucket.reserve() == pytest.approx(0.05)
+
+
+def test_refill_is_capped_at_burst(clock):
+    bucket = TokenBucket(rate=10.0, burst=3.0)
+    clock.now += 60
+
+    assert [bucket.reserve() for _ in range(3)] == [0.0] * 3
+    assert bucket.reserve() == pytest.approx(0.1)
+
+
+def test_penalize_drains_the_bucket(clock):
+    bucket = TokenBucket(rate=2.0, burst=10.0)
+    bucket.penalize(3.0)
+
+    assert bucket.reserve() == pytest.approx(3.5)
+
+
+def test_zero_rate_disables_limiting(clock):
+    bucket = TokenBucket(rate=0, burst=1.0)
+    bucket.penalize(10.0)
+
+    assert [bucket.reserve() for _ in range(100)] == [0.0] * 100
+    assert bucket.stats()['calls'] == 100